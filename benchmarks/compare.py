@@ -0,0 +1,57 @@
+"""Compare two load_test.py result files endpoint by endpoint
+
+    python benchmarks/compare.py benchmarks/results/before.json benchmarks/results/after.json
+
+Prints throughput and p50/p95/p99 for each endpoint in both runs with the
+relative change; latency increases and throughput drops beyond --threshold
+percent are flagged with ``!``.
+"""
+import argparse
+import json
+
+
+def change(before, after):
+    if before in (None, 0) or after is None:
+        return None
+    return (after - before) / before * 100
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument('--threshold', type=float, default=10.0, help='percent change to flag')
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    print(f"before: {before['meta'].get('commit')}  {before['meta'].get('started_at')}")
+    print(f"after:  {after['meta'].get('commit')}  {after['meta'].get('started_at')}")
+
+    for target in sorted(set(before['targets']) & set(after['targets'])):
+        old, new = before['targets'][target], after['targets'][target]
+        total = change(old['throughput_rps'], new['throughput_rps'])
+        print(f"\n{target}: {old['throughput_rps']} -> {new['throughput_rps']} req/s"
+              + (f' ({total:+.1f}%)' if total is not None else ''))
+        print(f"  {'endpoint':32} {'metric':8} {'before':>10} {'after':>10} {'change':>9}")
+        for name in sorted(set(old['endpoints']) | set(new['endpoints'])):
+            old_stats = old['endpoints'].get(name, {})
+            new_stats = new['endpoints'].get(name, {})
+            for metric, worse_if_higher in (('throughput_rps', False), ('p50_ms', True),
+                                            ('p95_ms', True), ('p99_ms', True)):
+                a, b = old_stats.get(metric), new_stats.get(metric)
+                delta = change(a, b)
+                flag = ''
+                if delta is not None and (delta > args.threshold if worse_if_higher else delta < -args.threshold):
+                    flag = ' !'
+                shown = f'{delta:+.1f}%' if delta is not None else '-'
+                label = metric.replace('_rps', '').replace('_ms', '')
+                print(f"  {name:32} {label:8} {a if a is not None else '-':>10} "
+                      f"{b if b is not None else '-':>10} {shown:>9}{flag}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,629 @@
+"""Load test for the MySQL and Mongo CRUD APIs
+
+Starts each backend with serve.py, seeds the Company/Employee/Department
+schema from assign2.sql at the requested scale, drives the routes with
+concurrent workers at a given read/write mix, and writes throughput and
+p50/p95/p99 latency per endpoint to JSON:
+
+    python benchmarks/load_test.py --target mysql --mysql-database dbconn_bench
+    python benchmarks/load_test.py --target mongo --mongo-mock --employees 2000
+    python benchmarks/load_test.py --target both --workers 16 --duration 60 --write-ratio 0.3
+    python benchmarks/compare.py benchmarks/results/old.json benchmarks/results/new.json
+
+MySQL needs a local server and an existing, disposable database (its tables
+are dropped and recreated). Mongo runs against DBCONN_MONGO_URI (default
+mongodb://localhost:27017) or, with --mongo-mock, mongomock in-process.
+Every route is called at least once in a smoke pass; the hot routes then
+run under load.
+"""
+import argparse
+import datetime
+import http.client
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(HERE, '..')
+
+sys.path.insert(0, os.path.join(ROOT, 'dbconn-mysql'))
+from script import split_statements  # noqa: E402
+
+CITIES = ['Pune', 'Mumbai', 'Hyderabad', 'Bangalore', 'Chennai', 'Delhi']
+DEPARTMENTS = ['Sales', 'R&D', 'HR', 'Finance', 'Support']
+
+
+class BenchError(Exception):
+    pass
+
+
+class Client:
+    """One keep-alive HTTP connection per worker"""
+
+    def __init__(self, port, host='127.0.0.1', timeout=60):
+        self.host, self.port, self.timeout = host, port, timeout
+        self.conn = http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def request(self, method, path, body=None):
+        """Send one request; returns (status, raw body)"""
+        data = json.dumps(body, default=str).encode() if body is not None else None
+        headers = {'Content-Type': 'application/json'} if data is not None else {}
+        try:
+            self.conn.request(method, path, data, headers)
+            response = self.conn.getresponse()
+            return response.status, response.read()
+        except (http.client.HTTPException, OSError):
+            self.conn.close()
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            raise
+
+    def call(self, method, path, body=None):
+        """Send one request and return the parsed body; raises BenchError on failure"""
+        status, raw = self.request(method, path, body)
+        if status >= 400:
+            raise BenchError(f'{method} {path} -> {status}: {raw[:300]!r}')
+        # NDJSON routes (execute-script, streams) return one object per line
+        lines = [json.loads(line) for line in raw.splitlines() if line.strip()]
+        return lines[0] if len(lines) == 1 else lines
+
+
+def start_server(backend, port, mock=False, env=None):
+    """Start serve.py in a subprocess and wait until it answers"""
+    command = [sys.executable, os.path.join(HERE, 'serve.py'), backend, '--port', str(port)]
+    if mock:
+        command.append('--mock')
+    process = subprocess.Popen(command, env=dict(os.environ, **(env or {})),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise BenchError(f'{backend} server exited: {process.stderr.read().decode()[-2000:]}')
+        try:
+            Client(port, timeout=2).request('GET', '/api/status')
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise BenchError(f'{backend} server did not start on port {port}')
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))]
+
+
+def summarize(samples, errors, elapsed):
+    """Per-endpoint throughput and latency percentiles in milliseconds"""
+    results = {}
+    for name in sorted(set(samples) | set(errors)):
+        latencies = sorted(samples.get(name, []))
+        results[name] = {
+            'requests': len(latencies),
+            'errors': errors.get(name, 0),
+            'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else None,
+            'mean_ms': round(sum(latencies) / len(latencies), 3) if latencies else None,
+            'p50_ms': percentile(latencies, 0.50),
+            'p95_ms': percentile(latencies, 0.95),
+            'p99_ms': percentile(latencies, 0.99),
+            'max_ms': latencies[-1] if latencies else None,
+        }
+    return results
+
+
+class Workload:
+    """Seeds one backend and generates its operations
+
+    ``reads`` and ``writes`` are lists of (weight, endpoint, fn) where ``fn(rng)``
+    returns (method, path, body). ``smoke`` is run once per route.
+    """
+
+    name = None
+    backend = None
+
+    def __init__(self, args, client):
+        self.args = args
+        self.client = client
+        self.lock = threading.Lock()
+        self.inserted = []
+        self.next_id = 1
+
+    def new_id(self):
+        with self.lock:
+            self.next_id += 1
+            return self.next_id
+
+    def employee(self, rng, e_id):
+        return {
+            'E_ID': e_id,
+            'E_Name': f'emp-{e_id}',
+            'Street': f'{rng.randint(1, 999)} Main Road',
+            'City': rng.choice(CITIES),
+            'Salary': rng.randrange(25000, 200000, 500),
+            'Manager_ID': rng.randint(1, e_id - 1) if e_id > 1 and rng.random() < 0.8 else None,
+            'C_ID': rng.randint(1, self.args.companies),
+        }
+
+    def remember_insert(self, e_id):
+        with self.lock:
+            self.inserted.append(e_id)
+
+    def take_inserted(self):
+        with self.lock:
+            return self.inserted.pop() if self.inserted else None
+
+    def company_name(self, c_id):
+        return f'Company {c_id}'
+
+    def checks(self):
+        """(name, fn) pairs run after the smoke calls; ``fn()`` returns an error or None"""
+        return []
+
+
+class MySQLWorkload(Workload):
+    name = 'mysql'
+    backend = 'mysql'
+
+    def seed(self):
+        args, client = self.args, self.client
+        client.call('POST', '/api/connect', {
+            'host': args.mysql_host, 'port': args.mysql_port, 'username': args.mysql_user,
+            'password': args.mysql_password, 'database': args.mysql_database,
+            'pool': {'max_size': args.workers + 4}
+        })
+
+        # Schema straight from assign2.sql: its DROP/CREATE TABLE statements
+        with open(os.path.join(ROOT, 'assign2.sql')) as f:
+            ddl = [stmt['sql'] for stmt in split_statements(f.read())
+                   if stmt['sql'].upper().startswith(('DROP TABLE', 'CREATE TABLE'))]
+        client.call('POST', '/api/execute-query', {'query': 'DROP TABLE IF EXISTS `Company_Salary_Summary`'})
+        client.call('POST', '/api/execute-script', {'script': ';\n'.join(ddl), 'transaction': False})
+
+        rng = random.Random(args.seed)
+        client.call('POST', '/api/bulk-insert', {'table': 'Company', 'rows': [
+            {'C_ID': c_id, 'C_Name': self.company_name(c_id), 'City': rng.choice(CITIES)}
+            for c_id in range(1, args.companies + 1)
+        ]})
+        for start in range(1, args.employees + 1, 5000):
+            rows = [self.employee(rng, e_id) for e_id in range(start, min(start + 5000, args.employees + 1))]
+            client.call('POST', '/api/bulk-insert', {'table': 'Employee', 'rows': rows})
+        client.call('POST', '/api/bulk-insert', {'table': 'Department', 'rows': [
+            {'D_ID': d_id, 'D_Name': DEPARTMENTS[d_id % len(DEPARTMENTS)],
+             'Manager_ID': rng.randint(1, args.employees), 'C_ID': rng.randint(1, args.companies)}
+            for d_id in range(1, args.departments + 1)
+        ]})
+        client.call('POST', '/api/aggregates/setup')
+        self.next_id = args.employees + 1
+
+    def operations(self):
+        args = self.args
+        companies = args.companies
+
+        def select_company(rng):
+            return 'POST', '/api/select', {'table': 'Employee', 'limit': 50,
+                                           'filter': {'field': 'C_ID', 'value': rng.randint(1, companies)}}
+
+        def select_page(rng):
+            return 'POST', '/api/select', {'table': 'Employee', 'paginate': True, 'limit': 100,
+                                           'after': rng.randint(0, args.employees)}
+
+        def avg_salary(rng):
+            name = self.company_name(rng.randint(1, companies))
+            return 'POST', '/api/execute-query', {
+                'query': "SELECT AVG(Salary) AS Avg_Salary FROM Employee "
+                         f"WHERE C_ID = (SELECT C_ID FROM Company WHERE C_Name = '{name}')",
+                'cache': 'bypass'
+            }
+
+        def aggregates(rng):
+            return 'GET', f'/api/aggregates?c_id={rng.randint(1, companies)}', None
+
+        def insert(rng):
+            e_id = self.new_id()
+            self.remember_insert(e_id)
+            return 'POST', '/api/insert', {'table': 'Employee', 'data': self.employee(rng, e_id)}
+
+        def update(rng):
+            return 'POST', '/api/update', {'table': 'Employee', 'set': {'Salary': rng.randrange(25000, 200000, 500)},
+                                           'filter': {'field': 'E_ID', 'value': rng.randint(1, args.employees)}}
+
+        def delete(rng):
+            e_id = self.take_inserted()
+            if e_id is None:
+                return insert(rng)
+            return 'POST', '/api/delete', {'table': 'Employee', 'filter': {'field': 'E_ID', 'value': e_id}}
+
+        def bulk_insert(rng):
+            rows = []
+            for _ in range(100):
+                e_id = self.new_id()
+                self.remember_insert(e_id)
+                rows.append(self.employee(rng, e_id))
+            return 'POST', '/api/bulk-insert', {'table': 'Employee', 'rows': rows}
+
+        reads = [
+            (40, 'select_by_company', select_company),
+            (20, 'select_keyset_page', select_page),
+            (20, 'execute_query_avg_salary', avg_salary),
+            (15, 'aggregates_lookup', aggregates),
+            (5, 'status', lambda rng: ('GET', '/api/status', None)),
+        ]
+        writes = [
+            (35, 'insert', insert),
+            (35, 'update_salary', update),
+            (25, 'delete', delete),
+            (5, 'bulk_insert_100', bulk_insert),
+        ]
+        return reads, writes
+
+    def smoke(self):
+        select = {'table': 'Employee', 'filter': {'field': 'C_ID', 'value': 1}}
+        return [
+            ('GET', '/api/status', None),
+            ('GET', '/api/databases', None),
+            ('GET', '/api/tables', None),
+            ('POST', '/api/table-info', {'table': 'Employee'}),
+            ('POST', '/api/create-table', {'table_name': 'bench_tmp', 'columns': [
+                {'name': 'id', 'type': 'INT', 'primary_key': True}, {'name': 'v', 'type': 'VARCHAR(20)'}]}),
+            ('POST', '/api/insert', {'table': 'bench_tmp', 'data': {'id': 1, 'v': 'a'}}),
+            ('POST', '/api/bulk-insert', {'table': 'bench_tmp', 'rows': [{'id': i, 'v': 'b'} for i in range(2, 50)]}),
+            ('POST', '/api/select', dict(select, limit=10)),
+            ('POST', '/api/select', dict(select, stream=True)),
+            ('POST', '/api/update', {'table': 'bench_tmp', 'set': {'v': 'c'}, 'filter': {'field': 'id', 'value': 1}}),
+            ('POST', '/api/delete', {'table': 'bench_tmp', 'filter': {'field': 'id', 'op': '>', 'value': 25}}),
+            ('POST', '/api/explain', select),
+            ('POST', '/api/index-advice', {}),
+            ('POST', '/api/create-index', {'table': 'bench_tmp', 'columns': ['v'], 'name': 'idx_bench_v'}),
+            ('POST', '/api/drop-index', {'table': 'bench_tmp', 'name': 'idx_bench_v'}),
+            ('POST', '/api/execute-script', {'script': 'SELECT 1; DROP TABLE bench_tmp;'}),
+            ('GET', '/api/aggregates', None),
+            ('POST', '/api/aggregates/rebuild', None),
+            ('GET', '/api/cache', None),
+            ('GET', '/api/slow-queries', None),
+            ('GET', '/metrics', None),
+        ]
+
+
+    def checks(self):
+        return [('prepared statement reuse', self.check_prepared_reuse)]
+
+    def global_status(self, name):
+        for table in ('information_schema.GLOBAL_STATUS', 'performance_schema.global_status'):
+            try:
+                result = self.client.call('POST', '/api/execute-query', {
+                    'query': f"SELECT VARIABLE_VALUE AS value FROM {table} WHERE VARIABLE_NAME = '{name}'",
+                    'cache': 'bypass'})
+            except BenchError:
+                continue
+            if result['records']:
+                return int(result['records'][0]['value'])
+        raise BenchError(f'{name} is not readable from information_schema or performance_schema')
+
+    def check_prepared_reuse(self):
+        """Equal filtered selects must reuse the statement prepared on a warm connection"""
+        select = {'table': 'Employee', 'filter': {'field': 'C_ID', 'value': 1}, 'limit': 1, 'cache': 'bypass'}
+        # Sequential requests rotate through the idle connections; prepare on each of them first
+        for _ in range(self.args.workers + 4):
+            self.client.call('POST', '/api/select', select)
+        before = self.global_status('COM_STMT_PREPARE')
+        self.client.call('POST', '/api/select', select)
+        self.client.call('POST', '/api/select', select)
+        prepared = self.global_status('COM_STMT_PREPARE') - before
+        if prepared:
+            return f'two identical selects prepared {prepared} statement(s) again'
+        return None
+
+
+class MongoWorkload(Workload):
+    name = 'mongo'
+    backend = 'mongo'
+
+    def connect(self, collection):
+        self.client.call('POST', '/api/connect', {'password': 'bench', 'database': self.args.mongo_database,
+                                                  'collection': collection})
+
+    def replace_all(self, collection, documents):
+        """Empty a collection and insert ``documents`` through /api/bulk"""
+        self.connect(collection)
+        operations = [{'op': 'delete', 'filter': {'_id': {'$exists': True}}, 'multiple': True}]
+        operations += [{'op': 'insert', 'document': doc} for doc in documents]
+        self.client.call('POST', '/api/bulk', {'operations': operations})
+
+    def seed(self):
+        args = self.args
+        rng = random.Random(args.seed)
+        self.replace_all('companies', [
+            {'C_ID': c_id, 'C_Name': self.company_name(c_id), 'City': rng.choice(CITIES)}
+            for c_id in range(1, args.companies + 1)
+        ])
+        self.replace_all('departments', [
+            {'D_ID': d_id, 'D_Name': DEPARTMENTS[d_id % len(DEPARTMENTS)],
+             'Manager_ID': rng.randint(1, args.employees), 'C_ID': rng.randint(1, args.companies)}
+            for d_id in range(1, args.departments + 1)
+        ])
+        self.replace_all('employees', [self.employee(rng, e_id) for e_id in range(1, args.employees + 1)])
+        self.next_id = args.employees + 1
+
+    def operations(self):
+        args = self.args
+        companies = args.companies
+
+        def read_company(rng):
+            return 'POST', '/api/read', {'filter': {'C_ID': rng.randint(1, companies)}, 'limit': 50}
+
+        def read_page(rng):
+            return 'POST', '/api/read', {'filter': {'Salary': {'$gte': rng.randrange(25000, 200000, 500)}},
+                                         'sort': {'Salary': 1}, 'paginate': True, 'limit': 100}
+
+        def avg_salary(rng):
+            return 'POST', '/api/aggregate', {'pipeline': [
+                {'$match': {'C_ID': rng.randint(1, companies)}},
+                {'$group': {'_id': '$C_ID', 'avg': {'$avg': '$Salary'}, 'count': {'$sum': 1},
+                            'max': {'$max': '$Salary'}, 'min': {'$min': '$Salary'}}}
+            ], 'cache': 'bypass'}
+
+        def avg_salary_cached(rng):
+            method, path, body = avg_salary(rng)
+            return method, path, dict(body, cache=None)
+
+        def create(rng):
+            e_id = self.new_id()
+            self.remember_insert(e_id)
+            return 'POST', '/api/create', {'document': self.employee(rng, e_id)}
+
+        def update(rng):
+            return 'POST', '/api/update', {'filter': {'E_ID': rng.randint(1, args.employees)},
+                                           'update': {'$set': {'Salary': rng.randrange(25000, 200000, 500)}}}
+
+        def delete(rng):
+            e_id = self.take_inserted()
+            if e_id is None:
+                return create(rng)
+            return 'POST', '/api/delete', {'filter': {'E_ID': e_id}}
+
+        def bulk(rng):
+            operations = []
+            for _ in range(100):
+                e_id = self.new_id()
+                self.remember_insert(e_id)
+                operations.append({'op': 'insert', 'document': self.employee(rng, e_id)})
+            return 'POST', '/api/bulk', {'operations': operations}
+
+        reads = [
+            (40, 'read_by_company', read_company),
+            (20, 'read_keyset_page', read_page),
+            (20, 'aggregate_avg_salary', avg_salary),
+            (15, 'aggregate_avg_salary_cached', avg_salary_cached),
+            (5, 'status', lambda rng: ('GET', '/api/status', None)),
+        ]
+        writes = [
+            (35, 'create', create),
+            (35, 'update_salary', update),
+            (25, 'delete', delete),
+            (5, 'bulk_100', bulk),
+        ]
+        return reads, writes
+
+    def smoke(self):
+        pipeline = [{'$group': {'_id': '$C_ID', 'n': {'$sum': 1}}}]
+        return [
+            ('GET', '/api/status', None),
+            ('GET', '/api/collections', None),
+            ('GET', '/api/stats', None),
+            ('POST', '/api/create', {'document': {'E_ID': 0, 'E_Name': 'smoke'}}),
+            ('POST', '/api/read', {'filter': {'C_ID': 1}, 'limit': 10}),
+            ('POST', '/api/read', {'filter': {'C_ID': 1}, 'stream': True}),
+            ('POST', '/api/update', {'filter': {'E_ID': 0}, 'update': {'$set': {'E_Name': 'smoke2'}}}),
+            ('POST', '/api/delete', {'filter': {'E_ID': 0}}),
+            ('POST', '/api/bulk', {'operations': [{'op': 'insert', 'document': {'E_ID': -1}},
+                                                  {'op': 'delete', 'filter': {'E_ID': -1}}]}),
+            ('POST', '/api/aggregate', {'pipeline': pipeline}),
+            ('POST', '/api/aggregate', {'pipeline': pipeline, 'stream': True, 'allow_disk_use': True}),
+            ('POST', '/api/explain', {'filter': {'C_ID': 1}}),
+            ('GET', '/api/index-advice', None),
+            ('POST', '/api/create-index', {'keys': [['C_ID', 1], ['Salary', 1]], 'name': 'bench_c_salary'}),
+            ('POST', '/api/drop-index', {'name': 'bench_c_salary'}),
+            ('GET', '/api/slow-queries', None),
+            ('GET', '/metrics', None),
+        ]
+
+
+def run_smoke(workload, client):
+    """Call every route once, then run the workload's checks
+
+    Returns {"METHOD path" or "check name": {"ok", "ms", "error"}}.
+    """
+    results = {}
+    for method, path, body in workload.smoke():
+        name = f'{method} {path}'
+        started = time.perf_counter()
+        try:
+            status, raw = client.request(method, path, body)
+            ok, error = status < 400, None if status < 400 else raw[:200].decode(errors='replace')
+        except OSError as e:
+            ok, error = False, str(e)
+        entry = {'ok': ok, 'ms': round((time.perf_counter() - started) * 1000, 3)}
+        if error:
+            entry['error'] = error
+        # Routes can appear twice (e.g. buffered and streamed); keep both
+        while name in results:
+            name += "'"
+        results[name] = entry
+    for name, check in workload.checks():
+        started = time.perf_counter()
+        try:
+            error = check()
+        except (BenchError, OSError) as e:
+            error = str(e)
+        entry = {'ok': error is None, 'ms': round((time.perf_counter() - started) * 1000, 3)}
+        if error:
+            entry['error'] = error
+        results[f'check {name}'] = entry
+    return results
+
+
+def run_load(workload, port, args):
+    """Drive the weighted operation mix from ``args.workers`` threads"""
+    reads, writes = workload.operations()
+    samples, errors = {}, {}
+    stop_at = time.monotonic() + args.duration
+    remaining = [args.requests] if args.requests else None
+    lock = threading.Lock()
+
+    def pick(rng, choices):
+        total = sum(weight for weight, _, _ in choices)
+        point = rng.uniform(0, total)
+        for weight, name, fn in choices:
+            point -= weight
+            if point <= 0:
+                return name, fn
+        return choices[-1][1], choices[-1][2]
+
+    def worker(index):
+        rng = random.Random(args.seed * 1000 + index)
+        client = Client(port)
+        local_samples, local_errors = {}, {}
+        while time.monotonic() < stop_at:
+            if remaining is not None:
+                with lock:
+                    if remaining[0] <= 0:
+                        break
+                    remaining[0] -= 1
+            name, fn = pick(rng, writes if rng.random() < args.write_ratio else reads)
+            method, path, body = fn(rng)
+            started = time.perf_counter()
+            try:
+                status, _ = client.request(method, path, body)
+                failed = status >= 400
+            except OSError:
+                failed = True
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if failed:
+                local_errors[name] = local_errors.get(name, 0) + 1
+            else:
+                local_samples.setdefault(name, []).append(round(elapsed_ms, 3))
+        with lock:
+            for name, values in local_samples.items():
+                samples.setdefault(name, []).extend(values)
+            for name, count in local_errors.items():
+                errors[name] = errors.get(name, 0) + count
+
+    # Warm-up: prime pools, caches and prepared statements before measuring
+    warm = Client(port)
+    warm_rng = random.Random(args.seed)
+    for _ in range(args.warmup):
+        _, fn = pick(warm_rng, reads)
+        try:
+            warm.request(*fn(warm_rng))
+        except OSError:
+            pass
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    total = sum(len(values) for values in samples.values())
+    return {
+        'elapsed_s': round(elapsed, 3),
+        'total_requests': total,
+        'total_errors': sum(errors.values()),
+        'throughput_rps': round(total / elapsed, 2) if elapsed else None,
+        'endpoints': summarize(samples, errors, elapsed),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_target(workload_class, port, args, mock=False, env=None):
+    process = start_server(workload_class.backend, port, mock, env)
+    try:
+        client = Client(port)
+        workload = workload_class(args, client)
+        seed_started = time.perf_counter()
+        workload.seed()
+        seed_s = round(time.perf_counter() - seed_started, 3)
+        smoke = run_smoke(workload, client)
+        load = run_load(workload, port, args)
+        return dict(load, seed_s=seed_s, smoke=smoke)
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--target', choices=['mysql', 'mongo', 'both'], default='both')
+    parser.add_argument('--companies', type=int, default=50)
+    parser.add_argument('--employees', type=int, default=10000)
+    parser.add_argument('--departments', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30, help='seconds of load per target')
+    parser.add_argument('--requests', type=int, default=0, help='stop after N requests (0 = run for --duration)')
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    parser.add_argument('--warmup', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--mysql-port-api', type=int, default=5101)
+    parser.add_argument('--mongo-port-api', type=int, default=5100)
+    parser.add_argument('--mysql-host', default='127.0.0.1')
+    parser.add_argument('--mysql-port', type=int, default=3306)
+    parser.add_argument('--mysql-user', default='root')
+    parser.add_argument('--mysql-password', default='')
+    parser.add_argument('--mysql-database', default='dbconn_bench')
+    parser.add_argument('--mongo-uri', default=os.environ.get('DBCONN_MONGO_URI', 'mongodb://localhost:27017'))
+    parser.add_argument('--mongo-database', default='dbconn_bench')
+    parser.add_argument('--mongo-mock', action='store_true', help='use mongomock instead of a mongod')
+    parser.add_argument('--output', help='JSON results path (default benchmarks/results/<commit>-<time>.json)')
+    args = parser.parse_args()
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'started_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'args': vars(args),
+        },
+        'targets': {}
+    }
+
+    if args.target in ('mysql', 'both'):
+        report['targets']['mysql'] = run_target(MySQLWorkload, args.mysql_port_api, args)
+    if args.target in ('mongo', 'both'):
+        report['targets']['mongo'] = run_target(MongoWorkload, args.mongo_port_api, args, args.mongo_mock,
+                                                {'DBCONN_MONGO_URI': args.mongo_uri})
+
+    output = args.output or os.path.join(
+        HERE, 'results', f"{report['meta']['commit'] or 'nogit'}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    for target, result in report['targets'].items():
+        print(f"\n{target}: {result['throughput_rps']} req/s, {result['total_errors']} errors, "
+              f"{sum(not s['ok'] for s in result['smoke'].values())} failed smoke calls")
+        print(f"  {'endpoint':32} {'req/s':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'errors':>7}")
+        for name, stats in result['endpoints'].items():
+            print(f"  {name:32} {stats['throughput_rps'] or 0:>9} {stats['p50_ms'] or 0:>9} "
+                  f"{stats['p95_ms'] or 0:>9} {stats['p99_ms'] or 0:>9} {stats['errors']:>7}")
+    print(f'\nResults written to {output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Serialization cost per 10k Mongo documents
+
+Compares the encoders available to the Mongo backend on synthetic documents
+with nested ObjectIds, datetimes, Decimal128 and binary fields:
+
+    python benchmarks/serialization_bench.py [--docs 10000] [--repeat 5]
+"""
+import argparse
+import datetime
+import json
+import os
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'dbconn'))
+
+from bson import ObjectId, json_util
+from bson.binary import Binary
+from bson.decimal128 import Decimal128
+
+import serialization
+
+
+def make_documents(count):
+    """Documents shaped like a typical users/orders collection"""
+    now = datetime.datetime(2024, 1, 1)
+    return [{
+        '_id': ObjectId(),
+        'name': f'user-{i}',
+        'age': 20 + i % 50,
+        'created_at': now + datetime.timedelta(seconds=i),
+        'balance': Decimal128(Decimal(f'{i}.25')),
+        'avatar': Binary(b'\x00\x01' * 8),
+        'address': {'city': 'Pune', 'owner_id': ObjectId()},
+        'orders': [{'order_id': ObjectId(), 'total': Decimal128('19.99'), 'at': now} for _ in range(3)],
+    } for i in range(count)]
+
+
+def timed(fn, repeat):
+    """Best wall time of ``repeat`` runs, in milliseconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--docs', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    docs = make_documents(args.docs)
+
+    cases = {
+        'json.dumps(default=str)': lambda: json.dumps(docs, default=str),
+        'bson.json_util.dumps': lambda: json_util.dumps(docs),
+        f'serialization.dumps ({"orjson" if serialization.orjson else "stdlib"})': lambda: serialization.dumps(docs),
+    }
+
+    scale = 10000 / args.docs
+    results = {name: round(timed(fn, args.repeat) * scale, 2) for name, fn in cases.items()}
+
+    width = max(len(name) for name in results)
+    print(f"{'encoder'.ljust(width)}  ms per 10k docs")
+    for name, ms in results.items():
+        print(f'{name.ljust(width)}  {ms:>10.2f}')
+    print(json.dumps({'docs': args.docs, 'ms_per_10k': results}))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+"""Run one backend for benchmarking: threaded, no debugger, no reloader
+
+    python benchmarks/serve.py mysql --port 5001
+    python benchmarks/serve.py mongo --port 5000 [--mock]
+
+``--mock`` swaps PyMongo's client for mongomock's in-memory one, so the
+Mongo API can be measured without a mongod (cluster-only features such as
+$merge, explain and collStats are then unavailable or approximate). Without
+it, set DBCONN_MONGO_URI to a local mongod.
+"""
+import argparse
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+APP_DIRS = {'mysql': 'dbconn-mysql', 'mongo': 'dbconn'}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('backend', choices=sorted(APP_DIRS))
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, required=True)
+    parser.add_argument('--mock', action='store_true', help='serve the Mongo API from mongomock')
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.join(ROOT, APP_DIRS[args.backend]))
+    import backend
+
+    if args.mock:
+        import mongomock
+        backend.MongoClient = lambda uri, **kwargs: mongomock.MongoClient()
+
+    backend.app.run(host=args.host, port=args.port, threaded=True, debug=False, use_reloader=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+import re
+import threading
+from collections import Counter, deque
+
+# column <op> in raw WHERE text
+_RAW_PREDICATE = re.compile(
+    r'`?(\w+)`?\s*(<=>|<=|>=|<>|!=|=|<|>|\bNOT\s+IN\b|\bIN\b|\bBETWEEN\b|\bNOT\s+LIKE\b|\bLIKE\b|\bIS\b)',
+    re.IGNORECASE
+)
+
+_EQUALITY_OPS = {'=', '<=>', 'IN', 'IS', 'IS NULL'}
+
+
+def filter_columns(node, equality, ranges):
+    """Collect indexable columns from the AND-only part of a structured filter"""
+    if not isinstance(node, dict):
+        return
+    if 'and' in node:
+        for child in node['and']:
+            filter_columns(child, equality, ranges)
+        return
+    if 'or' in node or 'not' in node or 'field' not in node:
+        # Disjunctions and negations can't use one composite index
+        return
+    field = node['field'].split('.')[-1]
+    op = str(node.get('op', '=')).strip().upper()
+    if 'range' not in node and op in _EQUALITY_OPS and not (op == 'IN' and len(node.get('value') or []) > 1):
+        equality.add(field)
+    elif op not in ('!=', '<>', 'NOT IN', 'NOT LIKE', 'IS NOT NULL'):
+        ranges.add(field)
+
+
+def where_columns(where, equality, ranges):
+    """Best-effort column extraction from raw WHERE text joined by AND"""
+    if re.search(r'\bOR\b|\(\s*SELECT\b', where, re.IGNORECASE):
+        return
+    for column, op in _RAW_PREDICATE.findall(where):
+        op = re.sub(r'\s+', ' ', op.upper())
+        if op in _EQUALITY_OPS:
+            equality.add(column)
+        elif op not in ('!=', '<>', 'NOT IN', 'NOT LIKE'):
+            ranges.add(column)
+
+
+def find_full_scans(plan):
+    """Tables read with a full scan in an ``EXPLAIN FORMAT=JSON`` plan"""
+    scans = []
+
+    def walk(node):
+        if isinstance(node, dict):
+            if node.get('access_type') == 'ALL':
+                scans.append({
+                    'table': node.get('table_name'),
+                    'rows': node.get('rows_examined_per_scan', node.get('rows')),
+                    'possible_keys': node.get('possible_keys'),
+                    'attached_condition': node.get('attached_condition')
+                })
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(plan)
+    return scans
+
+
+class IndexAdvisor:
+    """Suggests composite indexes from the shapes of recent selects
+
+    Each recorded select contributes its equality columns, range columns and
+    ORDER BY column. Suggestions follow the equality, sort, range rule so one
+    index serves the filter, the ordering and the range seek, and shapes
+    already covered by the prefix of an existing index are skipped.
+    """
+
+    def __init__(self, history=1000):
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=history)
+
+    def record_select(self, table_name, data, order_by=None):
+        """Remember the filter and sort columns of one /api/select request"""
+        equality, ranges = set(), set()
+        if data.get('filter'):
+            filter_columns(data['filter'], equality, ranges)
+        if data.get('where'):
+            where_columns(data['where'], equality, ranges)
+        if not equality and not ranges and not order_by:
+            return
+        shape = (table_name, tuple(sorted(equality)), tuple(sorted(ranges - equality)), order_by)
+        with self._lock:
+            self._recent.append(shape)
+
+    def suggest(self, existing_indexes, table_name=None, limit=10):
+        """Rank index suggestions for recent selects
+
+        ``existing_indexes(table)`` returns the column lists of indexes the
+        table already has.
+        """
+        with self._lock:
+            shapes = Counter(shape for shape in self._recent
+                             if table_name is None or shape[0].lower() == table_name.lower())
+
+        suggestions = {}
+        for (table, equality, ranges, order_by), count in shapes.items():
+            columns = list(equality)
+            if order_by and order_by not in columns:
+                columns.append(order_by)
+            elif ranges:
+                # Only the first range column can still seek after the equalities
+                columns.append(ranges[0])
+            if not columns:
+                continue
+            key = (table, tuple(columns))
+            if key in suggestions:
+                suggestions[key]['occurrences'] += count
+                continue
+            covered = any([col.lower() for col in index[:len(columns)]] == [col.lower() for col in columns]
+                          for index in existing_indexes(table))
+            if covered:
+                continue
+            name = 'idx_' + '_'.join(columns)
+            suggestions[key] = {
+                'table': table,
+                'columns': columns,
+                'occurrences': count,
+                'statement': f"CREATE INDEX `{name[:64]}` ON `{table}` ({', '.join(f'`{c}`' for c in columns)})"
+            }
+
+        ranked = sorted(suggestions.values(), key=lambda s: s['occurrences'], reverse=True)
+        return ranked[:limit]
+
+    def clear(self):
+        with self._lock:
+            self._recent.clear()
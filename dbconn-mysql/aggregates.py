@@ -0,0 +1,157 @@
+EMPLOYEE_TABLE = 'Employee'
+COMPANY_TABLE = 'Company'
+SUMMARY_TABLE = 'Company_Salary_Summary'
+
+# Composite index that turns the MIN/MAX recomputation into two index dives
+SALARY_INDEX = 'idx_employee_company_salary'
+
+CREATE_SUMMARY = f"""
+CREATE TABLE IF NOT EXISTS `{SUMMARY_TABLE}` (
+    C_ID            INT             PRIMARY KEY,
+    employee_count  INT             NOT NULL DEFAULT 0,
+    salary_count    INT             NOT NULL DEFAULT 0,
+    salary_sum      DECIMAL(20,2)   NOT NULL DEFAULT 0,
+    salary_max      DECIMAL(10,2)   NULL,
+    salary_min      DECIMAL(10,2)   NULL
+)
+"""
+
+
+def _add(row):
+    """Trigger statement adding one employee row (NEW or OLD) to its company"""
+    return f"""
+    IF {row}.C_ID IS NOT NULL THEN
+        INSERT INTO `{SUMMARY_TABLE}` (C_ID, employee_count, salary_count, salary_sum, salary_max, salary_min)
+        VALUES ({row}.C_ID, 1, {row}.Salary IS NOT NULL, COALESCE({row}.Salary, 0), {row}.Salary, {row}.Salary)
+        ON DUPLICATE KEY UPDATE
+            employee_count = employee_count + 1,
+            salary_count = salary_count + ({row}.Salary IS NOT NULL),
+            salary_sum = salary_sum + COALESCE({row}.Salary, 0),
+            salary_max = GREATEST(COALESCE(salary_max, {row}.Salary), COALESCE({row}.Salary, salary_max)),
+            salary_min = LEAST(COALESCE(salary_min, {row}.Salary), COALESCE({row}.Salary, salary_min));
+    END IF;"""
+
+
+def _remove(row):
+    """Trigger statement removing one employee row from its company
+
+    COUNT and SUM are adjusted by the delta. MAX and MIN can't be, so they
+    are re-read from Employee when the removed salary was one of them.
+    """
+    return f"""
+    IF {row}.C_ID IS NOT NULL THEN
+        UPDATE `{SUMMARY_TABLE}` SET
+            employee_count = employee_count - 1,
+            salary_count = salary_count - ({row}.Salary IS NOT NULL),
+            salary_sum = salary_sum - COALESCE({row}.Salary, 0)
+        WHERE C_ID = {row}.C_ID;
+        UPDATE `{SUMMARY_TABLE}` SET
+            salary_max = (SELECT MAX(Salary) FROM `{EMPLOYEE_TABLE}` WHERE C_ID = {row}.C_ID),
+            salary_min = (SELECT MIN(Salary) FROM `{EMPLOYEE_TABLE}` WHERE C_ID = {row}.C_ID)
+        WHERE C_ID = {row}.C_ID AND {row}.Salary IS NOT NULL
+          AND ({row}.Salary >= salary_max OR {row}.Salary <= salary_min);
+    END IF;"""
+
+
+# name: (table, timing, body)
+TRIGGERS = {
+    'trg_employee_summary_insert': (EMPLOYEE_TABLE, 'AFTER INSERT', _add('NEW')),
+    'trg_employee_summary_delete': (EMPLOYEE_TABLE, 'AFTER DELETE', _remove('OLD')),
+    # Only changes to C_ID or Salary touch the summary
+    'trg_employee_summary_update': (EMPLOYEE_TABLE, 'AFTER UPDATE', f"""
+    IF NOT (OLD.C_ID <=> NEW.C_ID AND OLD.Salary <=> NEW.Salary) THEN
+        {_remove('OLD')}
+        {_add('NEW')}
+    END IF;"""),
+    # Employee.C_ID is ON DELETE SET NULL / ON UPDATE CASCADE, and cascades don't
+    # fire the Employee triggers, so follow the company here instead: its
+    # employees drop out of every summary, or move with it to the new C_ID
+    'trg_company_summary_delete': (COMPANY_TABLE, 'BEFORE DELETE', f"""
+    DELETE FROM `{SUMMARY_TABLE}` WHERE C_ID = OLD.C_ID;"""),
+    'trg_company_summary_update': (COMPANY_TABLE, 'AFTER UPDATE', f"""
+    IF NOT (OLD.C_ID <=> NEW.C_ID) THEN
+        DELETE FROM `{SUMMARY_TABLE}` WHERE C_ID = NEW.C_ID;
+        UPDATE `{SUMMARY_TABLE}` SET C_ID = NEW.C_ID WHERE C_ID = OLD.C_ID;
+    END IF;"""),
+}
+
+REBUILD_SUMMARY = f"""
+INSERT INTO `{SUMMARY_TABLE}` (C_ID, employee_count, salary_count, salary_sum, salary_max, salary_min)
+SELECT c.C_ID, COUNT(e.E_ID), COUNT(e.Salary), COALESCE(SUM(e.Salary), 0), MAX(e.Salary), MIN(e.Salary)
+FROM `{COMPANY_TABLE}` c
+LEFT JOIN `{EMPLOYEE_TABLE}` e ON e.C_ID = c.C_ID
+GROUP BY c.C_ID
+"""
+
+SELECT_SUMMARY = f"""
+SELECT c.C_ID, c.C_Name,
+       COALESCE(s.employee_count, 0) AS employee_count,
+       COALESCE(s.salary_sum, 0) AS total_salary,
+       CASE WHEN s.salary_count > 0 THEN s.salary_sum / s.salary_count END AS avg_salary,
+       s.salary_max AS max_salary,
+       s.salary_min AS min_salary
+FROM `{COMPANY_TABLE}` c
+LEFT JOIN `{SUMMARY_TABLE}` s ON s.C_ID = c.C_ID
+"""
+
+
+def install(cursor):
+    """Create the summary table, the Employee and Company triggers and the salary index
+
+    Triggers are replaced, so running this again picks up changes to them.
+    """
+    cursor.execute(CREATE_SUMMARY)
+    cursor.execute(
+        "SELECT COUNT(*) AS n FROM information_schema.statistics "
+        "WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s",
+        (EMPLOYEE_TABLE, SALARY_INDEX)
+    )
+    if not cursor.fetchone()['n']:
+        cursor.execute(f"CREATE INDEX `{SALARY_INDEX}` ON `{EMPLOYEE_TABLE}` (C_ID, Salary)")
+    for name, (table, timing, body) in TRIGGERS.items():
+        cursor.execute(f"DROP TRIGGER IF EXISTS `{name}`")
+        cursor.execute(f"CREATE TRIGGER `{name}` {timing} ON `{table}` FOR EACH ROW BEGIN {body}\nEND")
+    return list(TRIGGERS)
+
+
+def installed_triggers(cursor):
+    """Names of the summary triggers present in the current database"""
+    cursor.execute(
+        "SELECT TRIGGER_NAME FROM information_schema.triggers "
+        "WHERE trigger_schema = DATABASE() AND event_object_table IN (%s, %s)",
+        (EMPLOYEE_TABLE, COMPANY_TABLE)
+    )
+    return sorted(row['TRIGGER_NAME'] for row in cursor.fetchall() if row['TRIGGER_NAME'] in TRIGGERS)
+
+
+def rebuild(conn, cursor):
+    """Recompute every summary row from Employee in one transaction
+
+    Locks Employee and Company for the duration so no trigger delta lands
+    between the delete and the re-insert. Also repairs a summary from before
+    the Company triggers were installed.
+    """
+    # Connections run with autocommit off, so this is all one transaction
+    try:
+        for table, key in ((COMPANY_TABLE, 'C_ID'), (EMPLOYEE_TABLE, 'E_ID')):
+            cursor.execute(f"SELECT {key} FROM `{table}` LOCK IN SHARE MODE")
+            cursor.fetchall()
+        cursor.execute(f"DELETE FROM `{SUMMARY_TABLE}`")
+        cursor.execute(REBUILD_SUMMARY)
+        rows = cursor.rowcount
+        conn.commit()
+        return rows
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def lookup(cursor, c_id=None, company=None):
+    """Per-company salary stats, for one company or all of them"""
+    if c_id is not None:
+        cursor.execute(SELECT_SUMMARY + " WHERE c.C_ID = %s", (int(c_id),))
+    elif company is not None:
+        cursor.execute(SELECT_SUMMARY + " WHERE c.C_Name = %s", (company,))
+    else:
+        cursor.execute(SELECT_SUMMARY + " ORDER BY c.C_ID")
+    return cursor.fetchall()
@@ -1,43 +1,304 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, Response, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 import mysql.connector
 from mysql.connector import Error
+import base64
 import json
 import os
+import time
+
+import aggregates
+from advisor import IndexAdvisor, find_full_scans
+from export import DEFAULT_BATCH_ROWS, arrow_types, check_options, content_type, cursor_batches, export_chunks
+from federation import JOIN_TYPES, Source, hash_join, mongo_export
+from filters import compile_filter
+from metrics import Metrics, instrument_json
+from catalog import Catalog, is_ddl
+from compression import Compression, content_etag
+from cache import ResultCache, estimate_size, is_cacheable, referenced_tables
+from pool import ConnectionPool
+from replicas import is_read_only, replica_set
+from script import changes_database, split_statements
+from slowlog import SlowQueryLog, rows_examined
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
+app.json = instrument_json(DefaultJSONProvider)(app)  # Times jsonify for /metrics
+
+# Request, database and serialization timings served at /metrics
+metrics = Metrics('dbconn_mysql')
+metrics.install(app)
+
+# gzip/brotli/zstd response bodies and ETag/304 for GETs; runs before the metrics hook
+compression = Compression()
+compression.install(app)
 
-# MySQL connection
-connection = None
+# MySQL connection pool
+pool = None
 current_database = None
 current_table = None
 
-def connect_to_mysql(host, port, username, password, database):
-    """Connect to MySQL with the provided credentials"""
-    global connection, current_database
+# Read replicas for SELECTs, set up by /api/connect when it lists any
+replicas = None
+
+# Requests sending this header are told apart for read-your-writes; others by address
+SESSION_HEADER = 'X-DBConn-Session'
+
+# SELECT result cache, rebuilt on every /api/connect
+result_cache = ResultCache()
+
+# Schema metadata cache, rebuilt on every /api/connect
+catalog = None
+
+# Statements slower than the threshold, rebuilt on every /api/connect
+slow_log = SlowQueryLog()
+
+# Filter/sort shapes of recent selects, for index suggestions
+advisor = IndexAdvisor()
+
+# Rows per multi-row INSERT (and per commit) in /api/bulk-insert
+DEFAULT_CHUNK_SIZE = 1000
+
+# Statements sent per multi-statement round trip in /api/execute-script
+DEFAULT_SCRIPT_BATCH = 50
+
+# The Mongo app (dbconn/backend.py) that /api/federated-query reads collections from
+MONGO_API_URL = os.environ.get('DBCONN_MONGO_API', 'http://localhost:5000')
+
+def connect_to_mysql(host, port, username, password, database, pool_options=None, replica_options=None):
+    """Build a connection pool for MySQL with the provided credentials
+
+    ``replica_options`` (``hosts``, ``max_lag``, ``check_interval``) adds read
+    replicas that share the primary's credentials unless a host overrides them.
+    """
+    global pool, replicas, current_database
     
+    connect_kwargs = {'host': host, 'port': port, 'user': username, 'password': password, 'database': database}
+    new_replicas = None
     try:
-        connection = mysql.connector.connect(
-            host=host,
-            port=port,
-            user=username,
-            password=password,
-            database=database
-        )
+        new_pool = ConnectionPool(**connect_kwargs, **(pool_options or {}))
         
-        if connection.is_connected():
-            current_database = database
-            return True, f"Connected successfully to MySQL database: {database}"
-    except Error as e:
+        # Borrow once so bad credentials fail here rather than on first query
+        conn = new_pool.acquire()
+        new_pool.release(conn)
+        
+        if replica_options and replica_options.get('hosts'):
+            new_replicas = replica_set(replica_options['hosts'], connect_kwargs, pool_options,
+                                       float(replica_options.get('max_lag', 5)),
+                                       float(replica_options.get('check_interval', 5)))
+    except (Error, ValueError, TypeError) as e:
         return False, f"MySQL connection error: {str(e)}"
+    
+    old_pool, pool = pool, new_pool
+    if old_pool:
+        old_pool.close()
+    old_replicas, replicas = replicas, new_replicas
+    if old_replicas:
+        old_replicas.close()
+    current_database = database
+    return True, f"Connected successfully to MySQL database: {database}"
+
+def get_connection():
+    """Borrow a pooled connection for the current request"""
+    if 'db_conn' not in g:
+        g.db_pool = pool
+        g.db_conn = pool.acquire()
+    return g.db_conn
+
+def get_read_connection():
+    """Borrow a connection for read-only statements
+
+    A replica when one is healthy and caught up, otherwise the primary. Once
+    a request has used the primary its reads stay there.
+    """
+    if 'read_conn' in g:
+        return g.read_conn
+    if replicas is not None and 'db_conn' not in g:
+        borrowed = replicas.acquire(client_id())
+        if borrowed is not None:
+            g.read_replica, g.read_conn = borrowed
+            return g.read_conn
+    return get_connection()
+
+@app.teardown_request
+def release_connection(exc):
+    """Return the request's connections to the pools they came from"""
+    conn = g.pop('db_conn', None)
+    db_pool = g.pop('db_pool', None)
+    if conn is not None:
+        db_pool.release(conn)
+    read_conn = g.pop('read_conn', None)
+    replica = g.pop('read_replica', None)
+    if read_conn is not None:
+        replica.release(read_conn)
 
 def get_cursor():
     """Get a cursor for executing queries"""
-    if connection and connection.is_connected():
-        return connection.cursor(dictionary=True)
+    if pool:
+        return get_connection().cursor(dictionary=True)
+    return None
+
+def get_read_cursor():
+    """Get a cursor for read-only queries, on a replica when one is usable"""
+    if pool:
+        return get_read_connection().cursor(dictionary=True)
     return None
 
+def run_prepared(query, params, read=False):
+    """Execute on the connection's cached prepared cursor for this statement"""
+    conn = get_read_connection() if read else get_connection()
+    db_pool = g.read_replica.pool if conn is g.get('read_conn') else g.db_pool
+    # Execute the cached string itself; an equal but new string would be re-prepared
+    statement, cursor = db_pool.statements(conn).cursor(query)
+    cursor.execute(statement, params)
+    return cursor
+
+def client_id():
+    """Who a request is from, for read-your-writes: its session header or address"""
+    return request.headers.get(SESSION_HEADER) or request.remote_addr
+
+def mark_written(tables=None):
+    """Drop cached results for written tables; the writer's reads stay on the primary while replicas catch up"""
+    result_cache.invalidate(tables)
+    if replicas is not None:
+        replicas.note_write(client_id())
+
+def build_where(data, params):
+    """Combine the structured ``filter`` and raw ``where`` of a request
+
+    Values from the structured filter are appended to ``params``. Returns the
+    WHERE condition (or '') and whether the statement is fully parameterized.
+    """
+    conditions = []
+    if data.get('filter'):
+        filter_sql, filter_params = compile_filter(data['filter'])
+        conditions.append(filter_sql)
+        params.extend(filter_params)
+    # Raw WHERE text is kept as a fallback; its literals make every statement unique
+    if data.get('where'):
+        conditions.append(f"({data['where']})")
+    return ' AND '.join(conditions), not data.get('where')
+
+def build_insert(table_name, record_data):
+    """INSERT statement and values for one record"""
+    if not table_name or not record_data:
+        raise ValueError('Table name and data are required')
+    columns = list(record_data.keys())
+    values = list(record_data.values())
+    
+    placeholders = ', '.join(['%s'] * len(values))
+    columns_str = ', '.join([f'`{col}`' for col in columns])
+    
+    return f"INSERT INTO `{table_name}` ({columns_str}) VALUES ({placeholders})", values
+
+def build_update(data):
+    """UPDATE statement, values and whether it is fully parameterized"""
+    table_name = data.get('table')
+    set_clause = data.get('set', {})
+    if not table_name or not set_clause:
+        raise ValueError('Table name and SET clause are required')
+    
+    set_parts = []
+    values = []
+    for column, value in set_clause.items():
+        set_parts.append(f"`{column}` = %s")
+        values.append(value)
+    
+    query = f"UPDATE `{table_name}` SET {', '.join(set_parts)}"
+    
+    where_sql, prepared = build_where(data, values)
+    if where_sql:
+        query += f" WHERE {where_sql}"
+    return query, values, prepared
+
+def build_delete(data):
+    """DELETE statement, values and whether it is fully parameterized"""
+    table_name = data.get('table')
+    if not table_name:
+        raise ValueError('Table name is required')
+    
+    params = []
+    where_sql, prepared = build_where(data, params)
+    if not where_sql:
+        raise ValueError('WHERE clause or filter is required for safety')
+    return f"DELETE FROM `{table_name}` WHERE {where_sql}", params, prepared
+
+def cached_select(cursor, query, params=None, bypass=False, prepared=False):
+    """Run a SELECT through the result cache; returns (records, cache_hit)"""
+    key = result_cache.make_key(current_database, query, params) if not bypass and is_cacheable(query) else None
+    cacheable = key is not None
+    if cacheable:
+        version = result_cache.version
+        records = result_cache.get(key)
+        if records is not None:
+            return records, True
+    
+    started = time.perf_counter()
+    with metrics.db_timer():
+        if prepared:
+            records = run_prepared(query, params, read=True).fetchall()
+        else:
+            cursor.execute(query, params or None)
+            records = cursor.fetchall()
+    elapsed = time.perf_counter() - started
+    if slow_log.is_slow(elapsed):
+        record_slow_query(query, params, elapsed, len(records))
+    
+    # A replica may not have another client's recent write yet; don't cache what it returned
+    if cacheable and not ('read_conn' in g and replicas is not None and replicas.recently_written()):
+        result_cache.put(key, records, referenced_tables(query), estimate_size(records), version)
+    return records, False
+
+def record_slow_query(query, params, seconds, rows, kind='select'):
+    """Add a statement to the slow-query log; its plan is captured in the background"""
+    explain = None
+    if query.lstrip()[:7].upper() in ('SELECT ', 'INSERT ', 'UPDATE ', 'DELETE ', 'REPLACE'):
+        db_pool = pool
+        
+        def explain():
+            conn = db_pool.acquire()
+            cursor = None
+            try:
+                cursor = conn.cursor(dictionary=True)
+                cursor.execute(f"EXPLAIN FORMAT=JSON {query}", params or None)
+                plan = json.loads(list(cursor.fetchone().values())[0])
+                return plan, rows_examined(plan)
+            finally:
+                if cursor:
+                    cursor.close()
+                db_pool.release(conn)
+    
+    slow_log.record(query, params, seconds, rows, explain, kind)
+
+def get_primary_key(cursor, table_name):
+    """Return the single-column primary key of a table, or None"""
+    cursor.execute(f"SHOW KEYS FROM `{table_name}` WHERE Key_name = 'PRIMARY'")
+    keys = cursor.fetchall()
+    if len(keys) != 1:
+        return None
+    return keys[0]['Column_name']
+
+def encode_continuation(key_column, last_value):
+    """Build an opaque token that resumes a keyset scan after last_value"""
+    payload = json.dumps({'k': key_column, 'a': last_value}, default=str)
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def decode_continuation(token):
+    """Return (key_column, last_value) from a continuation token"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+        return payload['k'], payload['a']
+    except (TypeError, KeyError, ValueError) as e:
+        raise ValueError('Invalid continuation token') from e
+
+def next_continuation(key_column, records, limit, count=None):
+    """Continuation token for the page after records, or None at the end"""
+    count = len(records) if count is None else count
+    if not records or limit is None or count < int(limit):
+        return None
+    return encode_continuation(key_column, records[-1][key_column])
+
 @app.route('/api/connect', methods=['POST'])
 def connect_database():
     """Establish connection to MySQL"""
@@ -47,29 +308,55 @@ def connect_database():
     username = data.get('username', 'root')
     password = data.get('password', '')
     database = data.get('database', 'testdb')
+    pool_options = data.get('pool', {})
+    cache_options = data.get('cache', {})
+    catalog_ttl = float(data.get('catalog_ttl', 30))
+    slow_options = data.get('slow_query', {})
+    replica_options = data.get('replicas')
     
     if not username:
         return jsonify({'success': False, 'message': 'Username is required'}), 400
     
-    success, message = connect_to_mysql(host, port, username, password, database)
+    try:
+        new_cache = ResultCache(**cache_options)
+    except TypeError as e:
+        return jsonify({'success': False, 'message': f'Invalid cache options: {str(e)}'}), 400
+    try:
+        new_slow_log = SlowQueryLog(**slow_options)
+    except (TypeError, ValueError, OSError) as e:
+        return jsonify({'success': False, 'message': f'Invalid slow_query options: {str(e)}'}), 400
+    # The salary summary changes with Employee and Company through triggers
+    new_cache.link(aggregates.EMPLOYEE_TABLE, aggregates.SUMMARY_TABLE)
+    new_cache.link(aggregates.COMPANY_TABLE, aggregates.SUMMARY_TABLE)
+    
+    success, message = connect_to_mysql(host, port, username, password, database, pool_options, replica_options)
     
     if success:
+        global result_cache, catalog, slow_log
+        result_cache = new_cache
+        catalog = Catalog(pool, ttl=catalog_ttl)
+        slow_log.close()
+        slow_log = new_slow_log
+        
         return jsonify({
             'success': True, 
             'message': message,
             'host': host,
             'port': port,
-            'database': database
+            'database': database,
+            'replicas': [replica['name'] for replica in replicas.stats()['replicas']] if replicas else []
         })
     else:
+        new_slow_log.close()
         return jsonify({'success': False, 'message': message}), 500
 
 @app.route('/api/create-table', methods=['POST'])
 def create_table():
     """Create a new table"""
-    if not connection or not connection.is_connected():
+    if pool is None:
         return jsonify({'success': False, 'message': 'Not connected to database'}), 400
     
+    cursor = None
     try:
         data = request.json
         table_name = data.get('table_name')
@@ -96,7 +383,9 @@ def create_table():
         
         query = f"CREATE TABLE `{table_name}` ({', '.join(column_definitions)})"
         cursor.execute(query)
-        connection.commit()
+        get_connection().commit()
+        mark_written([table_name])
+        catalog.invalidate(table_name)
         
         return jsonify({
             'success': True,
@@ -113,9 +402,10 @@ def create_table():
 @app.route('/api/insert', methods=['POST'])
 def insert_record():
     """Insert a new record"""
-    if not connection or not connection.is_connected():
+    if pool is None:
         return jsonify({'success': False, 'message': 'Not connected to database'}), 400
     
+    cursor = None
     try:
         data = request.json
         table_name = data.get('table')
@@ -126,16 +416,11 @@ def insert_record():
         
         cursor = get_cursor()
         
-        # Build INSERT query
-        columns = list(record_data.keys())
-        values = list(record_data.values())
-        
-        placeholders = ', '.join(['%s'] * len(values))
-        columns_str = ', '.join([f'`{col}`' for col in columns])
-        
-        query = f"INSERT INTO `{table_name}` ({columns_str}) VALUES ({placeholders})"
-        cursor.execute(query, values)
-        connection.commit()
+        query, values = build_insert(table_name, record_data)
+        with metrics.db_timer():
+            cursor.execute(query, values)
+            get_connection().commit()
+        mark_written([table_name])
         
         return jsonify({
             'success': True,
@@ -150,40 +435,558 @@ def insert_record():
         if cursor:
             cursor.close()
 
+@app.route('/api/bulk-insert', methods=['POST'])
+def bulk_insert_records():
+    """Insert many records with multi-row INSERTs, committing once per chunk"""
+    if pool is None:
+        return jsonify({'success': False, 'message': 'Not connected to database'}), 400
+    
+    cursor = None
+    try:
+        # Accept either {"table": ..., "rows": [...]} or an NDJSON body
+        if request.mimetype == 'application/x-ndjson':
+            table_name = request.args.get('table')
+            chunk_size = int(request.args.get('chunk_size', DEFAULT_CHUNK_SIZE))
+            rows = [json.loads(line) for line in request.get_data(as_text=True).splitlines() if line.strip()]
+        else:
+            data = request.json
+            table_name = data.get('table')
+            chunk_size = int(data.get('chunk_size', DEFAULT_CHUNK_SIZE))
+            rows = data.get('rows', [])
+        
+        if not table_name or not rows:
+            return jsonify({'success': False, 'message': 'Table name and rows are required'}), 400
+        
+        if chunk_size < 1:
+            return jsonify({'success': False, 'message': 'chunk_size must be positive'}), 400
+        
+        # Group rows by column set so each group shares one INSERT statement
+        groups = {}
+        for index, row in enumerate(rows):
+            columns = tuple(sorted(row))
+            groups.setdefault(columns, []).append((index, [row[col] for col in columns]))
+        
+        conn = get_connection()
+        cursor = conn.cursor()
+        started = time.perf_counter()
+        inserted = 0
+        chunks = 0
+        failures = []
+        
+        for columns, group in groups.items():
+            columns_str = ', '.join([f'`{col}`' for col in columns])
+            placeholders = ', '.join(['%s'] * len(columns))
+            query = f"INSERT INTO `{table_name}` ({columns_str}) VALUES ({placeholders})"
+            
+            for offset in range(0, len(group), chunk_size):
+                chunk = group[offset:offset + chunk_size]
+                chunks += 1
+                try:
+                    # executemany rewrites this into a single multi-row INSERT
+                    cursor.executemany(query, [values for _, values in chunk])
+                    conn.commit()
+                    inserted += len(chunk)
+                except Error as e:
+                    conn.rollback()
+                    failures.append({
+                        'columns': list(columns),
+                        'rows': [index for index, _ in chunk],
+                        'message': str(e)
+                    })
+        
+        elapsed = time.perf_counter() - started
+        if inserted:
+            mark_written([table_name])
+        
+        return jsonify({
+            'success': not failures,
+            'message': f'Inserted {inserted} of {len(rows)} records',
+            'inserted_rows': inserted,
+            'failed_rows': len(rows) - inserted,
+            'chunks': chunks,
+            'failures': failures,
+            'elapsed_seconds': round(elapsed, 4),
+            'rows_per_second': round(inserted / elapsed, 1) if elapsed else None
+        })
+    
+    except (ValueError, TypeError, AttributeError) as e:
+        return jsonify({'success': False, 'message': f'Invalid rows: {str(e)}'}), 400
+    except Error as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+    finally:
+        if cursor:
+            cursor.close()
+
+def build_select(data, cursor):
+    """Build the SELECT for an /api/select request body
+
+    Returns a dict with the ``query`` text, its ``params``, whether it is
+    fully ``prepared``, the keyset ``key`` column (None unless paginating)
+    and the ``limit``. Raises ValueError for a bad continuation token or a
+    table that cannot be paginated.
+    """
+    table_name = data['table']
+    columns = data.get('columns', ['*'])
+    limit = data.get('limit', None if data.get('stream') else 100)
+    key_column = data.get('key')
+    after = data.get('after')
+    
+    if data.get('continuation'):
+        key_column, after = decode_continuation(data['continuation'])
+    
+    paginate = bool(key_column or after is not None or data.get('paginate'))
+    
+    if paginate and not key_column:
+        key_column = get_primary_key(cursor, table_name)
+        if not key_column:
+            raise ValueError('Table has no single-column primary key; pass "key"')
+    
+    # Build SELECT query
+    select_columns = list(columns)
+    if paginate and '*' not in select_columns and key_column not in select_columns:
+        # The key must come back so the next page can resume after it
+        select_columns.append(key_column)
+    columns_str = ', '.join([f'`{col}`' if col != '*' else col for col in select_columns])
+    query = f"SELECT {columns_str} FROM `{table_name}`"
+    params = []
+    
+    conditions = []
+    where_sql, prepared = build_where(data, params)
+    if where_sql:
+        conditions.append(where_sql)
+    if paginate and after is not None:
+        # Keyset pagination: seek past the last key instead of OFFSET
+        conditions.append(f"`{key_column}` > %s")
+        params.append(after)
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    
+    if paginate:
+        query += f" ORDER BY `{key_column}`"
+    
+    if limit is not None:
+        query += f" LIMIT {int(limit)}"
+    
+    return {
+        'query': query,
+        'params': params,
+        'prepared': prepared,
+        'key': key_column if paginate else None,
+        'limit': limit
+    }
+
 @app.route('/api/select', methods=['POST'])
 def select_records():
-    """Select records with optional WHERE clause"""
-    if not connection or not connection.is_connected():
+    """Select records with optional WHERE clause, keyset paging and streaming"""
+    if pool is None:
         return jsonify({'success': False, 'message': 'Not connected to database'}), 400
     
+    cursor = None
     try:
         data = request.json
         table_name = data.get('table')
-        columns = data.get('columns', ['*'])
-        where_clause = data.get('where', '')
-        limit = data.get('limit', 100)
+        stream = data.get('stream', False)
+        batch_size = int(data.get('batch_size', 1000))
         
         if not table_name:
             return jsonify({'success': False, 'message': 'Table name is required'}), 400
         
+        cursor = get_read_cursor()
+        select = build_select(data, cursor)
+        query, params, key_column, limit = select['query'], select['params'], select['key'], select['limit']
+        advisor.record_select(table_name, data, key_column)
+        
+        if stream:
+            cursor.execute(query, params or None)
+            
+            # Hand the cursor to the generator; it is closed when streaming ends
+            body = stream_records(get_read_connection(), cursor, query, batch_size, key_column, limit)
+            cursor = None
+            return Response(stream_with_context(body), mimetype='application/x-ndjson')
+        
+        records, cached = cached_select(cursor, query, params, bypass=data.get('cache') == 'bypass',
+                                        prepared=select['prepared'])
+        
+        result = {
+            'success': True,
+            'records': records,
+            'count': len(records),
+            'query': query,
+            'cached': cached
+        }
+        if key_column:
+            result['key'] = key_column
+            result['continuation'] = next_continuation(key_column, records, limit)
+        
+        return jsonify(result)
+    
+    except ValueError as e:
+        return jsonify({'success': False, 'message': f'Invalid request: {str(e)}'}), 400
+    except Error as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+    finally:
+        if cursor:
+            cursor.close()
+
+def stream_records(conn, cursor, query, batch_size, key_column, limit):
+    """Yield an unbuffered result set as NDJSON, one fetchmany batch at a time
+
+    Rows are written one per line; the last line is a ``_meta`` object with
+    the row count and, when paginating, the continuation token.
+    """
+    finished = False
+    count = 0
+    last_row = None
+    try:
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            count += len(rows)
+            last_row = rows[-1]
+            yield ''.join(json.dumps(row, default=str) + '\n' for row in rows)
+        finished = True
+        
+        meta = {'success': True, 'count': count, 'query': query}
+        if key_column:
+            meta['key'] = key_column
+            meta['continuation'] = next_continuation(key_column, [last_row] if last_row else [], limit, count)
+        yield json.dumps({'_meta': meta}, default=str) + '\n'
+    except Error as e:
+        yield json.dumps({'_meta': {'success': False, 'count': count, 'message': str(e)}}) + '\n'
+    finally:
+        if not finished:
+            # Unread rows are still on the socket; drop the connection so the
+            # pool discards it instead of draining the rest of the table
+            try:
+                conn.close()
+            except Error:
+                pass
+        try:
+            cursor.close()
+        except Error:
+            pass
+
+@app.route('/api/export', methods=['GET', 'POST'])
+def export_records():
+    """Stream a table or SELECT result as CSV, NDJSON, Arrow IPC or Parquet"""
+    if pool is None:
+        return jsonify({'success': False, 'message': 'Not connected to database'}), 400
+    
+    cursor = None
+    try:
+        # POST takes a JSON body; GET (plain download links) takes query args
+        data = dict(request.json if request.is_json else request.args.items())
+        if isinstance(data.get('filter'), str):
+            data['filter'] = json.loads(data['filter'])
+        if isinstance(data.get('columns'), str):
+            data['columns'] = [col.strip() for col in data['columns'].split(',') if col.strip()]
+        fmt = data.get('format', 'csv')
+        compression = data.get('compression')
+        batch_rows = int(data.get('batch_size', DEFAULT_BATCH_ROWS))
+        query = (data.get('query') or '').strip()
+        
+        check_options(fmt, compression)
+        if batch_rows < 1:
+            raise ValueError('batch_size must be positive')
+        if query and not is_read_only(query):
+            raise ValueError('query must be a SELECT')
+        if not query and not data.get('table'):
+            raise ValueError('Table name or query is required')
+        
+        # Unbuffered tuple cursor: rows stay on the socket until fetched
+        cursor = get_read_connection().cursor()
+        if query:
+            params = data.get('params') or None
+        else:
+            select = build_select(dict(data, stream=True), cursor)
+            query, params = select['query'], select['params'] or None
+        cursor.execute(query, params)
+    except (ValueError, TypeError) as e:
+        if cursor:
+            cursor.close()
+        return jsonify({'success': False, 'message': f'Invalid request: {str(e)}'}), 400
+    except Error as e:
+        if cursor:
+            cursor.close()
+        return jsonify({'success': False, 'message': str(e)}), 500
+    
+    mimetype, extension = content_type(fmt, compression)
+    filename = f"{data.get('table') or 'query'}.{extension}"
+    body = export_cursor(get_read_connection(), cursor, fmt, compression, batch_rows)
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+def export_cursor(conn, cursor, fmt, compression, batch_rows):
+    """Yield export file chunks from an executed unbuffered cursor"""
+    finished = False
+    try:
+        columns = list(cursor.column_names)
+        types = arrow_types(cursor.description) if fmt in ('arrow', 'parquet') else None
+        yield from export_chunks(columns, cursor_batches(cursor, batch_rows), fmt, compression, types)
+        finished = True
+    finally:
+        if not finished:
+            # Same as stream_records: drop the connection rather than drain the table
+            try:
+                conn.close()
+            except Error:
+                pass
+        try:
+            cursor.close()
+        except Error:
+            pass
+
+@app.route('/api/federated-query', methods=['POST'])
+def federated_query():
+    """Hash-join a MySQL table with a Mongo collection read through the Mongo API
+
+    Each side gets its own filter and columns/projection pushed down: a
+    SELECT on the pooled connection and an NDJSON /api/export on the Mongo
+    app. The side that turns out smaller is hashed and the other streamed
+    past it.
+    """
+    if pool is None:
+        return jsonify({'success': False, 'message': 'Not connected to database'}), 400
+    
+    data = request.json or {}
+    mysql_spec = data.get('mysql') or {}
+    mongo_spec = data.get('mongo') or {}
+    on = data.get('on') or {}
+    join_type = data.get('type', 'inner')
+    build = data.get('build')
+    stream = data.get('stream', False)
+    limit = data.get('limit', None if stream else 1000)
+    
+    if not mysql_spec.get('table') or not mongo_spec.get('collection') or not on.get('mysql') or not on.get('mongo'):
+        return jsonify({'success': False, 'message': 'mysql.table, mongo.collection, on.mysql and on.mongo are required'}), 400
+    if join_type not in JOIN_TYPES:
+        return jsonify({'success': False, 'message': f'type must be one of {", ".join(JOIN_TYPES)}'}), 400
+    if build not in (None, 'mysql', 'mongo'):
+        return jsonify({'success': False, 'message': "build must be 'mysql' or 'mongo'"}), 400
+    
+    # MySQL side: the join column is always selected
+    conn = get_read_connection()
+    cursor = None
+    try:
+        select_data = dict(mysql_spec, stream=True)
+        columns = mysql_spec.get('columns')
+        if columns and '*' not in columns and on['mysql'] not in columns:
+            select_data['columns'] = list(columns) + [on['mysql']]
+        cursor = conn.cursor(dictionary=True)
+        select = build_select(select_data, cursor)
+        cursor.execute(select['query'], select['params'] or None)
+    except ValueError as e:
+        if cursor:
+            cursor.close()
+        return jsonify({'success': False, 'message': f'Invalid mysql side: {str(e)}'}), 400
+    except Error as e:
+        if cursor:
+            cursor.close()
+        return jsonify({'success': False, 'message': str(e)}), 500
+    
+    def close_mysql(unfinished):
+        if unfinished:
+            # Unread rows are still on the socket; let the pool discard the connection
+            try:
+                conn.close()
+            except Error:
+                pass
+        try:
+            cursor.close()
+        except Error:
+            pass
+    
+    # Mongo side: filter and projection run on the Mongo server
+    mongo_request = {key: mongo_spec[key] for key in ('collection', 'filter', 'sort', 'limit', 'pipeline',
+                                                    'read_preference', 'max_staleness')
+                     if key in mongo_spec}
+    if mongo_spec.get('fields'):
+        projection = {field: 1 for field in mongo_spec['fields']}
+        projection[on['mongo']] = 1
+        mongo_request['projection'] = projection
+    try:
+        response, mongo_rows = mongo_export(MONGO_API_URL, mongo_request)
+    except (ValueError, OSError) as e:
+        close_mysql(True)
+        status = 400 if isinstance(e, ValueError) else 502
+        return jsonify({'success': False, 'message': f'Mongo side: {str(e)}'}), status
+    
+    mysql_side = Source('mysql', (row for rows in cursor_batches(cursor) for row in rows), on['mysql'], close_mysql)
+    mongo_side = Source('mongo', mongo_rows, on['mongo'], lambda unfinished: response.close())
+    stats = {}
+    
+    def joined():
+        try:
+            yield from hash_join(mysql_side, mongo_side, join_type, build, limit, stats)
+        finally:
+            mysql_side.close()
+            mongo_side.close()
+            stats['mysql'] = dict(mysql_side.stats(), query=select['query'], params=select['params'])
+            stats['mongo'] = dict(mongo_side.stats(), api=MONGO_API_URL, request=mongo_request)
+    
+    if stream:
+        return Response(stream_with_context(stream_joined(joined(), stats)), mimetype='application/x-ndjson')
+    
+    try:
+        records = list(joined())
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e), 'stats': stats}), 400
+    except (Error, OSError) as e:
+        return jsonify({'success': False, 'message': str(e), 'stats': stats}), 500
+    
+    return jsonify({
+        'success': True,
+        'records': records,
+        'count': len(records),
+        'truncated': bool(limit) and len(records) >= limit,
+        'stats': stats
+    })
+
+def stream_joined(rows, stats):
+    """Yield joined rows as NDJSON, ending with a ``_meta`` line of per-side stats"""
+    count = 0
+    try:
+        for row in rows:
+            count += 1
+            yield json.dumps(row, default=str) + '\n'
+        yield json.dumps({'_meta': {'success': True, 'count': count, 'stats': stats}}, default=str) + '\n'
+    except (ValueError, Error, OSError) as e:
+        rows.close()
+        yield json.dumps({'_meta': {'success': False, 'count': count, 'message': str(e), 'stats': stats}}, default=str) + '\n'
+
+@app.route('/api/explain', methods=['POST'])
+def explain_query():
+    """Show the MySQL plan for an /api/select body or a raw SELECT"""
+    if pool is None:
+        return jsonify({'success': False, 'message': 'Not connected to database'}), 400
+    
+    cursor = None
+    try:
+        data = request.json
         cursor = get_cursor()
         
-        # Build SELECT query
-        columns_str = ', '.join([f'`{col}`' if col != '*' else col for col in columns])
-        query = f"SELECT {columns_str} FROM `{table_name}`"
+        if data.get('query'):
+            query, params = data['query'].strip().rstrip(';'), None
+            if not query.upper().startswith('SELECT'):
+                return jsonify({'success': False, 'message': 'Only SELECT statements can be explained'}), 400
+        elif data.get('table'):
+            select = build_select(data, cursor)
+            query, params = select['query'], select['params'] or None
+        else:
+            return jsonify({'success': False, 'message': 'Table name or query is required'}), 400
         
-        if where_clause:
-            query += f" WHERE {where_clause}"
+        cursor.execute(f"EXPLAIN FORMAT=JSON {query}", params)
+        plan = json.loads(list(cursor.fetchone().values())[0])
+        full_scans = find_full_scans(plan)
         
-        query += f" LIMIT {limit}"
+        return jsonify({
+            'success': True,
+            'query': query,
+            'plan': plan,
+            'full_scans': full_scans,
+            'uses_index': not full_scans
+        })
+    
+    except ValueError as e:
+        return jsonify({'success': False, 'message': f'Invalid request: {str(e)}'}), 400
+    except Error as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+    finally:
+        if cursor:
+            cursor.close()
+
+@app.route('/api/index-advice', methods=['POST'])
+def index_advice():
+    """Suggest composite indexes from the filters and sorts of recent selects"""
+    if pool is None:
+        return jsonify({'success': False, 'message': 'Not connected to database'}), 400
+    
+    cursor = None
+    try:
+        data = request.json or {}
+        cursor = get_cursor()
+        
+        def existing_indexes(table):
+            try:
+                return [index['columns'] for index in catalog.table_info(cursor, table)['indexes']]
+            except Error:
+                # Table dropped since it was queried
+                return []
+        
+        suggestions = advisor.suggest(existing_indexes, data.get('table'), int(data.get('limit', 10)))
+        
+        return jsonify({
+            'success': True,
+            'suggestions': suggestions
+        })
+    
+    except Error as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+    finally:
+        if cursor:
+            cursor.close()
+
+@app.route('/api/create-index', methods=['POST'])
+def create_index():
+    """Create a (composite) index on a table"""
+    if pool is None:
+        return jsonify({'success': False, 'message': 'Not connected to database'}), 400
+    
+    cursor = None
+    try:
+        data = request.json
+        table_name = data.get('table')
+        columns = data.get('columns', [])
+        
+        if not table_name or not columns:
+            return jsonify({'success': False, 'message': 'Table name and columns are required'}), 400
+        
+        index_name = data.get('name') or ('idx_' + '_'.join(columns))[:64]
+        unique = 'UNIQUE ' if data.get('unique') else ''
+        columns_str = ', '.join([f'`{col}`' for col in columns])
         
+        cursor = get_cursor()
+        query = f"CREATE {unique}INDEX `{index_name}` ON `{table_name}` ({columns_str})"
         cursor.execute(query)
-        records = cursor.fetchall()
+        catalog.invalidate(table_name)
         
         return jsonify({
             'success': True,
-            'records': records,
-            'count': len(records),
+            'message': f'Index {index_name} created successfully',
+            'query': query
+        })
+    
+    except Error as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+    finally:
+        if cursor:
+            cursor.close()
+
+@app.route('/api/drop-index', methods=['POST'])
+def drop_index():
+    """Drop an index from a table"""
+    if pool is None:
+        return jsonify({'success': False, 'message': 'Not connected to database'}), 400
+    
+    cursor = None
+    try:
+        data = request.json
+        table_name = data.get('table')
+        index_name = data.get('name')
+        
+        if not table_name or not index_name:
+            return jsonify({'success': False, 'message': 'Table name and index name are required'}), 400
+        
+        cursor = get_cursor()
+        query = f"DROP INDEX `{index_name}` ON `{table_name}`"
+        cursor.execute(query)
+        catalog.invalidate(table_name)
+        
+        return jsonify({
+            'success': True,
+            'message': f'Index {index_name} dropped successfully',
             'query': query
         })
     
@@ -196,42 +999,39 @@ def select_records():
 @app.route('/api/update', methods=['POST'])
 def update_records():
     """Update records"""
-    if not connection or not connection.is_connected():
+    if pool is None:
         return jsonify({'success': False, 'message': 'Not connected to database'}), 400
     
+    cursor = None
     try:
         data = request.json
         table_name = data.get('table')
         set_clause = data.get('set', {})
-        where_clause = data.get('where', '')
         
         if not table_name or not set_clause:
             return jsonify({'success': False, 'message': 'Table name and SET clause are required'}), 400
         
-        cursor = get_cursor()
+        query, values, prepared = build_update(data)
         
-        # Build UPDATE query
-        set_parts = []
-        values = []
-        for column, value in set_clause.items():
-            set_parts.append(f"`{column}` = %s")
-            values.append(value)
-        
-        query = f"UPDATE `{table_name}` SET {', '.join(set_parts)}"
-        
-        if where_clause:
-            query += f" WHERE {where_clause}"
-        
-        cursor.execute(query, values)
-        connection.commit()
+        with metrics.db_timer():
+            if prepared:
+                affected_rows = run_prepared(query, values).rowcount
+            else:
+                cursor = get_cursor()
+                cursor.execute(query, values)
+                affected_rows = cursor.rowcount
+            get_connection().commit()
+        mark_written([table_name])
         
         return jsonify({
             'success': True,
             'message': 'Records updated successfully',
-            'affected_rows': cursor.rowcount,
+            'affected_rows': affected_rows,
             'query': query
         })
     
+    except ValueError as e:
+        return jsonify({'success': False, 'message': f'Invalid request: {str(e)}'}), 400
     except Error as e:
         return jsonify({'success': False, 'message': str(e)}), 500
     finally:
@@ -241,67 +1041,103 @@ def update_records():
 @app.route('/api/delete', methods=['POST'])
 def delete_records():
     """Delete records"""
-    if not connection or not connection.is_connected():
+    if pool is None:
         return jsonify({'success': False, 'message': 'Not connected to database'}), 400
     
+    cursor = None
     try:
         data = request.json
         table_name = data.get('table')
-        where_clause = data.get('where', '')
         
         if not table_name:
             return jsonify({'success': False, 'message': 'Table name is required'}), 400
         
-        if not where_clause:
-            return jsonify({'success': False, 'message': 'WHERE clause is required for safety'}), 400
+        if not data.get('filter') and not data.get('where'):
+            return jsonify({'success': False, 'message': 'WHERE clause or filter is required for safety'}), 400
         
-        cursor = get_cursor()
+        query, params, prepared = build_delete(data)
         
-        # Build DELETE query
-        query = f"DELETE FROM `{table_name}` WHERE {where_clause}"
-        cursor.execute(query)
-        connection.commit()
+        with metrics.db_timer():
+            if prepared:
+                affected_rows = run_prepared(query, params).rowcount
+            else:
+                cursor = get_cursor()
+                cursor.execute(query, params)
+                affected_rows = cursor.rowcount
+            get_connection().commit()
+        mark_written([table_name])
         
         return jsonify({
             'success': True,
             'message': 'Records deleted successfully',
-            'affected_rows': cursor.rowcount,
+            'affected_rows': affected_rows,
             'query': query
         })
     
+    except ValueError as e:
+        return jsonify({'success': False, 'message': f'Invalid request: {str(e)}'}), 400
     except Error as e:
         return jsonify({'success': False, 'message': str(e)}), 500
     finally:
         if cursor:
             cursor.close()
 
+# Statements that would change state on the one pooled connection they happen to run on
+SESSION_STATEMENTS = ('USE', 'SET')
+# Server-wide SETs are not tied to the connection
+SERVER_SETTINGS = ('SET GLOBAL', 'SET PERSIST', 'SET @@GLOBAL', 'SET @@PERSIST')
+
 @app.route('/api/execute-query', methods=['POST'])
 def execute_query():
     """Execute raw SQL query"""
-    if not connection or not connection.is_connected():
+    if pool is None:
         return jsonify({'success': False, 'message': 'Not connected to database'}), 400
     
+    cursor = None
     try:
         data = request.json
         query = data.get('query', '').strip()
         
         if not query:
             return jsonify({'success': False, 'message': 'Query is required'}), 400
+        upper = ' '.join(query.upper().split())
+        if upper.split(' ', 1)[0] in SESSION_STATEMENTS and not upper.startswith(SERVER_SETTINGS):
+            return jsonify({'success': False, 'message': 'USE and session SET statements are not allowed; '
+                            'connect to another database with /api/connect'}), 400
         
-        cursor = get_cursor()
-        cursor.execute(query)
+        is_select = query.upper().strip().startswith('SELECT')
+        # Plain SELECTs may run on a replica; locking reads and writes stay on the primary
+        cursor = get_read_cursor() if is_select and is_read_only(query) else get_cursor()
         
         # Check if it's a SELECT query
-        if query.upper().strip().startswith('SELECT'):
-            records = cursor.fetchall()
+        if is_select:
+            records, cached = cached_select(cursor, query, bypass=data.get('cache') == 'bypass')
             return jsonify({
                 'success': True,
                 'records': records,
                 'count': len(records),
-                'query': query
+                'query': query,
+                'cached': cached
             })
         else:
-            connection.commit()
+            started = time.perf_counter()
+            with metrics.db_timer():
+                cursor.execute(query)
+                get_connection().commit()
+            elapsed = time.perf_counter() - started
+            if slow_log.is_slow(elapsed):
+                # The plan is captured in the background after the commit, so a
+                # write is explained against the rows as it left them
+                record_slow_query(query, None, elapsed, cursor.rowcount, kind='execute')
+            # Unknown targets (TRUNCATE x, CALL, ...) drop the whole cache
+            tables = referenced_tables(query)
+            mark_written(tables or None)
+            if is_ddl(query):
+                if tables:
+                    for table in tables:
+                        catalog.invalidate(table)
+                else:
+                    catalog.invalidate()
             return jsonify({
                 'success': True,
                 'message': 'Query executed successfully',
@@ -315,13 +1151,418 @@ def execute_query():
         if cursor:
             cursor.close()
 
+# Isolation levels accepted by /api/transaction
+ISOLATION_LEVELS = ('READ UNCOMMITTED', 'READ COMMITTED', 'REPEATABLE READ', 'SERIALIZABLE')
+
+# Raw statements that would end the transaction early or switch databases
+TRANSACTION_CONTROL = ('BEGIN', 'START', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE',
+                       'LOCK', 'UNLOCK', 'SET AUTOCOMMIT', 'USE')
+
+def plan_transaction_operation(op):
+    """Validate one /api/transaction operation; returns (query, params, prepared, tables)"""
+    kind = op.get('op')
+    if kind == 'insert':
+        query, values = build_insert(op.get('table'), op.get('data', {}))
+        return query, values, False, {op['table'].lower()}
+    if kind == 'update':
+        query, values, prepared = build_update(op)
+        return query, values, prepared, {op['table'].lower()}
+    if kind == 'delete':
+        query, params, prepared = build_delete(op)
+        return query, params, prepared, {op['table'].lower()}
+    if kind == 'raw':
+        query = (op.get('query') or '').strip().rstrip(';')
+        if not query:
+            raise ValueError('raw operation needs a query')
+        upper = ' '.join(query.upper().split())
+        # DDL commits implicitly, which would break atomicity
+        if is_ddl(query) or upper.startswith(TRANSACTION_CONTROL):
+            raise ValueError('DDL and transaction control statements are not allowed')
+        return query, op.get('params') or [], False, referenced_tables(query)
+    raise ValueError(f"unknown op {kind!r}; expected insert, update, delete or raw")
+
+@app.route('/api/transaction', methods=['POST'])
+def run_transaction():
+    """Run insert/update/delete/raw operations in one transaction with a single commit"""
+    if pool is None:
+        return jsonify({'success': False, 'message': 'Not connected to database'}), 400
+    
+    data = request.json
+    operations = data.get('operations', [])
+    isolation_level = data.get('isolation_level')
+    read_only = bool(data.get('read_only', False))
+    try:
+        max_rows = int(data.get('max_rows', 1000))
+    except (TypeError, ValueError) as e:
+        return jsonify({'success': False, 'message': f'Invalid max_rows: {str(e)}'}), 400
+    
+    if not operations:
+        return jsonify({'success': False, 'message': 'Operations are required'}), 400
+    if max_rows < 1:
+        return jsonify({'success': False, 'message': 'max_rows must be positive'}), 400
+    if isolation_level is not None:
+        isolation_level = ' '.join(str(isolation_level).upper().replace('_', ' ').split())
+        if isolation_level not in ISOLATION_LEVELS:
+            return jsonify({'success': False, 'message': f'isolation_level must be one of {", ".join(ISOLATION_LEVELS)}'}), 400
+    
+    # Build every statement first so a bad operation never opens a transaction
+    planned = []
+    for index, op in enumerate(operations):
+        try:
+            planned.append(plan_transaction_operation(op))
+        except (ValueError, TypeError, AttributeError) as e:
+            return jsonify({'success': False, 'message': f'Invalid operation {index}: {str(e)}', 'index': index}), 400
+    
+    conn = get_connection()
+    cursor = None
+    results = []
+    written = set()
+    invalidate_all = False
+    started = time.perf_counter()
+    try:
+        with metrics.db_timer():
+            conn.start_transaction(isolation_level=isolation_level, readonly=read_only)
+            cursor = conn.cursor(dictionary=True)
+            for index, (op, (query, params, prepared, tables)) in enumerate(zip(operations, planned)):
+                mark = time.perf_counter()
+                try:
+                    target = run_prepared(query, params) if prepared else cursor
+                    if not prepared:
+                        cursor.execute(query, params)
+                except Error as e:
+                    results.append({'index': index, 'op': op['op'], 'success': False, 'message': str(e)})
+                    raise
+                result = {'index': index, 'op': op['op'], 'success': True}
+                if target.with_rows:
+                    records = target.fetchmany(max_rows)
+                    skipped = len(target.fetchall())
+                    result.update({'records': records, 'count': len(records) + skipped, 'truncated': skipped > 0})
+                else:
+                    result['affected_rows'] = target.rowcount
+                    if op['op'] == 'insert':
+                        result['inserted_id'] = target.lastrowid
+                    written |= tables
+                    invalidate_all = invalidate_all or not tables
+                result['elapsed_ms'] = round((time.perf_counter() - mark) * 1000, 2)
+                results.append(result)
+            conn.commit()
+    except Error as e:
+        try:
+            conn.rollback()
+        except Error:
+            pass
+        return jsonify({
+            'success': False,
+            'message': str(e),
+            'committed': False,
+            'failed_index': len(results) - 1 if results and not results[-1]['success'] else None,
+            'results': results
+        }), 500
+    finally:
+        if cursor:
+            cursor.close()
+    
+    if written or invalidate_all:
+        mark_written(None if invalidate_all else written)
+    
+    return jsonify({
+        'success': True,
+        'committed': True,
+        'isolation_level': isolation_level,
+        'operations': len(results),
+        'results': results,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 2)
+    })
+
+@app.route('/api/execute-script', methods=['POST'])
+def execute_script():
+    """Run a whole SQL script in one request, streaming per-statement results"""
+    if pool is None:
+        return jsonify({'success': False, 'message': 'Not connected to database'}), 400
+    
+    try:
+        if 'script' in request.files:
+            # multipart upload: options come from the form fields
+            script = request.files['script'].read().decode('utf-8')
+            options = request.form
+        elif request.is_json:
+            options = request.json
+            script = options.get('script', '')
+        else:
+            # Raw body (curl --data-binary @file.sql): options come from the query string
+            script = request.get_data(as_text=True)
+            options = request.args
+        
+        statements = split_statements(script)
+        transaction = option_flag(options, 'transaction', True)
+        mode = options.get('mode', 'batch')
+        batch_size = int(options.get('batch_size', DEFAULT_SCRIPT_BATCH)) if mode == 'batch' else 1
+        continue_on_error = option_flag(options, 'continue_on_error', False) and not transaction
+        max_rows = int(options.get('max_rows', 1000))
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({'success': False, 'message': f'Invalid script: {str(e)}'}), 400
+    
+    if not statements:
+        return jsonify({'success': False, 'message': 'Script is required'}), 400
+    if mode not in ('batch', 'sequential') or batch_size < 1:
+        return jsonify({'success': False, 'message': "mode must be 'batch' or 'sequential' with a positive batch_size"}), 400
+    
+    body = run_script(get_connection(), statements, transaction, mode, batch_size, continue_on_error, max_rows)
+    return Response(stream_with_context(body), mimetype='application/x-ndjson')
+
+def option_flag(options, name, default):
+    """Read a boolean option from JSON, form fields or the query string"""
+    value = options.get(name, default)
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    return bool(value)
+
+def script_batch(statements, start, batch_size):
+    """Statements from ``start`` that can share one multi-statement round trip
+
+    Compound statements and CALLs may return several result sets, so they run
+    alone to keep results lined up with statements.
+    """
+    def alone(stmt):
+        return stmt['compound'] or stmt['sql'][:4].upper() == 'CALL'
+    
+    if alone(statements[start]):
+        return statements[start:start + 1]
+    end = start
+    while end < len(statements) and end - start < batch_size and not alone(statements[end]):
+        end += 1
+    return statements[start:end]
+
+def statement_result(cursor, index, stmt, elapsed, max_rows):
+    """Describe one finished statement for the NDJSON stream"""
+    result = {
+        'index': index,
+        'line': stmt['line'],
+        'statement': stmt['sql'][:200],
+        'success': True,
+        'elapsed_ms': round(elapsed * 1000, 2)
+    }
+    if cursor.with_rows:
+        records = cursor.fetchmany(max_rows)
+        # The rest of the result set has to be read before the next statement runs
+        skipped = len(cursor.fetchall())
+        result['records'] = records
+        result['count'] = len(records) + skipped
+        result['truncated'] = skipped > 0
+    else:
+        result['affected_rows'] = cursor.rowcount
+    return result
+
+def run_script(conn, statements, transaction, mode, batch_size, continue_on_error, max_rows):
+    """Execute split statements in multi-statement batches and yield NDJSON results
+
+    With ``transaction`` every statement runs in one transaction that is
+    committed at the end or rolled back at the first error (MySQL still
+    commits implicitly around DDL). Without it each batch is committed as it
+    finishes.
+    """
+    started = time.perf_counter()
+    cursor = conn.cursor(dictionary=True)
+    executed = failed = 0
+    committed = False
+    written = set()
+    invalidate_all = ddl = use_seen = False
+    position = 0
+    
+    try:
+        while position < len(statements):
+            batch = script_batch(statements, position, batch_size)
+            done = 0
+            mark = time.perf_counter()
+            try:
+                sql = batch[0]['sql'] if len(batch) == 1 else ';\n'.join(stmt['sql'] for stmt in batch)
+                result = None
+                for result_cursor in cursor.execute(sql, multi=True):
+                    now = time.perf_counter()
+                    if len(batch) == 1 and result is not None:
+                        # Extra result sets of a CALL or compound statement
+                        if result_cursor.with_rows:
+                            result_cursor.fetchall()
+                        continue
+                    stmt = batch[done]
+                    result = statement_result(result_cursor, position + done, stmt, now - mark, max_rows)
+                    yield json.dumps(result, default=str) + '\n'
+                    mark = time.perf_counter()
+                    done += 1
+                    executed += 1
+                    
+                    if not stmt['sql'].upper().startswith('SELECT'):
+                        tables = referenced_tables(stmt['sql'])
+                        written |= tables
+                        invalidate_all = invalidate_all or not tables
+                        ddl = ddl or is_ddl(stmt['sql'])
+                        use_seen = use_seen or changes_database(stmt['sql'])
+                
+                if not transaction:
+                    conn.commit()
+                position += len(batch)
+            except Error as e:
+                failed += 1
+                stmt = batch[done] if done < len(batch) else batch[-1]
+                yield json.dumps({
+                    'index': position + done,
+                    'line': stmt['line'],
+                    'statement': stmt['sql'][:200],
+                    'success': False,
+                    'message': str(e),
+                    'elapsed_ms': round((time.perf_counter() - mark) * 1000, 2)
+                }) + '\n'
+                if not continue_on_error:
+                    break
+                # Statements before the failure already ran; resume after it
+                conn.commit()
+                position += done + 1
+        
+        if transaction and not failed:
+            conn.commit()
+            committed = True
+        elif transaction:
+            conn.rollback()
+        else:
+            committed = True
+        
+        yield json.dumps({'_meta': {
+            'success': not failed,
+            'statements': len(statements),
+            'executed': executed,
+            'failed': failed,
+            'committed': committed,
+            'transaction': transaction,
+            'mode': mode,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 2)
+        }}) + '\n'
+    except Error as e:
+        yield json.dumps({'_meta': {'success': False, 'executed': executed, 'message': str(e)}}) + '\n'
+    finally:
+        try:
+            if use_seen:
+                # Pooled connections must stay on the connected database
+                conn.database = current_database
+            cursor.close()
+        except Error:
+            pass
+        # DDL commits implicitly, so invalidate even after a rollback
+        if written or invalidate_all:
+            mark_written(None if invalidate_all else written)
+        if ddl:
+            catalog.invalidate()
+
+@app.route('/api/aggregates', methods=['GET'])
+def get_aggregates():
+    """Per-company salary stats from the trigger-maintained summary table"""
+    if pool is None:
+        return jsonify({'success': False, 'message': 'Not connected to database'}), 400
+    
+    cursor = None
+    try:
+        cursor = get_cursor()
+        c_id = request.args.get('c_id')
+        company = request.args.get('company')
+        
+        stats = aggregates.lookup(cursor, c_id, company)
+        if (c_id is not None or company is not None) and not stats:
+            return jsonify({'success': False, 'message': 'Company not found'}), 404
+        
+        return jsonify({
+            'success': True,
+            'aggregates': stats,
+            'count': len(stats)
+        })
+    
+    except ValueError:
+        return jsonify({'success': False, 'message': 'c_id must be an integer'}), 400
+    except Error as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+    finally:
+        if cursor:
+            cursor.close()
+
+@app.route('/api/aggregates/setup', methods=['POST'])
+def setup_aggregates():
+    """Create the salary summary table and its Employee triggers, then fill it"""
+    if pool is None:
+        return jsonify({'success': False, 'message': 'Not connected to database'}), 400
+    
+    cursor = None
+    try:
+        conn = get_connection()
+        cursor = get_cursor()
+        triggers = aggregates.install(cursor)
+        rows = aggregates.rebuild(conn, cursor)
+        mark_written([aggregates.SUMMARY_TABLE])
+        catalog.invalidate()
+        
+        return jsonify({
+            'success': True,
+            'message': f'Summary table {aggregates.SUMMARY_TABLE} installed',
+            'triggers': triggers,
+            'companies': rows
+        })
+    
+    except Error as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+    finally:
+        if cursor:
+            cursor.close()
+
+@app.route('/api/aggregates/rebuild', methods=['POST'])
+def rebuild_aggregates():
+    """Recompute the salary summary from Employee to repair drift"""
+    if pool is None:
+        return jsonify({'success': False, 'message': 'Not connected to database'}), 400
+    
+    cursor = None
+    try:
+        conn = get_connection()
+        cursor = get_cursor()
+        triggers = aggregates.installed_triggers(cursor)
+        if not triggers:
+            return jsonify({'success': False, 'message': 'Summary is not installed; call /api/aggregates/setup'}), 400
+        
+        started = time.perf_counter()
+        rows = aggregates.rebuild(conn, cursor)
+        mark_written([aggregates.SUMMARY_TABLE])
+        
+        # Installed before the Company triggers existed: cascades still go unseen
+        missing = sorted(set(aggregates.TRIGGERS) - set(triggers))
+        return jsonify({
+            'success': True,
+            'message': 'Summary rebuilt' + ('; call /api/aggregates/setup to add missing triggers' if missing else ''),
+            'companies': rows,
+            'triggers': triggers,
+            'missing_triggers': missing,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 2)
+        })
+    
+    except Error as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+    finally:
+        if cursor:
+            cursor.close()
+
 @app.route('/api/status', methods=['GET'])
 def get_status():
     """Get connection status"""
-    if connection and connection.is_connected():
-        cursor = get_cursor()
+    if pool:
+        cursor = None
+        
+        # Without stats the body only changes on reconnect, so a poller's
+        # revalidation is answered before the three queries below
+        tag = None
+        if request.args.get('stats', '').lower() in ('0', 'false'):
+            tag = content_etag(f'{id(pool)}:{current_database}'.encode())
+            unchanged = compression.revalidate(tag)
+            if unchanged is not None:
+                return unchanged
         
         try:
+            cursor = get_cursor()
+            
             # Get database info with separate queries to avoid syntax issues
             cursor.execute("SELECT DATABASE() as current_db")
             current_db_result = cursor.fetchone()
@@ -342,32 +1583,97 @@ def get_status():
             current_user = 'Connected User'
             version = 'MariaDB/MySQL'
             
-        cursor.close()
+        if cursor:
+            cursor.close()
         
-        return jsonify({
+        status = {
             'connected': True,
             'database': current_database,
             'current_db': current_db,
             'current_user': current_user,
             'mysql_version': version
-        })
+        }
+        # Pollers pass stats=false so unchanged status is answered with 304
+        if request.args.get('stats', '').lower() not in ('0', 'false'):
+            status.update({
+                'pool': pool.stats(),
+                'cache': result_cache.stats(),
+                'catalog': catalog.stats(),
+                'slow_log': slow_log.stats(),
+                'compression': compression.stats(),
+                'replicas': replicas.stats() if replicas is not None else None
+            })
+        response = jsonify(status)
+        if tag:
+            response.set_etag(tag)
+        return response
     else:
         return jsonify({'connected': False})
 
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus metrics for requests, the pool and the caches"""
+    gauges = {'cache': result_cache.stats(), 'compression': compression.stats()}
+    if pool:
+        gauges['pool'] = pool.stats()
+        gauges['catalog'] = catalog.stats()
+    if replicas is not None:
+        gauges['replicas'] = replicas.stats()
+    return Response(metrics.render(gauges), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/slow-queries', methods=['GET', 'POST', 'DELETE'])
+def slow_queries():
+    """Slow-query records and per-fingerprint percentiles
+
+    POST changes ``threshold_ms`` or ``explain`` at runtime; DELETE clears the log.
+    """
+    if request.method == 'DELETE':
+        slow_log.clear()
+        return jsonify({'success': True, 'message': 'Slow-query log cleared', 'slow_log': slow_log.stats()})
+    
+    if request.method == 'POST':
+        data = request.json or {}
+        try:
+            if 'threshold_ms' in data:
+                slow_log.threshold_ms = float(data['threshold_ms'])
+            if 'explain' in data:
+                slow_log.explain = bool(data['explain'])
+        except (TypeError, ValueError) as e:
+            return jsonify({'success': False, 'message': f'Invalid threshold: {str(e)}'}), 400
+        return jsonify({'success': True, 'slow_log': slow_log.stats()})
+    
+    limit = int(request.args.get('limit', 50))
+    return jsonify({
+        'success': True,
+        'slow_log': slow_log.stats(),
+        'fingerprints': slow_log.summary(limit),
+        'records': slow_log.recent(limit, request.args.get('fingerprint'))
+    })
+
+@app.route('/api/cache', methods=['GET', 'DELETE'])
+def cache_status():
+    """Get result cache counters, or clear the cache with DELETE"""
+    if request.method == 'DELETE':
+        result_cache.invalidate()
+        return jsonify({'success': True, 'message': 'Cache cleared', 'cache': result_cache.stats()})
+    
+    return jsonify({'success': True, 'cache': result_cache.stats()})
+
 @app.route('/api/tables', methods=['GET'])
 def list_tables():
     """List all tables in the current database"""
-    if not connection or not connection.is_connected():
+    if pool is None:
         return jsonify({'success': False, 'message': 'Not connected to database'}), 400
     
+    cursor = None
     try:
-        cursor = get_cursor()
-        cursor.execute("SHOW TABLES")
-        tables = [list(table.values())[0] for table in cursor.fetchall()]
+        cursor = get_read_cursor()
+        details = catalog.tables(cursor)
         
         return jsonify({
             'success': True,
-            'tables': tables
+            'tables': [table['name'] for table in details],
+            'details': details
         })
     except Error as e:
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -378,28 +1684,34 @@ def list_tables():
 @app.route('/api/table-info', methods=['POST'])
 def get_table_info():
     """Get table structure information"""
-    if not connection or not connection.is_connected():
+    if pool is None:
         return jsonify({'success': False, 'message': 'Not connected to database'}), 400
     
+    cursor = None
     try:
         data = request.json
         table_name = data.get('table')
+        exact = data.get('exact', False)
         
         if not table_name:
             return jsonify({'success': False, 'message': 'Table name is required'}), 400
         
-        cursor = get_cursor()
-        cursor.execute(f"DESCRIBE `{table_name}`")
-        columns = cursor.fetchall()
+        cursor = get_read_cursor()
+        info = catalog.table_info(cursor, table_name)
+        row_count = info['row_estimate']
         
-        cursor.execute(f"SELECT COUNT(*) as row_count FROM `{table_name}`")
-        row_count = cursor.fetchone()['row_count']
+        if exact:
+            # COUNT(*) is a full scan on InnoDB, so it is opt-in
+            cursor.execute(f"SELECT COUNT(*) as row_count FROM `{table_name}`")
+            row_count = cursor.fetchone()['row_count']
         
         return jsonify({
             'success': True,
             'table': table_name,
-            'columns': columns,
-            'row_count': row_count
+            'columns': info['columns'],
+            'indexes': info['indexes'],
+            'row_count': row_count,
+            'row_count_exact': bool(exact)
         })
     except Error as e:
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -410,13 +1722,13 @@ def get_table_info():
 @app.route('/api/databases', methods=['GET'])
 def list_databases():
     """List all databases"""
-    if not connection or not connection.is_connected():
+    if pool is None:
         return jsonify({'success': False, 'message': 'Not connected to database'}), 400
     
+    cursor = None
     try:
-        cursor = get_cursor()
-        cursor.execute("SHOW DATABASES")
-        databases = [list(db.values())[0] for db in cursor.fetchall()]
+        cursor = get_read_cursor()
+        databases = catalog.databases(cursor)
         
         return jsonify({
             'success': True,
@@ -434,4 +1746,5 @@ if __name__ == '__main__':
     print("pip install flask flask-cors mysql-connector-python")
     print("\nServer will run on http://localhost:5001")
     print("Make sure MySQL server is running on localhost:3306")
-    app.run(debug=True, host='0.0.0.0', port=5001)
\ No newline at end of file
+    # Threaded so concurrent requests each borrow their own pooled connection
+    app.run(debug=True, host='0.0.0.0', port=5001, threaded=True)
\ No newline at end of file
@@ -0,0 +1,198 @@
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+# Start of a table list or single table reference
+_TABLE_KEYWORD = re.compile(r'\b(FROM|JOIN|INTO|UPDATE|TABLE)\s+', re.IGNORECASE)
+
+# End of a FROM table list
+_FROM_END = re.compile(r'\b(WHERE|GROUP|ORDER|LIMIT|HAVING|UNION|JOIN|ON|USING|SET|FOR|LOCK|INTO|WINDOW)\b|[();]',
+                       re.IGNORECASE)
+
+_IDENTIFIER = re.compile(r'`?(\w+)`?(?:\s*\.\s*`?(\w+)`?)?')
+
+# Results that can change without any table being written
+_NON_DETERMINISTIC = re.compile(
+    r'\b(NOW|SYSDATE|CURDATE|CURTIME|CURRENT_DATE|CURRENT_TIME|CURRENT_TIMESTAMP|UTC_DATE|UTC_TIME|'
+    r'UTC_TIMESTAMP|UNIX_TIMESTAMP|RAND|UUID|UUID_SHORT|USER|CURRENT_USER|SESSION_USER|CONNECTION_ID|'
+    r'LAST_INSERT_ID|FOUND_ROWS|ROW_COUNT|SLEEP|GET_LOCK|RELEASE_LOCK|BENCHMARK)\s*\(|'
+    r'\bFOR\s+UPDATE\b|\bLOCK\s+IN\s+SHARE\s+MODE\b|\bINTO\s+(OUTFILE|DUMPFILE)\b|@',
+    re.IGNORECASE
+)
+
+
+# Quoted strings and identifiers, with backslash or doubled-quote escapes
+_QUOTED = re.compile(r"""'(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.|"")*"|`(?:[^`]|``)*`""", re.DOTALL)
+
+
+def normalize_sql(sql):
+    """Collapse whitespace outside quotes and drop a trailing semicolon
+
+    Whitespace inside a string literal is part of the value, so
+    ``WHERE name = 'a  b'`` and ``WHERE name = 'a b'`` stay different.
+    """
+    parts = []
+    last = 0
+    for match in _QUOTED.finditer(sql):
+        parts.append(re.sub(r'\s+', ' ', sql[last:match.start()]))
+        parts.append(match.group())
+        last = match.end()
+    parts.append(re.sub(r'\s+', ' ', sql[last:]))
+    return ''.join(parts).strip().rstrip(';').strip()
+
+
+def referenced_tables(sql):
+    """Best-effort set of lower-cased table names a statement reads or writes"""
+    tables = set()
+    for match in _TABLE_KEYWORD.finditer(sql):
+        rest = sql[match.end():]
+        if match.group(1).upper() == 'FROM':
+            # FROM a, b AS x, c ... runs until the next clause
+            end = _FROM_END.search(rest)
+            parts = (rest[:end.start()] if end else rest).split(',')
+        else:
+            parts = [rest]
+        for part in parts:
+            ident = _IDENTIFIER.match(part.strip())
+            if ident:
+                tables.add((ident.group(2) or ident.group(1)).lower())
+    return tables
+
+
+def is_cacheable(sql):
+    """Only plain, deterministic SELECTs are cached"""
+    return sql.lstrip().upper().startswith('SELECT') and not _NON_DETERMINISTIC.search(sql)
+
+
+def estimate_size(records):
+    """Rough in-memory size of a list of row dicts"""
+    size = sys.getsizeof(records)
+    for row in records:
+        size += sys.getsizeof(row)
+        for value in row.values():
+            size += sys.getsizeof(value)
+    return size
+
+
+class ResultCache:
+    """In-process LRU cache of SELECT results with per-table invalidation
+
+    Entries expire after ``ttl`` seconds, and the least recently used ones
+    are evicted once the estimated size passes ``max_bytes``. A write to a
+    table drops every cached result that read from it.
+    """
+
+    def __init__(self, ttl=5.0, max_bytes=64 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._by_table = {}
+        self._derived = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # Bumped by every invalidation so a result read before a write can't
+        # be stored after it
+        self.version = 0
+
+    @staticmethod
+    def make_key(database, sql, params=None):
+        """Cache key for a statement, or None if its parameters can't be hashed"""
+        if isinstance(params, dict):
+            params = sorted(params.items())
+        key = (database, normalize_sql(sql), tuple(params or ()))
+        try:
+            hash(key)
+        except TypeError:
+            # A list or dict parameter; run the query uncached
+            return None
+        return key
+
+    def get(self, key):
+        """Return a cached result, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, tables, expires, size = entry
+            if expires <= time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, tables, size, version):
+        """Store a result read from ``tables`` while the cache was at ``version``"""
+        if size > self.max_bytes // 8:
+            # One huge result would flush everything else out
+            return
+        with self._lock:
+            if version != self.version:
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, tables, time.monotonic() + self.ttl, size)
+            self._bytes += size
+            for table in tables:
+                self._by_table.setdefault(table, set()).add(key)
+            while self._bytes > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def link(self, source, derived):
+        """Treat writes to ``source`` as writes to ``derived`` (e.g. a trigger-maintained table)"""
+        with self._lock:
+            self._derived.setdefault(source.lower(), set()).add(derived.lower())
+
+    def invalidate(self, tables=None):
+        """Drop results that read from any of ``tables``; None drops everything"""
+        if tables is not None:
+            tables = {table.lower() for table in tables}
+            tables |= {derived for table in tables for derived in self._derived.get(table, ())}
+        with self._lock:
+            self.version += 1
+            if tables is None:
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+                self._by_table.clear()
+                self._bytes = 0
+                return
+            for table in tables:
+                for key in self._by_table.pop(table, set()):
+                    if key in self._entries:
+                        self._remove(key)
+                        self.invalidations += 1
+
+    def _remove(self, key):
+        value, tables, expires, size = self._entries.pop(key)
+        self._bytes -= size
+        for table in tables:
+            keys = self._by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[table]
+
+    def stats(self):
+        """Snapshot of cache counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
@@ -0,0 +1,149 @@
+import threading
+import time
+
+from mysql.connector import Error
+
+# Statements that change the schema and must drop cached metadata
+DDL_PREFIXES = ('CREATE', 'ALTER', 'DROP', 'RENAME', 'TRUNCATE')
+
+
+def is_ddl(sql):
+    """Check whether a statement is DDL"""
+    return sql.lstrip().upper().startswith(DDL_PREFIXES)
+
+
+class Catalog:
+    """TTL cache of schema metadata for the connected database
+
+    Databases, tables (with row estimates from information_schema) and per-table
+    columns and indexes are cached for ``ttl`` seconds. An expired entry is
+    still served while a background thread reloads it on its own pooled
+    connection, so page refreshes never wait on the catalog queries.
+    """
+
+    def __init__(self, pool, ttl=30.0):
+        self.pool = pool
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._refreshing = set()
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    def _get(self, key, loader, cursor):
+        """Return a cached value, loading it with ``cursor`` on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires = entry
+                self.hits += 1
+                if expires <= time.monotonic() and key not in self._refreshing:
+                    self._refreshing.add(key)
+                    threading.Thread(target=self._refresh, args=(key, loader), daemon=True).start()
+                return value
+            self.misses += 1
+
+        value = loader(cursor)
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+        return value
+
+    def _refresh(self, key, loader):
+        """Reload one entry on a connection of its own"""
+        conn = None
+        cursor = None
+        try:
+            conn = self.pool.acquire()
+            cursor = conn.cursor(dictionary=True)
+            value = loader(cursor)
+            with self._lock:
+                # Skip the store if the key was invalidated meanwhile
+                if key in self._refreshing:
+                    self._entries[key] = (value, time.monotonic() + self.ttl)
+                    self.refreshes += 1
+        except Error:
+            pass
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+            if cursor:
+                cursor.close()
+            if conn:
+                self.pool.release(conn)
+
+    def databases(self, cursor):
+        """Names of all databases"""
+        return self._get(('databases',), _load_databases, cursor)
+
+    def tables(self, cursor):
+        """Tables of the current database with size and row estimates"""
+        return self._get(('tables',), _load_tables, cursor)
+
+    def table_info(self, cursor, table_name):
+        """Columns, indexes and estimated row count of one table"""
+        return self._get(('table', table_name.lower()), lambda c: _load_table_info(c, table_name), cursor)
+
+    def invalidate(self, table_name=None):
+        """Drop one table's metadata (and the table list), or everything"""
+        with self._lock:
+            if table_name is None:
+                self._entries.clear()
+                self._refreshing.clear()
+                return
+            for key in (('tables',), ('table', table_name.lower())):
+                self._entries.pop(key, None)
+                self._refreshing.discard(key)
+
+    def stats(self):
+        """Snapshot of catalog counters"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'background_refreshes': self.refreshes,
+            }
+
+
+def _load_databases(cursor):
+    cursor.execute("SHOW DATABASES")
+    return [list(db.values())[0] for db in cursor.fetchall()]
+
+
+def _load_tables(cursor):
+    cursor.execute(
+        "SELECT TABLE_NAME AS name, ENGINE AS engine, TABLE_ROWS AS row_estimate, "
+        "DATA_LENGTH AS data_length, INDEX_LENGTH AS index_length "
+        "FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() ORDER BY TABLE_NAME"
+    )
+    return cursor.fetchall()
+
+
+def _load_table_info(cursor, table_name):
+    cursor.execute(f"DESCRIBE `{table_name}`")
+    columns = cursor.fetchall()
+
+    cursor.execute(f"SHOW INDEX FROM `{table_name}`")
+    indexes = {}
+    for row in cursor.fetchall():
+        index = indexes.setdefault(row['Key_name'], {
+            'name': row['Key_name'],
+            'unique': not row['Non_unique'],
+            'columns': []
+        })
+        index['columns'].append(row['Column_name'])
+
+    cursor.execute(
+        "SELECT TABLE_ROWS AS row_estimate FROM information_schema.TABLES "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+        (table_name,)
+    )
+    estimate = cursor.fetchone()
+
+    return {
+        'columns': columns,
+        'indexes': list(indexes.values()),
+        'row_estimate': estimate['row_estimate'] if estimate else None
+    }
@@ -0,0 +1,246 @@
+import hashlib
+import threading
+import time
+import zlib
+
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Bodies smaller than this are sent as-is; the headers would outweigh the savings
+MIN_SIZE = 1024
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/')
+
+# Server-Sent Events go out uncompressed; proxies tend to buffer compressed streams
+UNCOMPRESSED_TYPES = ('text/event-stream',)
+
+# Methods whose responses carry ETags and can be answered with 304
+CONDITIONAL_METHODS = ('GET', 'HEAD')
+
+# A streamed response is flushed once this much input is buffered in the compressor...
+FLUSH_BYTES = 64 * 1024
+
+# ...or on the first chunk arriving this many seconds after the last flush
+FLUSH_INTERVAL = 0.1
+
+
+def content_etag(data):
+    """Strong ETag for a response body"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class _Gzip:
+    def __init__(self, level):
+        # wbits 31: zlib stream with a gzip header and trailer
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class _Brotli:
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class _Zstd:
+    def __init__(self, level):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class Compression:
+    """Negotiated response compression and conditional GET for a Flask app
+
+    ``install(app)`` adds an after-request hook. JSON, NDJSON and text bodies
+    of at least ``min_size`` bytes are compressed with the best encoding the
+    client accepts, preferring zstd, then brotli (when those packages are
+    installed), then gzip. Streamed responses are compressed as they go and
+    flushed after the first chunk, then once ``FLUSH_BYTES`` of input is
+    buffered or ``FLUSH_INTERVAL`` seconds have passed. Both are checked per
+    chunk, so a stalled upstream holds its buffered tail until it yields
+    again or ends.
+
+    Successful GET/HEAD responses get a strong ETag from a hash of the
+    uncompressed body, suffixed with the content coding, and ``Cache-Control:
+    no-cache`` so browsers revalidate; a matching ``If-None-Match`` gets
+    ``304 Not Modified`` before any compression work is done. Routes can set
+    their own ETag (e.g. from a data version) and it is used as the base
+    without hashing the body; calling ``revalidate(tag)`` first skips
+    building the body as well.
+    """
+
+    def __init__(self, min_size=MIN_SIZE, gzip_level=6, brotli_quality=4, zstd_level=3):
+        self.min_size = min_size
+        self.encoders = {}
+        if zstandard is not None:
+            self.encoders['zstd'] = lambda: _Zstd(zstd_level)
+        if brotli is not None:
+            self.encoders['br'] = lambda: _Brotli(brotli_quality)
+        self.encoders['gzip'] = lambda: _Gzip(gzip_level)
+        self._lock = threading.Lock()
+        self.compressed = 0
+        self.not_modified = 0
+
+    def install(self, app):
+        app.after_request(self._after_request)
+
+    def negotiate(self):
+        """Best content coding for this request, or None for identity"""
+        return request.accept_encodings.best_match(list(self.encoders))
+
+    def _matching_etag(self, tag):
+        """The variant of ``tag`` (bare or with a coding suffix) the client already has"""
+        for candidate in [tag] + [f'{tag}-{encoding}' for encoding in self.encoders]:
+            if request.if_none_match.contains(candidate):
+                return candidate
+        return None
+
+    def revalidate(self, tag):
+        """A 304 for ``tag`` if the client already has it, else None
+
+        Lets a route with a cheap version tag answer a revalidation before
+        building its body; the route then sets the same tag on its 200.
+        """
+        if request.method not in CONDITIONAL_METHODS:
+            return None
+        matched = self._matching_etag(tag)
+        if matched is None:
+            return None
+        with self._lock:
+            self.not_modified += 1
+        response = Response(status=304)
+        response.set_etag(matched)
+        response.cache_control.no_cache = True
+        response.vary.add('Accept-Encoding')
+        return response
+
+    def _after_request(self, response):
+        if response.status_code != 200 or 'Content-Encoding' in response.headers or response.direct_passthrough:
+            return response
+        mimetype = response.mimetype or ''
+        if not mimetype.startswith(COMPRESSIBLE_TYPES) or mimetype in UNCOMPRESSED_TYPES:
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = self.negotiate()
+
+        if response.is_streamed:
+            if encoding:
+                self._compress_stream(response, encoding)
+            return response
+
+        conditional = request.method in CONDITIONAL_METHODS
+        route_tag = response.get_etag()[0] if conditional else None
+        if route_tag and self._not_modified(response, self._matching_etag(route_tag)):
+            # The route's own tag matched; the body is neither hashed nor compressed
+            return response
+
+        data = response.get_data()
+        if len(data) < self.min_size:
+            encoding = None
+
+        if conditional:
+            tag = route_tag or content_etag(data)
+            etag = f'{tag}-{encoding}' if encoding else tag
+            if self._not_modified(response, etag if request.if_none_match.contains(etag) else None):
+                return response
+            response.set_etag(etag)
+            response.cache_control.no_cache = True
+
+        if encoding:
+            encoder = self.encoders[encoding]()
+            response.set_data(encoder.compress(data) + encoder.finish())
+            response.headers['Content-Encoding'] = encoding
+            with self._lock:
+                self.compressed += 1
+        return response
+
+    def _not_modified(self, response, etag):
+        """Turn ``response`` into a 304 for ``etag``; False when ``etag`` is None"""
+        if etag is None:
+            return False
+        with self._lock:
+            self.not_modified += 1
+        response.set_etag(etag)
+        response.cache_control.no_cache = True
+        response.status_code = 304
+        response.set_data(b'')
+        return True
+
+    def _compress_stream(self, response, encoding):
+        body = response.response
+        encoder = self.encoders[encoding]()
+
+        def generate():
+            try:
+                buffered = 0
+                flushed_at = None
+                for chunk in body:
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    if not chunk:
+                        continue
+                    data = encoder.compress(chunk)
+                    buffered += len(chunk)
+                    now = time.monotonic()
+                    # The first chunk goes out at once; after that, flush by size or age
+                    if flushed_at is None or buffered >= FLUSH_BYTES or now - flushed_at >= FLUSH_INTERVAL:
+                        data += encoder.flush()
+                        buffered, flushed_at = 0, now
+                    if data:
+                        yield data
+                yield encoder.finish()
+            finally:
+                # Closing the original body tears down stream_with_context
+                if hasattr(body, 'close'):
+                    body.close()
+
+        response.response = generate()
+        response.headers['Content-Encoding'] = encoding
+        response.headers.pop('Content-Length', None)
+        with self._lock:
+            self.compressed += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'encodings': list(self.encoders),
+                'min_size': self.min_size,
+                'compressed': self.compressed,
+                'not_modified': self.not_modified
+            }
@@ -0,0 +1,271 @@
+import base64
+import datetime
+import decimal
+import json
+import re
+import time
+import urllib.error
+import urllib.request
+
+# Rows pulled from each side per round while finding the smaller one
+ROUND_ROWS = 1000
+
+# Rows the build side may hold; past this on both sides the join is refused
+MAX_BUILD_ROWS = 1000000
+
+JOIN_TYPES = ('inner', 'left', 'right')
+
+
+def get_path(doc, path):
+    """Read a dotted field path from a decoded JSON document"""
+    for part in path.split('.'):
+        if not isinstance(doc, dict):
+            return None
+        doc = doc.get(part)
+    return doc
+
+
+_NUMBER = re.compile(r'-?\d+(\.\d+)?([eE][-+]?\d+)?')
+_DATE = re.compile(r'\d{4}-\d{2}-\d{2}([T ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?)?')
+
+
+def _number(value):
+    if value.is_nan() or value.is_infinite():
+        return str(value)
+    return int(value) if value == value.to_integral_value() else float(value)
+
+
+def join_key(value):
+    """Hashable join key with both sides' types brought together
+
+    The Mongo side arrives as JSON, so ObjectIds are hex strings, dates are
+    ISO strings and Decimal128 values are numeric strings. Numbers (and
+    numeric strings) compare by value, so 2, 2.0, '2.00' and Decimal('2.00')
+    match. Dates and datetimes compare by their ISO text, with a date equal
+    to midnight of that day. Extended JSON wrappers ({"$oid": ...},
+    {"$date": ...}, {"$numberDecimal": ...}) are unwrapped. NULL matches nothing.
+    """
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, dict) and len(value) == 1:
+        (tag, inner), = value.items()
+        if tag in ('$oid', '$numberDecimal', '$numberLong', '$numberInt', '$numberDouble'):
+            return join_key(inner)
+        if tag == '$date':
+            return join_key(inner if isinstance(inner, str) else inner.get('$numberLong'))
+    if isinstance(value, (int, float, decimal.Decimal)):
+        return _number(decimal.Decimal(str(value)) if isinstance(value, float) else decimal.Decimal(value))
+    if isinstance(value, datetime.datetime):
+        return value.replace(tzinfo=None).isoformat()
+    if isinstance(value, datetime.date):
+        return datetime.datetime.combine(value, datetime.time()).isoformat()
+    if isinstance(value, (bytes, bytearray)):
+        # The Mongo app sends Binary as base64 text
+        return base64.b64encode(value).decode()
+    if isinstance(value, str):
+        text = value.strip()
+        if _NUMBER.fullmatch(text):
+            return _number(decimal.Decimal(text))
+        if _DATE.fullmatch(text):
+            try:
+                return join_key(datetime.datetime.fromisoformat(text.replace(' ', 'T')))
+            except ValueError:
+                return value
+        if text.endswith('Z') and _DATE.fullmatch(text[:-1]):
+            try:
+                return join_key(datetime.datetime.fromisoformat(text[:-1]))
+            except ValueError:
+                return value
+        return value
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, sort_keys=True, default=str)
+    return value
+
+
+class Source:
+    """One side of the join: a row iterator with read statistics"""
+
+    def __init__(self, name, rows, key, close=None):
+        self.name = name
+        self.key = key
+        self._rows = rows
+        self._close = close
+        self.buffer = []
+        self.done = False
+        self.rows = 0
+        self.seconds = 0.0
+        self.first_row_ms = None
+        self.role = None
+        self.opened = time.perf_counter()
+
+    def next(self):
+        """The next row, or None once the side is exhausted"""
+        started = time.perf_counter()
+        try:
+            row = next(self._rows, None)
+        finally:
+            self.seconds += time.perf_counter() - started
+        if row is None:
+            self.done = True
+            return None
+        if self.first_row_ms is None:
+            self.first_row_ms = round((time.perf_counter() - self.opened) * 1000, 2)
+        self.rows += 1
+        return row
+
+    def pull(self, count):
+        """Buffer up to ``count`` more rows"""
+        for _ in range(count):
+            row = self.next()
+            if row is None:
+                return
+            self.buffer.append(row)
+
+    def rest(self):
+        """Buffered rows followed by the unread ones"""
+        buffered, self.buffer = self.buffer, []
+        yield from buffered
+        while True:
+            row = self.next()
+            if row is None:
+                return
+            yield row
+
+    def close(self):
+        if self._close is not None:
+            self._close(not self.done)
+            self._close = None
+
+    def stats(self):
+        return {
+            'role': self.role,
+            'rows': self.rows,
+            'time_to_first_row_ms': self.first_row_ms,
+            'read_ms': round(self.seconds * 1000, 2)
+        }
+
+
+def choose_build(left, right, build=None, max_build_rows=MAX_BUILD_ROWS):
+    """Pick the build side, reading both in rounds until one is exhausted
+
+    Returns (build, probe). With ``build`` given that side is simply read in
+    full. Either way at most ``max_build_rows`` rows are buffered per side.
+    """
+    sides = {left.name: left, right.name: right}
+    if build is not None:
+        chosen = sides[build]
+        chosen.pull(max_build_rows + 1)
+        if not chosen.done:
+            raise ValueError(f'{build} side has more than {max_build_rows} rows; add a filter or let the join choose')
+        other = right if chosen is left else left
+    else:
+        while not left.done and not right.done:
+            left.pull(ROUND_ROWS)
+            right.pull(ROUND_ROWS)
+            if len(left.buffer) > max_build_rows and len(right.buffer) > max_build_rows:
+                raise ValueError(f'Both sides have more than {max_build_rows} rows; add filters')
+        if left.done and right.done:
+            chosen = left if len(left.buffer) <= len(right.buffer) else right
+        else:
+            chosen = left if left.done else right
+        other = right if chosen is left else left
+    chosen.role, other.role = 'build', 'probe'
+    return chosen, other
+
+
+def hash_join(left, right, join_type='inner', build=None, limit=None, stats=None):
+    """Yield ``{left.name: row, right.name: row}`` pairs joined on the sides' keys
+
+    The smaller side (the first to run out while both are read in rounds)
+    is loaded into a hash table; the other side is streamed past it. ``left``
+    joins keep unmatched ``left`` rows, ``right`` joins unmatched ``right``
+    rows. ``stats`` is filled in as the join runs.
+    """
+    stats = stats if stats is not None else {}
+    started = time.perf_counter()
+    build_side, probe_side = choose_build(left, right, build)
+    preserve_build = (join_type == 'left' and build_side is left) or (join_type == 'right' and build_side is right)
+    preserve_probe = join_type in ('left', 'right') and not preserve_build
+
+    table = {}
+    for row in build_side.rest():
+        key = join_key(get_path(row, build_side.key))
+        table.setdefault(key, []).append(row)
+    # NULL keys never match, but outer joins still return their rows
+    unmatched_nulls = table.pop(None, [])
+    matched = set()
+    stats['join'] = {
+        'type': join_type,
+        'build_side': build_side.name,
+        'build_keys': len(table),
+        'build_ms': round((time.perf_counter() - started) * 1000, 2),
+        'output_rows': 0
+    }
+
+    output = 0
+
+    def pair(build_row, probe_row):
+        return {build_side.name: build_row, probe_side.name: probe_row}
+
+    try:
+        for probe_row in probe_side.rest():
+            key = join_key(get_path(probe_row, probe_side.key))
+            rows = table.get(key) if key is not None else None
+            if rows:
+                if preserve_build:
+                    matched.add(key)
+                for build_row in rows:
+                    yield pair(build_row, probe_row)
+                    output += 1
+                    stats['join']['output_rows'] = output
+                    if limit and output >= limit:
+                        return
+            elif preserve_probe:
+                yield pair(None, probe_row)
+                output += 1
+                stats['join']['output_rows'] = output
+                if limit and output >= limit:
+                    return
+
+        if preserve_build:
+            leftovers = [row for key, rows in table.items() if key not in matched for row in rows]
+            for build_row in leftovers + unmatched_nulls:
+                yield pair(build_row, None)
+                output += 1
+                stats['join']['output_rows'] = output
+                if limit and output >= limit:
+                    return
+    finally:
+        stats['join']['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 2)
+
+
+def mongo_export(api_url, request_body, timeout=30):
+    """Open an NDJSON export on the Mongo API; returns (response, row iterator)
+
+    The export is plain JSON, encoded like the Mongo app's other routes
+    (ObjectId and dates as strings), not Extended JSON; :func:`join_key`
+    lines those values up with MySQL's.
+
+    Raises ValueError with the peer's message if it rejects the request and
+    OSError if it cannot be reached.
+    """
+    body = json.dumps(dict(request_body, format='ndjson'), default=str).encode()
+    request = urllib.request.Request(f"{api_url.rstrip('/')}/api/export", data=body,
+                                     headers={'Content-Type': 'application/json'})
+    try:
+        response = urllib.request.urlopen(request, timeout=timeout)
+    except urllib.error.HTTPError as e:
+        try:
+            message = json.loads(e.read()).get('message', str(e))
+        except ValueError:
+            message = str(e)
+        raise ValueError(f'Mongo API: {message}') from e
+
+    def rows():
+        for line in response:
+            if line.strip():
+                yield json.loads(line)
+
+    return response, rows()
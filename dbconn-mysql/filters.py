@@ -0,0 +1,74 @@
+import re
+
+# Comparison operators allowed in a structured filter leaf
+_COMPARISONS = {'=', '!=', '<>', '<', '<=', '>', '>=', 'LIKE', 'NOT LIKE'}
+
+_FIELD = re.compile(r'^\w+(\.\w+)?$')
+
+
+def quote_field(field):
+    """Backtick-quote a column name, optionally qualified as table.column"""
+    if not isinstance(field, str) or not _FIELD.match(field):
+        raise ValueError(f'Invalid field name: {field!r}')
+    return '.'.join(f'`{part}`' for part in field.split('.'))
+
+
+def compile_filter(node):
+    """Compile a structured filter into a parameterized WHERE clause
+
+    A filter is either a leaf ``{"field": ..., "op": ..., "value": ...}`` or a
+    group ``{"and": [...]}``, ``{"or": [...]}`` or ``{"not": {...}}``. Leaf
+    operators are the usual comparisons plus ``in``/``not in`` (list value),
+    ``between`` (``[low, high]``), ``is null`` and ``is not null``. A leaf may
+    also give a ``range`` object with any of ``gt``/``gte``/``lt``/``lte``.
+
+    Returns ``(sql, params)`` with ``%s`` placeholders, so filters that only
+    differ in their values compile to the same statement text.
+    """
+    if not isinstance(node, dict):
+        raise ValueError('Filter must be an object')
+
+    for group, joiner in (('and', ' AND '), ('or', ' OR ')):
+        if group in node:
+            children = node[group]
+            if not isinstance(children, list) or not children:
+                raise ValueError(f'"{group}" needs a non-empty list')
+            parts = [compile_filter(child) for child in children]
+            return '(' + joiner.join(sql for sql, _ in parts) + ')', [p for _, params in parts for p in params]
+
+    if 'not' in node:
+        sql, params = compile_filter(node['not'])
+        return f'NOT ({sql})', params
+
+    column = quote_field(node.get('field'))
+
+    if 'range' in node:
+        bounds = node['range']
+        if not isinstance(bounds, dict):
+            raise ValueError('"range" must be an object')
+        ops = {'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<='}
+        parts = [(f'{column} {ops[name]} %s', value) for name, value in bounds.items() if name in ops]
+        if not parts or len(parts) != len(bounds):
+            raise ValueError('"range" takes gt, gte, lt and lte')
+        return '(' + ' AND '.join(sql for sql, _ in parts) + ')', [value for _, value in parts]
+
+    op = str(node.get('op', '=')).strip().upper()
+    value = node.get('value')
+
+    if op in _COMPARISONS:
+        if value is None:
+            raise ValueError(f'Use "is null" instead of comparing {node["field"]} with null')
+        return f'{column} {op} %s', [value]
+    if op in ('IN', 'NOT IN'):
+        if not isinstance(value, list) or not value:
+            raise ValueError(f'"{op.lower()}" needs a non-empty list')
+        placeholders = ', '.join(['%s'] * len(value))
+        return f'{column} {op} ({placeholders})', list(value)
+    if op == 'BETWEEN':
+        if not isinstance(value, list) or len(value) != 2:
+            raise ValueError('"between" needs [low, high]')
+        return f'{column} BETWEEN %s AND %s', list(value)
+    if op in ('IS NULL', 'IS NOT NULL'):
+        return f'{column} {op}', []
+
+    raise ValueError(f'Unsupported operator: {node.get("op")!r}')
@@ -0,0 +1,234 @@
+import threading
+import time
+from collections import OrderedDict, deque
+
+import mysql.connector
+from mysql.connector.errors import Error, PoolError
+
+
+class StatementCache:
+    """Prepared cursors for one connection, keyed by statement text
+
+    A prepared cursor keeps its server-side statement handle only while it is
+    re-executed with the very same string object (the connector compares
+    with ``is``), so the first string seen for each statement text is kept
+    and handed back with its cursor; callers must execute that one. The least
+    recently used statement is closed once ``max_statements`` is exceeded.
+    """
+
+    def __init__(self, connection, max_statements=64):
+        self.connection = connection
+        self.max_statements = max_statements
+        self._cursors = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def cursor(self, sql):
+        """Return (statement, prepared cursor) for ``sql``
+
+        ``statement`` equals ``sql`` but is the string object the cursor was
+        prepared with; pass it to ``execute()`` so the prepared handle is reused.
+        """
+        cached = self._cursors.get(sql)
+        if cached is not None:
+            self._cursors.move_to_end(sql)
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        cached = self._cursors[sql] = (sql, self.connection.cursor(prepared=True, dictionary=True))
+        while len(self._cursors) > self.max_statements:
+            _, (_, evicted) = self._cursors.popitem(last=False)
+            try:
+                evicted.close()
+            except Error:
+                pass
+        return cached
+
+    def __len__(self):
+        return len(self._cursors)
+
+
+class _PoolEntry:
+    """Bookkeeping for one physical connection owned by the pool"""
+
+    __slots__ = ('connection', 'created_at', 'uses', 'statements')
+
+    def __init__(self, connection, max_statements):
+        self.connection = connection
+        self.created_at = time.monotonic()
+        self.uses = 0
+        self.statements = StatementCache(connection, max_statements)
+
+
+class ConnectionPool:
+    """Thread-safe pool of MySQL connections
+
+    Connections are borrowed per request with ``acquire()`` and handed back
+    with ``release()``. A borrowed connection is health checked first, and a
+    connection is recycled once it has been used ``max_uses`` times or is
+    older than ``max_lifetime`` seconds (0 disables either limit).
+    """
+
+    def __init__(self, min_size=1, max_size=10, timeout=30.0,
+                 max_uses=0, max_lifetime=0, max_statements=64, **connect_kwargs):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError('Pool size must satisfy 0 <= min_size <= max_size and max_size >= 1')
+
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_uses = max_uses
+        self.max_lifetime = max_lifetime
+        self.max_statements = max_statements
+        self.connect_kwargs = connect_kwargs
+
+        self._lock = threading.Condition()
+        self._idle = deque()
+        self._checked_out = {}
+        self._size = 0
+        self._closed = False
+
+        # Counters reported by stats()
+        self._acquired_total = 0
+        self._created_total = 0
+        self._recycled_total = 0
+        self._timeouts_total = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+
+        for _ in range(min_size):
+            self._idle.append(self._open())
+            self._size += 1
+
+    def _open(self):
+        """Open a new physical connection"""
+        connection = mysql.connector.connect(**self.connect_kwargs)
+        self._created_total += 1
+        return _PoolEntry(connection, self.max_statements)
+
+    def _expired(self, entry):
+        """Check whether a connection has reached its recycle limits"""
+        if self.max_uses and entry.uses >= self.max_uses:
+            return True
+        if self.max_lifetime and time.monotonic() - entry.created_at >= self.max_lifetime:
+            return True
+        return False
+
+    def _discard(self, entry):
+        """Close a connection without returning it to the pool"""
+        try:
+            entry.connection.close()
+        except Error:
+            pass
+
+    def acquire(self):
+        """Borrow a healthy connection, waiting up to ``timeout`` seconds"""
+        started = time.monotonic()
+        deadline = started + self.timeout
+
+        with self._lock:
+            while True:
+                if self._closed:
+                    raise PoolError('Connection pool is closed')
+                if self._idle:
+                    entry = self._idle.popleft()
+                    break
+                if self._size < self.max_size:
+                    # Reserve the slot now and connect outside the lock
+                    self._size += 1
+                    entry = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts_total += 1
+                    raise PoolError(f'Timed out after {self.timeout}s waiting for a connection')
+                self._lock.wait(remaining)
+
+        try:
+            if entry is not None and (self._expired(entry) or not entry.connection.is_connected()):
+                self._discard(entry)
+                self._recycled_total += 1
+                entry = None
+            if entry is None:
+                entry = self._open()
+        except Error:
+            with self._lock:
+                self._size -= 1
+                self._lock.notify()
+            raise
+
+        waited = time.monotonic() - started
+        with self._lock:
+            entry.uses += 1
+            self._checked_out[id(entry.connection)] = entry
+            self._acquired_total += 1
+            self._wait_time_total += waited
+            self._wait_time_max = max(self._wait_time_max, waited)
+
+        return entry.connection
+
+    def statements(self, connection):
+        """Prepared statement cache of a borrowed connection"""
+        with self._lock:
+            return self._checked_out[id(connection)].statements
+
+    def release(self, connection):
+        """Return a borrowed connection to the pool"""
+        with self._lock:
+            entry = self._checked_out.pop(id(connection), None)
+        if entry is None:
+            return
+
+        reusable = not self._closed and not self._expired(entry)
+        if reusable:
+            try:
+                # Never hand the next borrower a half-finished transaction
+                if connection.in_transaction:
+                    connection.rollback()
+            except Error:
+                reusable = False
+
+        if not reusable:
+            self._discard(entry)
+            self._recycled_total += 1
+
+        with self._lock:
+            if reusable:
+                self._idle.append(entry)
+            else:
+                self._size -= 1
+            self._lock.notify()
+
+    def close(self):
+        """Close idle connections; borrowed ones are closed as they come back"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._size -= len(idle)
+            self._lock.notify_all()
+        for entry in idle:
+            self._discard(entry)
+
+    def stats(self):
+        """Snapshot of pool usage"""
+        with self._lock:
+            acquired = self._acquired_total
+            caches = [entry.statements for entry in self._idle]
+            caches += [entry.statements for entry in self._checked_out.values()]
+            return {
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'size': self._size,
+                'in_use': len(self._checked_out),
+                'idle': len(self._idle),
+                'acquired_total': acquired,
+                'created_total': self._created_total,
+                'recycled_total': self._recycled_total,
+                'timeouts_total': self._timeouts_total,
+                'avg_wait_ms': round(self._wait_time_total / acquired * 1000, 3) if acquired else 0.0,
+                'max_wait_ms': round(self._wait_time_max * 1000, 3),
+                'prepared_statements': sum(len(cache) for cache in caches),
+                'prepared_hits': sum(cache.hits for cache in caches),
+                'prepared_misses': sum(cache.misses for cache in caches),
+            }
@@ -0,0 +1,230 @@
+import re
+import threading
+import time
+
+from mysql.connector.errors import Error
+
+from pool import ConnectionPool
+
+# Replicas further behind than this many seconds are skipped
+DEFAULT_MAX_LAG = 5.0
+
+# Seconds between replication health checks
+DEFAULT_CHECK_INTERVAL = 5.0
+
+# Clauses that lock rows, write variables or files, or read session state
+_NOT_READ_ONLY = re.compile(
+    r'\bFOR\s+UPDATE\b|\bFOR\s+SHARE\b|\bLOCK\s+IN\s+SHARE\s+MODE\b|\bINTO\b'
+    r'|\b(?:GET_LOCK|RELEASE_LOCK|LAST_INSERT_ID|FOUND_ROWS|NEXTVAL)\s*\(',
+    re.IGNORECASE)
+
+
+def is_read_only(sql):
+    """Whether a statement can run on a replica: a plain SELECT or WITH query"""
+    return sql.lstrip().upper().startswith(('SELECT', 'WITH')) and not _NOT_READ_ONLY.search(sql)
+
+
+def parse_host(entry):
+    """Connection keyword arguments for a replica given as "host:port" or a dict"""
+    if isinstance(entry, dict):
+        if not entry.get('host'):
+            raise ValueError('Each replica needs a host')
+        return dict(entry, port=int(entry.get('port', 3306)))
+    host, _, port = str(entry).partition(':')
+    if not host:
+        raise ValueError('Each replica needs a host')
+    return {'host': host, 'port': int(port or 3306)}
+
+
+class Replica:
+    """One read replica: its pool, connections in use and replication health"""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.name = f"{pool.connect_kwargs['host']}:{pool.connect_kwargs['port']}"
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.reads = 0
+        self.healthy = False
+        self.replicating = None
+        self.lag = None
+        self.error = 'Not checked yet'
+        self.checked_at = None
+
+    def acquire(self):
+        with self._lock:
+            self.in_use += 1
+        try:
+            connection = self.pool.acquire()
+        except Error:
+            with self._lock:
+                self.in_use -= 1
+            raise
+        with self._lock:
+            self.reads += 1
+        return connection
+
+    def release(self, connection):
+        self.pool.release(connection)
+        with self._lock:
+            self.in_use -= 1
+
+    def check(self):
+        """Read replication state; a stopped replication thread marks it unhealthy"""
+        conn = None
+        cursor = None
+        try:
+            conn = self.pool.acquire()
+            cursor = conn.cursor(dictionary=True)
+            try:
+                # MySQL 8.0.22+ and MariaDB 10.5+; SHOW SLAVE STATUS on older servers
+                cursor.execute('SHOW REPLICA STATUS')
+            except Error:
+                cursor.execute('SHOW SLAVE STATUS')
+            rows = cursor.fetchall()
+            if not rows:
+                # Not set up as a replica (e.g. a second standalone test server)
+                self.replicating, self.lag, self.error = False, 0, None
+            else:
+                lags = [row.get('Seconds_Behind_Source', row.get('Seconds_Behind_Master')) for row in rows]
+                self.replicating = True
+                if any(lag is None for lag in lags):
+                    self.lag, self.error = None, 'Replication is not running'
+                else:
+                    self.lag, self.error = max(lags), None
+            self.healthy = self.error is None
+        except Error as e:
+            self.healthy, self.error = False, str(e)
+        finally:
+            if cursor:
+                try:
+                    cursor.close()
+                except Error:
+                    pass
+            if conn is not None:
+                self.pool.release(conn)
+            self.checked_at = time.time()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'name': self.name,
+                'healthy': self.healthy,
+                'replicating': self.replicating,
+                'lag_seconds': self.lag,
+                'in_use': self.in_use,
+                'reads': self.reads,
+                'error': self.error,
+                'checked_at': self.checked_at
+            }
+
+
+class ReplicaSet:
+    """Read replicas chosen by least connections, skipping unhealthy or lagging ones
+
+    A background thread checks each replica's replication lag every
+    ``check_interval`` seconds, starting straight away; until a replica's
+    first check it isn't used. ``acquire()`` hands out a connection from the
+    healthy replica with the fewest connections in use and lag within
+    ``max_lag``, or returns None so the caller reads from the primary. A
+    client's reads also go to the primary for ``max_lag`` seconds after its
+    own ``note_write()``, so it sees its own writes; other clients keep using
+    the replicas.
+    """
+
+    def __init__(self, replicas, max_lag=DEFAULT_MAX_LAG, check_interval=DEFAULT_CHECK_INTERVAL):
+        if float(max_lag) < 0 or float(check_interval) <= 0:
+            raise ValueError('max_lag must not be negative and check_interval must be positive')
+        self.replicas = replicas
+        self.max_lag = float(max_lag)
+        self.check_interval = float(check_interval)
+        self._lock = threading.Lock()
+        # Client -> monotonic time of its last write; any client's for recently_written()
+        self._writes = {}
+        self._last_write = None
+        self.primary_reads = 0
+        self.failovers = 0
+        self._stopped = threading.Event()
+        # Checked in the background so an unreachable replica can't hold up the connect
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def check(self):
+        for replica in self.replicas:
+            replica.check()
+
+    def _run(self):
+        self.check()
+        while not self._stopped.wait(self.check_interval):
+            self.check()
+
+    def note_write(self, client=None):
+        """Keep ``client``'s reads on the primary until replicas have caught up"""
+        now = time.monotonic()
+        with self._lock:
+            self._last_write = now
+            if len(self._writes) >= 1024:
+                # Forget clients whose window has passed
+                self._writes = {key: at for key, at in self._writes.items() if now - at < self.max_lag}
+            self._writes[client] = now
+
+    def recently_written(self):
+        """Whether any client wrote within ``max_lag``; replica reads may miss it"""
+        with self._lock:
+            return self._last_write is not None and time.monotonic() - self._last_write < self.max_lag
+
+    def _candidates(self, client=None):
+        with self._lock:
+            written = self._writes.get(client)
+            if written is not None and time.monotonic() - written < self.max_lag:
+                return []
+        usable = [replica for replica in self.replicas
+                  if replica.healthy and replica.lag is not None and replica.lag <= self.max_lag]
+        return sorted(usable, key=lambda replica: replica.in_use)
+
+    def acquire(self, client=None):
+        """A (replica, connection) pair for ``client``'s read, or None to use the primary"""
+        for replica in self._candidates(client):
+            try:
+                return replica, replica.acquire()
+            except Error as e:
+                # Down since the last check; skip it until the next one succeeds
+                replica.healthy, replica.error = False, str(e)
+                with self._lock:
+                    self.failovers += 1
+        with self._lock:
+            self.primary_reads += 1
+        return None
+
+    def close(self):
+        self._stopped.set()
+        for replica in self.replicas:
+            replica.pool.close()
+
+    def stats(self):
+        replicas = [replica.stats() for replica in self.replicas]
+        with self._lock:
+            return {
+                'max_lag': self.max_lag,
+                'check_interval': self.check_interval,
+                'healthy': sum(1 for replica in replicas if replica['healthy']),
+                'replica_reads': sum(replica['reads'] for replica in replicas),
+                'primary_reads': self.primary_reads,
+                'failovers': self.failovers,
+                'replicas': replicas
+            }
+
+
+def replica_set(hosts, connect_kwargs, pool_options=None, max_lag=DEFAULT_MAX_LAG,
+                check_interval=DEFAULT_CHECK_INTERVAL):
+    """ReplicaSet over ``hosts``, each with the primary's credentials unless overridden
+
+    Replica pools open connections lazily, so an unreachable replica is only
+    marked unhealthy instead of failing the whole connect.
+    """
+    if not isinstance(hosts, list):
+        raise ValueError('replicas.hosts must be a list')
+    options = dict(pool_options or {}, min_size=0)
+    replicas = [Replica(ConnectionPool(**options, **dict(connect_kwargs, **parse_host(entry))))
+                for entry in hosts]
+    return ReplicaSet(replicas, max_lag, check_interval)
@@ -0,0 +1,108 @@
+import re
+
+_DELIMITER_DIRECTIVE = re.compile(r'DELIMITER[ \t]+(\S+)[^\n]*', re.IGNORECASE)
+
+# Statements that change the connection's default database
+_USE = re.compile(r'^\s*USE\s', re.IGNORECASE)
+
+
+def _skip_quoted(script, i):
+    """Index just past the quoted string or identifier starting at ``i``"""
+    quote = script[i]
+    j = i + 1
+    n = len(script)
+    while j < n:
+        ch = script[j]
+        if ch == '\\' and quote != '`':
+            j += 2
+            continue
+        if ch == quote:
+            # A doubled quote is an escaped quote, not the end
+            if j + 1 < n and script[j + 1] == quote:
+                j += 2
+                continue
+            return j + 1
+        j += 1
+    line = script.count('\n', 0, i) + 1
+    raise ValueError(f'Unterminated {quote} literal starting on line {line}')
+
+
+def split_statements(script):
+    """Split a SQL script into statements the way the mysql client does
+
+    Delimiters inside quoted strings, backquoted identifiers and comments are
+    ignored, ``--``/``#``/``/* */`` comments are dropped (``/*! */`` version
+    comments are kept), and ``DELIMITER`` lines switch the terminator so
+    procedures and triggers can contain ``;``. Returns a list of dicts with
+    the statement ``sql``, the ``line`` it starts on and whether it was
+    ended by a custom delimiter (``compound``).
+    """
+    statements = []
+    delimiter = ';'
+    buf = []
+    start = None
+    i = 0
+    n = len(script)
+
+    def emit():
+        sql = ''.join(buf).strip()
+        if sql:
+            statements.append({
+                'sql': sql,
+                'line': script.count('\n', 0, start) + 1,
+                'compound': delimiter != ';'
+            })
+        buf.clear()
+
+    while i < n:
+        ch = script[i]
+
+        if start is None:
+            if ch.isspace():
+                i += 1
+                continue
+            directive = _DELIMITER_DIRECTIVE.match(script, i)
+            if directive:
+                delimiter = directive.group(1)
+                i = directive.end()
+                continue
+
+        if ch in '\'"`':
+            end = _skip_quoted(script, i)
+            if start is None:
+                start = i
+            buf.append(script[i:end])
+            i = end
+            continue
+
+        if ch == '#' or (script.startswith('--', i) and (i + 2 >= n or script[i + 2] in ' \t\r\n')):
+            end = script.find('\n', i)
+            i = n if end == -1 else end
+            continue
+
+        if script.startswith('/*', i) and not script.startswith('/*!', i):
+            end = script.find('*/', i + 2)
+            if end == -1:
+                raise ValueError(f'Unterminated comment starting on line {script.count(chr(10), 0, i) + 1}')
+            buf.append(' ')
+            i = end + 2
+            continue
+
+        if script.startswith(delimiter, i):
+            emit()
+            start = None
+            i += len(delimiter)
+            continue
+
+        if start is None:
+            start = i
+        buf.append(ch)
+        i += 1
+
+    emit()
+    return statements
+
+
+def changes_database(sql):
+    """Check whether a statement is a USE"""
+    return bool(_USE.match(sql))
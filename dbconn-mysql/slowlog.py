@@ -0,0 +1,272 @@
+import hashlib
+import json
+import logging
+import logging.handlers
+import math
+import os
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+
+from cache import normalize_sql
+
+_STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\"")
+_NUMBER_LITERAL = re.compile(r'(?<![\w`])-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b')
+_VALUE_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+
+# Duration samples kept per fingerprint for percentiles
+SAMPLES_PER_FINGERPRINT = 1000
+
+# Distinct fingerprints summarized; the least recently seen go first
+MAX_FINGERPRINTS = 1000
+
+# Log files open for writing, shared by logs with the same path: path -> [handler, users]
+_handlers = {}
+_handlers_lock = threading.Lock()
+
+
+def _open_handler(path, max_bytes, backups):
+    """The rotating handler for ``path``, opened on first use"""
+    key = os.path.abspath(path)
+    with _handlers_lock:
+        entry = _handlers.get(key)
+        if entry is None:
+            handler = logging.handlers.RotatingFileHandler(path, maxBytes=int(max_bytes), backupCount=int(backups))
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            entry = _handlers[key] = [handler, 0]
+        entry[1] += 1
+        return entry[0]
+
+
+def _release_handler(path):
+    """Close the handler for ``path`` once no log uses it"""
+    key = os.path.abspath(path)
+    with _handlers_lock:
+        entry = _handlers.get(key)
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] <= 0:
+            del _handlers[key]
+            entry[0].close()
+
+
+def fingerprint_sql(sql):
+    """Statement text with literals replaced by ``?``, and its short hash
+
+    ``WHERE id = 5`` and ``WHERE id = 7`` share a fingerprint, as do IN lists
+    and multi-row VALUES of any length.
+    """
+    text = normalize_sql(sql)
+    text = _STRING_LITERAL.sub('?', text)
+    text = _NUMBER_LITERAL.sub('?', text)
+    text = _VALUE_LIST.sub('(?+)', text)
+    text = text.replace('%s', '?')
+    return hashlib.sha1(text.lower().encode()).hexdigest()[:16], text
+
+
+def rows_examined(plan):
+    """Sum of rows read per table scan in an ``EXPLAIN FORMAT=JSON`` plan"""
+    total = 0
+
+    def walk(node):
+        nonlocal total
+        if isinstance(node, dict):
+            if 'table_name' in node and 'rows_examined_per_scan' in node:
+                total += node['rows_examined_per_scan']
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(plan)
+    return total
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class SlowQueryLog:
+    """Bounded in-memory log of statements slower than ``threshold_ms``
+
+    The newest ``capacity`` records are kept in a ring buffer and summarized
+    per fingerprint. With ``path`` set every record is also appended as a JSON
+    line to a size-rotated file. Plans are captured by one background worker
+    so the slow request itself isn't delayed further; when the worker falls
+    behind, plans are skipped rather than queued without bound.
+    """
+
+    def __init__(self, threshold_ms=200, capacity=500, path=None, max_bytes=10 * 1024 * 1024, backups=3,
+                 explain=True, max_fingerprints=MAX_FINGERPRINTS):
+        self.threshold_ms = float(threshold_ms)
+        self.capacity = int(capacity)
+        self.explain = bool(explain)
+        self.max_fingerprints = int(max_fingerprints)
+        if self.max_fingerprints < 1:
+            raise ValueError('max_fingerprints must be positive')
+        self._lock = threading.Lock()
+        self._records = deque(maxlen=self.capacity)
+        self._fingerprints = OrderedDict()
+        self._sequence = 0
+        self._plans = queue.Queue(maxsize=100)
+        self._worker = None
+        self.recorded = 0
+        self.plans_skipped = 0
+
+        self.fingerprints_evicted = 0
+        self._closed = False
+
+        # Reconnecting with the same path reuses the open file rather than adding a handler
+        self._handler = _open_handler(path, max_bytes, backups) if path else None
+        self.path = path
+
+    def is_slow(self, seconds):
+        return seconds * 1000 >= self.threshold_ms
+
+    def record(self, statement, params, seconds, rows_returned, explain=None, kind='query'):
+        """Add one slow statement; ``explain()`` returns (plan, rows_examined)"""
+        fingerprint, normalized = fingerprint_sql(statement)
+        duration_ms = round(seconds * 1000, 3)
+        with self._lock:
+            self._sequence += 1
+            entry = {
+                'id': self._sequence,
+                'time': time.time(),
+                'kind': kind,
+                'fingerprint': fingerprint,
+                'statement': normalized,
+                'params': list(params) if params else [],
+                'duration_ms': duration_ms,
+                'rows_returned': rows_returned,
+                'rows_examined': None,
+                'plan': None
+            }
+            self._records.append(entry)
+            self.recorded += 1
+
+            stats = self._fingerprints.get(fingerprint)
+            if stats is not None:
+                self._fingerprints.move_to_end(fingerprint)
+            else:
+                if len(self._fingerprints) >= self.max_fingerprints:
+                    self._fingerprints.popitem(last=False)
+                    self.fingerprints_evicted += 1
+                stats = self._fingerprints[fingerprint] = {
+                    'statement': normalized,
+                    'count': 0,
+                    'total_ms': 0.0,
+                    'max_ms': 0.0,
+                    'samples': deque(maxlen=SAMPLES_PER_FINGERPRINT)
+                }
+            stats['count'] += 1
+            stats['total_ms'] += duration_ms
+            stats['max_ms'] = max(stats['max_ms'], duration_ms)
+            stats['samples'].append(duration_ms)
+
+        if explain is not None and self.explain:
+            self._queue_plan(entry, explain)
+        else:
+            self._write(entry)
+        return entry
+
+    def _queue_plan(self, entry, explain):
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._capture_plans, daemon=True)
+                    self._worker.start()
+        try:
+            self._plans.put_nowait((entry, explain))
+        except queue.Full:
+            self.plans_skipped += 1
+            self._write(entry)
+
+    def _capture_plans(self):
+        while not self._closed:
+            item = self._plans.get()
+            if item is None:
+                return
+            entry, explain = item
+            try:
+                plan, examined = explain()
+                with self._lock:
+                    entry['plan'] = plan
+                    entry['rows_examined'] = examined
+            except Exception as e:
+                entry['plan_error'] = str(e)
+            self._write(entry)
+
+    def _write(self, entry):
+        handler = self._handler
+        if handler is not None:
+            handler.handle(logging.makeLogRecord({'msg': json.dumps(entry, default=str), 'levelno': logging.INFO, 'levelname': 'INFO'}))
+
+    def recent(self, limit=50, fingerprint=None):
+        """Newest records first"""
+        with self._lock:
+            records = [dict(entry) for entry in reversed(self._records)
+                       if fingerprint is None or entry['fingerprint'] == fingerprint]
+        return records[:limit]
+
+    def summary(self, limit=50):
+        """Per-fingerprint count, total time and p50/p95/p99, slowest total first"""
+        with self._lock:
+            items = [(fingerprint, dict(stats, samples=sorted(stats['samples'])))
+                     for fingerprint, stats in self._fingerprints.items()]
+        summary = []
+        for fingerprint, stats in items:
+            samples = stats.pop('samples')
+            stats.update({
+                'fingerprint': fingerprint,
+                'total_ms': round(stats['total_ms'], 3),
+                'avg_ms': round(stats['total_ms'] / stats['count'], 3),
+                'p50_ms': percentile(samples, 0.50),
+                'p95_ms': percentile(samples, 0.95),
+                'p99_ms': percentile(samples, 0.99)
+            })
+            summary.append(stats)
+        summary.sort(key=lambda stats: stats['total_ms'], reverse=True)
+        return summary[:limit]
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+            self._fingerprints.clear()
+
+    def close(self):
+        """Stop the plan worker and release the log file, if any"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._worker is not None:
+            try:
+                self._plans.put_nowait(None)
+            except queue.Full:
+                # The worker sees _closed after its current plan
+                pass
+        if self._handler is not None:
+            _release_handler(self.path)
+            self._handler = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'threshold_ms': self.threshold_ms,
+                'capacity': self.capacity,
+                'entries': len(self._records),
+                'fingerprints': len(self._fingerprints),
+                'max_fingerprints': self.max_fingerprints,
+                'fingerprints_evicted': self.fingerprints_evicted,
+                'recorded': self.recorded,
+                'plans_skipped': self.plans_skipped,
+                'explain': self.explain,
+                'file': self.path
+            }
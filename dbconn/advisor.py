@@ -0,0 +1,106 @@
+import threading
+from collections import Counter, deque
+
+_RANGE_OPERATORS = {'$gt', '$gte', '$lt', '$lte', '$in', '$regex', '$exists', '$type'}
+
+
+def filter_fields(filter_query, equality, ranges):
+    """Collect indexable fields from the conjunctive part of a find filter"""
+    for field, condition in filter_query.items():
+        if field == '$and':
+            for clause in condition:
+                if isinstance(clause, dict):
+                    filter_fields(clause, equality, ranges)
+            continue
+        if field.startswith('$'):
+            # $or, $nor, $expr, $text ... can't use one compound index
+            continue
+        if not isinstance(condition, dict) or not any(key.startswith('$') for key in condition):
+            equality.add(field)
+            continue
+        operators = set(condition)
+        if operators == {'$eq'} or (operators == {'$in'} and len(condition['$in']) == 1):
+            equality.add(field)
+        elif operators & _RANGE_OPERATORS:
+            ranges.add(field)
+
+
+def find_collscans(explain):
+    """COLLSCAN stages in a find or aggregate explain document"""
+    scans = []
+
+    def walk(node):
+        if isinstance(node, dict):
+            if node.get('stage') == 'COLLSCAN':
+                scans.append({'stage': 'COLLSCAN', 'filter': node.get('filter'), 'direction': node.get('direction')})
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(explain.get('queryPlanner', explain))
+    if not scans and 'stages' in explain:
+        walk(explain['stages'])
+    return scans
+
+
+class IndexAdvisor:
+    """Suggests compound indexes from the shapes of recent reads
+
+    Fields are ordered by the equality, sort, range rule, and shapes already
+    served by the prefix of an existing index are skipped.
+    """
+
+    def __init__(self, history=1000):
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=history)
+
+    def record_read(self, collection_name, filter_query, sort):
+        """Remember the filter and sort fields of one /api/read request"""
+        equality, ranges = set(), set()
+        if isinstance(filter_query, dict):
+            filter_fields(filter_query, equality, ranges)
+        if not equality and not ranges and not sort:
+            return
+        shape = (collection_name, tuple(sorted(equality)), tuple(sorted(ranges - equality)), tuple(sort or ()))
+        with self._lock:
+            self._recent.append(shape)
+
+    def suggest(self, existing_indexes, collection_name=None, limit=10):
+        """Rank index suggestions for recent reads
+
+        ``existing_indexes(collection)`` returns the key lists, as
+        ``[(field, direction), ...]``, of indexes the collection already has.
+        """
+        with self._lock:
+            shapes = Counter(shape for shape in self._recent
+                             if collection_name is None or shape[0] == collection_name)
+
+        suggestions = {}
+        for (name, equality, ranges, sort), count in shapes.items():
+            keys = [(field, 1) for field in equality]
+            keys += [(field, direction) for field, direction in sort if field not in equality]
+            if ranges and ranges[0] not in [field for field, _ in keys]:
+                keys.append((ranges[0], 1))
+            if not keys or keys == [('_id', 1)]:
+                continue
+            key = (name, tuple(keys))
+            if key in suggestions:
+                suggestions[key]['occurrences'] += count
+                continue
+            fields = [field for field, _ in keys]
+            if any([field for field, _ in index[:len(fields)]] == fields for index in existing_indexes(name)):
+                continue
+            suggestions[key] = {
+                'collection': name,
+                'keys': [[field, direction] for field, direction in keys],
+                'occurrences': count
+            }
+
+        ranked = sorted(suggestions.values(), key=lambda s: s['occurrences'], reverse=True)
+        return ranked[:limit]
+
+    def clear(self):
+        with self._lock:
+            self._recent.clear()
@@ -0,0 +1,74 @@
+import threading
+import time
+
+
+class Catalog:
+    """TTL cache for collection lists and collection statistics
+
+    Values are produced by loader callables and kept for ``ttl`` seconds. Once
+    an entry expires it is still served while a background thread reloads it,
+    so repeated page refreshes never wait on ``listCollections``/``collStats``.
+    """
+
+    def __init__(self, ttl=30.0):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._refreshing = set()
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    def get(self, key, loader):
+        """Return the cached value for ``key``, loading it on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires = entry
+                self.hits += 1
+                if expires <= time.monotonic() and key not in self._refreshing:
+                    self._refreshing.add(key)
+                    threading.Thread(target=self._refresh, args=(key, loader), daemon=True).start()
+                return value
+            self.misses += 1
+
+        value = loader()
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+        return value
+
+    def _refresh(self, key, loader):
+        """Reload one entry in the background"""
+        try:
+            value = loader()
+            with self._lock:
+                # Skip the store if the key was invalidated meanwhile
+                if key in self._refreshing:
+                    self._entries[key] = (value, time.monotonic() + self.ttl)
+                    self.refreshes += 1
+        except Exception:
+            pass
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def invalidate(self, key=None):
+        """Drop one entry, or everything"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self._refreshing.clear()
+            else:
+                self._entries.pop(key, None)
+                self._refreshing.discard(key)
+
+    def stats(self):
+        """Snapshot of catalog counters"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'background_refreshes': self.refreshes,
+            }
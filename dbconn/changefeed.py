@@ -0,0 +1,314 @@
+"""Change streams fanned out to Server-Sent Events subscribers
+
+One ``collection.watch()`` cursor per collection is shared by every
+subscriber of that collection. Recent events are kept with their resume
+tokens, so a client that reconnects with ``Last-Event-ID`` is replayed from
+memory and rejoins the shared stream without gaps; older tokens get a
+stream of their own that resumes on the server. Change streams need a
+replica set (a single-node one is enough).
+"""
+import queue
+import threading
+from collections import deque
+
+from pymongo.errors import PyMongoError
+
+from serialization import dumps
+
+OPERATION_TYPES = ('insert', 'update', 'replace', 'delete', 'drop', 'rename', 'dropDatabase', 'invalidate')
+
+# Events kept per feed for replaying to reconnecting clients
+REPLAY_EVENTS = 1000
+
+# Undelivered events per subscriber before it is cut off and must reconnect
+SUBSCRIBER_QUEUE = 1000
+
+# How long a feed thread blocks in getMore before checking for shutdown
+POLL_MS = 1000
+
+# Seconds between SSE comment lines that keep idle connections open
+HEARTBEAT_SECONDS = 15
+
+_END = object()
+
+
+def encode_token(token):
+    """SSE event id for a resume token"""
+    return token['_data']
+
+
+def decode_token(event_id):
+    """Resume token for an SSE event id"""
+    return {'_data': event_id}
+
+
+def _touches(change, fields):
+    """Whether an update changed any of ``fields`` (or a path under one)"""
+    description = change.get('updateDescription')
+    if not description:
+        return True
+    changed = list(description.get('updatedFields', {})) + list(description.get('removedFields', []))
+    changed += [entry['field'] for entry in description.get('truncatedArrays', [])]
+    return any(path == field or path.startswith(field + '.') or field.startswith(path + '.')
+               for path in changed for field in fields)
+
+
+def _project(document, fields):
+    if document is None:
+        return None
+    projected = {'_id': document['_id']} if '_id' in document else {}
+    for field in fields:
+        head = field.split('.', 1)[0]
+        if head in document:
+            projected[head] = document[head]
+    return projected
+
+
+def event_payload(change, fields=None):
+    """JSON-ready view of a change event, limited to ``fields`` when given"""
+    payload = {
+        'operationType': change['operationType'],
+        'ns': change.get('ns'),
+        'documentKey': change.get('documentKey'),
+        'clusterTime': change.get('clusterTime'),
+    }
+    if 'fullDocument' in change:
+        payload['fullDocument'] = _project(change['fullDocument'], fields) if fields else change['fullDocument']
+    description = change.get('updateDescription')
+    if description:
+        updated = description.get('updatedFields', {})
+        removed = description.get('removedFields', [])
+        if fields:
+            updated = {path: value for path, value in updated.items()
+                       if any(path == f or path.startswith(f + '.') or f.startswith(path + '.') for f in fields)}
+            removed = [path for path in removed if any(path == f or path.startswith(f + '.') for f in fields)]
+        payload['updateDescription'] = {'updatedFields': updated, 'removedFields': removed}
+    return payload
+
+
+class Subscriber:
+    """One SSE client: its filter and a bounded queue of pending events"""
+
+    def __init__(self, operation_types=None, fields=None):
+        self.operation_types = set(operation_types) if operation_types else None
+        self.fields = list(fields) if fields else None
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE)
+        self.overflowed = False
+        self.delivered = 0
+        self.feed = None
+
+    def wants(self, change):
+        if self.operation_types is not None and change['operationType'] not in self.operation_types:
+            return False
+        if self.fields and change['operationType'] == 'update':
+            return _touches(change, self.fields)
+        return True
+
+    def offer(self, item):
+        """Queue an event; returns False once the subscriber has fallen too far behind"""
+        if self.overflowed:
+            return False
+        try:
+            self.queue.put_nowait(item)
+            return True
+        except queue.Full:
+            self.overflowed = True
+            return False
+
+    def close(self, reason=None):
+        try:
+            self.queue.put_nowait((_END, reason))
+        except queue.Full:
+            # The reader drains the queue, sees overflowed and stops anyway
+            self.overflowed = True
+
+    def events(self):
+        """SSE frames for this subscriber until it is closed or falls behind"""
+        yield 'retry: 2000\n\n'
+        while True:
+            try:
+                change, reason = self.queue.get(timeout=HEARTBEAT_SECONDS)
+            except queue.Empty:
+                if self.overflowed:
+                    yield _frame('overflow', {'message': 'Client fell behind; reconnect to resume'})
+                    return
+                yield ': keepalive\n\n'
+                continue
+            if change is _END:
+                if reason:
+                    yield _frame('error', {'message': reason})
+                return
+            self.delivered += 1
+            yield _frame('change', event_payload(change, self.fields), encode_token(change['_id']))
+            if self.overflowed and self.queue.empty():
+                yield _frame('overflow', {'message': 'Client fell behind; reconnect to resume'})
+                return
+
+
+def _frame(event, data, event_id=None):
+    lines = []
+    if event_id:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    lines.append(f'data: {dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+class _Feed:
+    """A change stream on one collection and the subscribers sharing it"""
+
+    def __init__(self, collection, full_document, resume_after=None, on_idle=None):
+        self.collection = collection
+        self.subscribers = set()
+        self.replay = deque(maxlen=REPLAY_EVENTS)
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.events = 0
+        self.on_idle = on_idle
+        # Opened here so a missing replica set fails the request, not the thread
+        self.stream = collection.watch(full_document=full_document, resume_after=resume_after,
+                                       max_await_time_ms=POLL_MS)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        reason = None
+        try:
+            while not self.stopped.is_set():
+                change = self.stream.try_next()
+                if change is None:
+                    continue
+                with self.lock:
+                    self.events += 1
+                    self.replay.append(change)
+                    for subscriber in list(self.subscribers):
+                        if subscriber.wants(change) and not subscriber.offer((change, None)):
+                            self.subscribers.discard(subscriber)
+                            if not self.subscribers:
+                                # Cutting off the last subscriber idles the feed like leave() does
+                                self.stopped.set()
+                if change['operationType'] in ('drop', 'rename', 'dropDatabase', 'invalidate'):
+                    reason = f"Change stream invalidated by {change['operationType']}"
+                    break
+        except PyMongoError as e:
+            if not self.stopped.is_set():
+                reason = f'Change stream failed: {e}'
+        finally:
+            self.stopped.set()
+            try:
+                self.stream.close()
+            except PyMongoError:
+                pass
+            with self.lock:
+                subscribers, self.subscribers = self.subscribers, set()
+            for subscriber in subscribers:
+                subscriber.close(reason)
+            if self.on_idle is not None:
+                self.on_idle(self)
+
+    def join(self, subscriber, token=None):
+        """Add a subscriber, first replaying buffered events after ``token``
+
+        Returns False when ``token`` is not in the replay buffer.
+        """
+        with self.lock:
+            if self.stopped.is_set():
+                return False
+            if token is not None:
+                tokens = [change['_id'] for change in self.replay]
+                if token not in tokens:
+                    return False
+                for change in list(self.replay)[tokens.index(token) + 1:]:
+                    if subscriber.wants(change):
+                        subscriber.offer((change, None))
+            self.subscribers.add(subscriber)
+            return True
+
+    def leave(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+            idle = not self.subscribers
+        if idle:
+            self.stop()
+
+    def stop(self):
+        self.stopped.set()
+
+
+class ChangeFeedHub:
+    """Shared change streams keyed by client, database and collection name
+
+    ``subscribe()`` returns a :class:`Subscriber` whose ``events()`` generator
+    yields SSE frames. A feed closes when its last subscriber leaves.
+    """
+
+    def __init__(self, full_document='updateLookup'):
+        self.full_document = full_document
+        self._lock = threading.Lock()
+        self._feeds = {}
+        self._private = set()
+        self.resumed_from_buffer = 0
+        self.resumed_on_server = 0
+
+    def subscribe(self, collection, operation_types=None, fields=None, resume_token=None):
+        """Register a subscriber; raises PyMongoError if the stream can't be opened"""
+        subscriber = Subscriber(operation_types, fields)
+        # Sessions on different servers may use the same names; each client gets its own feeds
+        key = (id(collection.database.client), collection.database.name, collection.name)
+        with self._lock:
+            feed = self._feeds.get(key)
+            if feed is not None and feed.join(subscriber, resume_token):
+                if resume_token is not None:
+                    self.resumed_from_buffer += 1
+            elif resume_token is None:
+                # No shared feed yet, or its last subscriber left while we were looking it up
+                feed = self._feeds[key] = _Feed(collection, self.full_document, on_idle=self._forget)
+                feed.join(subscriber)
+            else:
+                # The token is older than the replay buffer: resume on the server
+                feed = _Feed(collection, self.full_document, resume_after=resume_token, on_idle=self._forget)
+                self._private.add(feed)
+                self.resumed_on_server += 1
+                feed.join(subscriber)
+        subscriber.feed = feed
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        subscriber.feed.leave(subscriber)
+
+    def _forget(self, feed):
+        with self._lock:
+            self._private.discard(feed)
+            for key, current in list(self._feeds.items()):
+                if current is feed:
+                    del self._feeds[key]
+
+    def close(self):
+        """Stop every feed; its subscribers are disconnected"""
+        with self._lock:
+            feeds = list(self._feeds.values()) + list(self._private)
+        for feed in feeds:
+            feed.stop()
+
+    def stats(self):
+        with self._lock:
+            feeds = list(self._feeds.items())
+            private = list(self._private)
+            return {
+                'feeds': {f'{db}.{name}': {'subscribers': len(feed.subscribers), 'events': feed.events}
+                          for (_, db, name), feed in feeds},
+                'resumed_streams': len(private),
+                'subscribers': sum(len(feed.subscribers) for _, feed in feeds) +
+                               sum(len(feed.subscribers) for feed in private),
+                'resumed_from_buffer': self.resumed_from_buffer,
+                'resumed_on_server': self.resumed_on_server
+            }
+
+
+def parse_list(value):
+    """Comma-separated query value (or JSON list) as a list of strings"""
+    if not value:
+        return None
+    if isinstance(value, (list, tuple)):
+        return [str(item) for item in value]
+    return [item.strip() for item in str(value).split(',') if item.strip()]
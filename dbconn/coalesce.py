@@ -0,0 +1,174 @@
+import threading
+import time
+
+from bson.errors import InvalidDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError, WriteError
+from pymongo.write_concern import WriteConcern
+
+# Documents per insert_many; a full batch is written straight away
+MAX_BATCH = 500
+
+# How long the first document of a batch waits for others to join it
+MAX_DELAY_MS = 5.0
+
+# Seconds a caller waits for its batch before giving up
+WAIT_TIMEOUT = 30.0
+
+
+class _Insert:
+    """One caller's document and, once its batch is written, the outcome"""
+    __slots__ = ('document', 'had_id', 'queued', 'done', 'inserted_id', 'error', 'batch_size')
+
+    def __init__(self, document):
+        self.document = document
+        self.had_id = '_id' in document
+        self.queued = time.perf_counter()
+        self.done = threading.Event()
+        self.inserted_id = None
+        self.error = None
+        self.batch_size = 0
+
+
+class _Batch:
+    __slots__ = ('collection', 'inserts', 'full')
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.inserts = []
+        self.full = threading.Event()
+
+
+class WriteCoalescer:
+    """Single-document inserts from concurrent requests, written as batches
+
+    ``insert()`` adds the document to the open batch for its collection and
+    blocks until that batch is written. The caller that opens a batch waits
+    up to ``max_delay_ms`` (less if ``max_batch`` documents arrive first),
+    then writes it with one ``insert_many(ordered=False)`` and wakes the
+    others. No background thread is involved, so replacing the coalescer
+    never strands a batch. Every caller gets its own ``inserted_id`` or
+    error: a document rejected by the server (say, a duplicate key) or
+    one that can't be encoded fails alone, a network error fails the whole
+    batch.
+    """
+
+    def __init__(self, max_batch=MAX_BATCH, max_delay_ms=MAX_DELAY_MS, write_concern=None, metrics=None):
+        if int(max_batch) < 1:
+            raise ValueError('max_batch must be positive')
+        if float(max_delay_ms) < 0:
+            raise ValueError('max_delay_ms must not be negative')
+        self.max_batch = int(max_batch)
+        self.max_delay_ms = float(max_delay_ms)
+        self.write_concern = WriteConcern(**write_concern) if write_concern else None
+        self.metrics = metrics
+        # Compared on reconnect, so the same settings keep this coalescer
+        self.options = {'max_batch': self.max_batch, 'max_delay_ms': self.max_delay_ms,
+                        'write_concern': dict(write_concern) if write_concern else None}
+        self._lock = threading.Lock()
+        self._open = {}
+        self.batches = 0
+        self.documents = 0
+        self.failed = 0
+
+    def insert(self, collection, document):
+        """Insert ``document`` as part of a batch; returns (inserted_id, batch size)
+
+        Raises the ``WriteError`` (``DuplicateKeyError`` for code 11000) the
+        server reported for this document, or whatever failed the batch.
+        """
+        if not isinstance(document, dict):
+            raise TypeError('document must be a JSON object')
+        item = _Insert(document)
+        key = (id(collection.database.client), collection.database.name, collection.name)
+        with self._lock:
+            batch = self._open.get(key)
+            leader = batch is None
+            if leader:
+                batch = self._open[key] = _Batch(collection)
+            batch.inserts.append(item)
+            if len(batch.inserts) >= self.max_batch:
+                # Close it now so the next document starts a new batch
+                del self._open[key]
+                batch.full.set()
+
+        if leader:
+            batch.full.wait(self.max_delay_ms / 1000)
+            with self._lock:
+                if self._open.get(key) is batch:
+                    del self._open[key]
+            self._write(batch)
+        elif not item.done.wait(WAIT_TIMEOUT):
+            raise TimeoutError(f'Batched insert not acknowledged within {WAIT_TIMEOUT} seconds')
+
+        if item.error is not None:
+            raise item.error
+        return item.inserted_id, item.batch_size
+
+    def _write(self, batch):
+        inserts = batch.inserts
+        started = time.perf_counter()
+        target = batch.collection
+        if self.write_concern is not None:
+            target = target.with_options(write_concern=self.write_concern)
+        try:
+            # insert_many sets _id on each document before sending it
+            target.insert_many([item.document for item in inserts], ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get('writeErrors', []):
+                cls = DuplicateKeyError if error.get('code') == 11000 else WriteError
+                inserts[error['index']].error = cls(error.get('errmsg'), error.get('code'), error)
+        except (InvalidDocument, TypeError, ValueError, OverflowError):
+            # One document can't be encoded; write them one by one so only it fails
+            self._write_each(target, inserts)
+        except Exception as e:
+            for item in inserts:
+                item.error = e
+        finally:
+            self._finish(batch, started)
+
+    @staticmethod
+    def _write_each(target, inserts):
+        for item in inserts:
+            try:
+                target.insert_one(item.document)
+            except DuplicateKeyError as e:
+                # Already sent by the batch before the bad document stopped it:
+                # the clash is on the _id insert_many assigned, so it's the same insert
+                key_value = (e.details or {}).get('keyValue')
+                if item.had_id or key_value != {'_id': item.document.get('_id')}:
+                    item.error = e
+            except Exception as e:
+                item.error = e
+
+    def _finish(self, batch, started):
+        inserts = batch.inserts
+        failed = 0
+        for item in inserts:
+            if item.error is None:
+                item.inserted_id = item.document.get('_id')
+            else:
+                failed += 1
+            item.batch_size = len(inserts)
+        with self._lock:
+            self.batches += 1
+            self.documents += len(inserts)
+            self.failed += failed
+        try:
+            if self.metrics is not None:
+                self.metrics.observe_write_batch(batch.collection.name, len(inserts),
+                                                 [started - item.queued for item in inserts])
+        finally:
+            for item in inserts:
+                item.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_batch': self.max_batch,
+                'max_delay_ms': self.max_delay_ms,
+                'write_concern': self.write_concern.document if self.write_concern is not None else None,
+                'batches': self.batches,
+                'documents': self.documents,
+                'failed': self.failed,
+                'average_batch': round(self.documents / self.batches, 2) if self.batches else 0
+            }
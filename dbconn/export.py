@@ -0,0 +1,346 @@
+import csv
+import io
+import json
+import zlib
+
+from bson import ObjectId
+from bson.binary import Binary
+from bson.decimal128 import Decimal128
+from bson.raw_bson import RawBSONDocument
+
+from serialization import dumps, encode_document
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# format: (mimetype, file extension)
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+# Codecs per format: text formats are wrapped in a compressed file, the
+# columnar ones compress inside the file
+COMPRESSION = {
+    'csv': ('gzip', 'zstd'),
+    'ndjson': ('gzip', 'zstd'),
+    'arrow': ('lz4', 'zstd'),
+    'parquet': ('snappy', 'gzip', 'zstd', 'lz4', 'brotli'),
+}
+
+FILE_COMPRESSION = {'gzip': ('application/gzip', 'gz'), 'zstd': ('application/zstd', 'zst')}
+
+# Documents fetched from the cursor and written per record batch
+DEFAULT_BATCH_ROWS = 10000
+
+# Record batches are gathered into row groups of about this many rows
+PARQUET_ROW_GROUP_ROWS = 100000
+
+# Arrow/Parquet metadata key listing, per column, values written as null
+# because they didn't fit the column's type
+NULLED_METADATA_KEY = 'dbconn.nulled_values'
+
+
+def check_options(fmt, compression):
+    """Validate a format/compression pair; raises ValueError"""
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    if fmt in ('arrow', 'parquet') and pyarrow is None:
+        raise ValueError(f'{fmt} export needs pyarrow (pip install pyarrow)')
+    if compression and compression != 'none' and compression not in COMPRESSION[fmt]:
+        raise ValueError(f"compression for {fmt} must be one of {', '.join(COMPRESSION[fmt])}")
+    if compression == 'zstd' and fmt in ('csv', 'ndjson') and zstandard is None:
+        raise ValueError('zstd compression needs zstandard (pip install zstandard)')
+
+
+def content_type(fmt, compression):
+    """Mimetype and file name suffix of an export"""
+    mimetype, extension = FORMATS[fmt]
+    if fmt in ('csv', 'ndjson') and compression in FILE_COMPRESSION:
+        mimetype, suffix = FILE_COMPRESSION[compression]
+        extension += '.' + suffix
+    return mimetype, extension
+
+
+def _infer_type(values):
+    arrow_type = pyarrow.array(values).type
+    if pyarrow.types.is_null(arrow_type):
+        return pyarrow.string()
+    if pyarrow.types.is_decimal(arrow_type):
+        # Inference sizes precision to the sampled values; keep their scale only
+        return pyarrow.decimal128(38, arrow_type.scale)
+    return arrow_type
+
+
+def _schema(columns, rows, types):
+    fields = []
+    for index, name in enumerate(columns):
+        arrow_type = types.get(name)
+        if arrow_type is None:
+            try:
+                arrow_type = _infer_type([row[index] for row in rows])
+            except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError):
+                arrow_type = pyarrow.string()
+        fields.append(pyarrow.field(str(name), arrow_type))
+    return pyarrow.schema(fields)
+
+
+def _text(value):
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode('utf-8', 'replace')
+    return str(value)
+
+
+# What pyarrow raises for a value its target type can't hold
+_MISFIT = (ValueError, TypeError, ArithmeticError, NotImplementedError)
+
+
+def _fit(value, arrow_type):
+    """``value`` as ``arrow_type`` if it converts without loss (2.0 -> 2, 3 -> 3.0, '4' -> 4), else None"""
+    try:
+        return pyarrow.array([value]).cast(arrow_type)[0].as_py()
+    except _MISFIT:
+        return None
+
+
+def _column(field, values, nulled):
+    if pyarrow.types.is_string(field.type):
+        values = [_text(value) for value in values]
+    try:
+        # Infer, then cast: a safe cast refuses what a typed build would truncate (2.5 -> 2)
+        array = pyarrow.array(values)
+        return array if array.type == field.type else array.cast(field.type)
+    except _MISFIT:
+        pass
+    # A later batch holds values the schema's type doesn't take; the stream can't
+    # change schema, so promote what fits and null the rest
+    fitted = [_fit(value, field.type) if value is not None else None for value in values]
+    lost = sum(1 for value, fit in zip(values, fitted) if value is not None and fit is None)
+    if lost:
+        nulled[field.name] = nulled.get(field.name, 0) + lost
+    return pyarrow.array(fitted, type=field.type)
+
+
+def _record_batch(schema, rows, nulled):
+    arrays = [_column(field, [row[index] for row in rows], nulled) for index, field in enumerate(schema)]
+    return pyarrow.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def _nulled_metadata(nulled):
+    """Trailing marker for values that didn't fit their column and were written as null"""
+    return {NULLED_METADATA_KEY: json.dumps(nulled)}
+
+
+class _Sink:
+    """Write-only file object whose contents are taken as they are written"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def take(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _csv_chunks(columns, batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue().encode()
+    for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([[_text(value) for value in row] for row in rows])
+        yield buffer.getvalue().encode()
+
+
+def _ndjson_chunks(columns, batches):
+    for rows in batches:
+        if columns is None:
+            # Whole documents, with the same encoding as the JSON routes
+            yield ''.join(encode_document(doc) + '\n' for doc in rows).encode()
+        else:
+            yield ''.join(dumps(dict(zip(columns, row))) + '\n' for row in rows).encode()
+
+
+def _arrow_chunks(columns, batches, types, compression):
+    sink = _Sink()
+    writer = None
+    nulled = {}
+    options = pyarrow.ipc.IpcWriteOptions(compression=compression or None)
+    for rows in batches:
+        if writer is None:
+            schema = _schema(columns, rows, types)
+            writer = pyarrow.ipc.new_stream(sink, schema, options=options)
+        writer.write_batch(_record_batch(schema, rows, nulled))
+        yield sink.take()
+    if writer is None:
+        schema = _schema(columns, [], types)
+        writer = pyarrow.ipc.new_stream(sink, schema, options=options)
+    if nulled:
+        # An empty last batch carries the marker; the schema was sent before anything was known
+        writer.write_batch(pyarrow.RecordBatch.from_pylist([], schema=schema),
+                           custom_metadata=_nulled_metadata(nulled))
+    writer.close()
+    yield sink.take()
+
+
+def _parquet_chunks(columns, batches, types, compression):
+    sink = _Sink()
+    writer = None
+    nulled = {}
+    pending = []
+    pending_rows = 0
+    for rows in batches:
+        if writer is None:
+            schema = _schema(columns, rows, types)
+            writer = pyarrow.parquet.ParquetWriter(sink, schema, compression=compression or 'snappy')
+        pending.append(_record_batch(schema, rows, nulled))
+        pending_rows += len(rows)
+        if pending_rows >= PARQUET_ROW_GROUP_ROWS:
+            writer.write_table(pyarrow.Table.from_batches(pending, schema=schema))
+            pending, pending_rows = [], 0
+            yield sink.take()
+    if writer is None:
+        schema = _schema(columns, [], types)
+        writer = pyarrow.parquet.ParquetWriter(sink, schema, compression=compression or 'snappy')
+    if pending:
+        writer.write_table(pyarrow.Table.from_batches(pending, schema=schema))
+    if nulled:
+        # Goes in the footer, written on close
+        writer.add_key_value_metadata(_nulled_metadata(nulled))
+    writer.close()
+    yield sink.take()
+
+
+def _compress_file(chunks, compression):
+    if compression == 'gzip':
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        finish = compressor.flush
+    else:
+        compressor = zstandard.ZstdCompressor(level=3).compressobj()
+        finish = compressor.flush
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield finish()
+
+
+def export_chunks(columns, batches, fmt, compression=None, types=None):
+    """Encode row batches as one export file, yielding bytes as they are ready
+
+    ``batches`` yields lists of row tuples in ``columns`` order. Only one
+    batch (plus, for Parquet, one row group) is held at a time. Arrow types
+    are inferred from the first batch. Later values that don't fit are
+    converted when that loses nothing and written as null otherwise, counted
+    under ``NULLED_METADATA_KEY``.
+    """
+    compression = None if compression == 'none' else compression
+    if fmt == 'csv':
+        chunks = _csv_chunks(columns, batches)
+    elif fmt == 'ndjson':
+        chunks = _ndjson_chunks(columns, batches)
+    elif fmt == 'arrow':
+        return _arrow_chunks(columns, batches, types or {}, compression)
+    else:
+        return _parquet_chunks(columns, batches, types or {}, compression)
+    return _compress_file(chunks, compression) if compression else chunks
+
+
+def cell(value):
+    """A document field as a flat CSV/Arrow value"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, Decimal128):
+        return value.to_decimal()
+    if isinstance(value, Binary):
+        return bytes(value)
+    if isinstance(value, (dict, list, RawBSONDocument)):
+        # Nested values stay JSON text in a single column
+        return dumps(value)
+    return value
+
+
+def _columns(first_batch):
+    columns = {'_id': None} if any('_id' in doc for doc in first_batch) else {}
+    for doc in first_batch:
+        for key in doc:
+            columns.setdefault(key, None)
+    return list(columns)
+
+
+def document_export(cursor, fmt, compression=None, fields=None, batch_rows=DEFAULT_BATCH_ROWS):
+    """Export file chunks for the documents of a find or aggregate cursor
+
+    CSV and columnar formats get one column per top-level field: ``fields``
+    when given, otherwise every field of the first batch. Fields that first
+    appear in a later batch are left out, since the header or schema has
+    already been sent; pass ``fields`` to include them. NDJSON without
+    ``fields`` writes whole documents.
+    """
+    def batches():
+        batch = []
+        for doc in cursor:
+            batch.append(doc)
+            if len(batch) >= batch_rows:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    documents = batches()
+    first = next(documents, [])
+    if fmt == 'ndjson' and not fields:
+        def whole():
+            if first:
+                yield first
+            yield from documents
+        return export_chunks(None, whole(), fmt, compression)
+
+    columns = list(fields) if fields else _columns(first)
+
+    def rows():
+        for batch in ([first] if first else []):
+            yield [tuple(cell(doc.get(column)) for column in columns) for doc in batch]
+        for batch in documents:
+            yield [tuple(cell(doc.get(column)) for column in columns) for doc in batch]
+
+    return export_chunks(columns, rows(), fmt, compression)
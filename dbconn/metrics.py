@@ -0,0 +1,313 @@
+import bisect
+import sys
+import threading
+import time
+
+from flask import g, has_request_context, request
+from pymongo.monitoring import ConnectionPoolListener
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000, 1000000)
+BATCH_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+# name: (type, help, buckets)
+FAMILIES = {
+    'http_request_duration_seconds': ('histogram', 'Request latency by route', LATENCY_BUCKETS),
+    'http_requests_total': ('counter', 'Requests by route and status', None),
+    'db_duration_seconds': ('histogram', 'Time spent in database calls per request', LATENCY_BUCKETS),
+    'serialization_duration_seconds': ('histogram', 'Time spent encoding JSON per request', LATENCY_BUCKETS),
+    'response_rows': ('histogram', 'Rows or documents returned per request', ROW_BUCKETS),
+    'response_bytes': ('histogram', 'Response body size (buffered responses only)', SIZE_BUCKETS),
+    'errors_total': ('counter', 'Failed requests by exception type', None),
+    'write_batch_size': ('histogram', 'Documents per coalesced insert_many', BATCH_BUCKETS),
+    'write_queue_delay_seconds': ('histogram', 'Time a coalesced insert waited for its batch', LATENCY_BUCKETS),
+}
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _RequestStats:
+    """Timings collected while one request is handled, kept on ``g``"""
+    __slots__ = ('start', 'db', 'serialize', 'rows', 'error')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.db = None
+        self.serialize = None
+        self.rows = None
+        self.error = None
+
+
+def _current():
+    return g.get('metrics_stats') if has_request_context() else None
+
+
+class _Timer:
+    """Adds the time spent in a ``with`` block to the request's db or serialize total"""
+    __slots__ = ('attr', 'start')
+
+    def __init__(self, attr):
+        self.attr = attr
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        stats = _current()
+        if stats is not None:
+            setattr(stats, self.attr, (getattr(stats, self.attr) or 0.0) + elapsed)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+
+class Metrics:
+    """Per-route request metrics rendered in the Prometheus text format
+
+    ``install(app)`` times every request with before/after hooks. Routes add
+    database time with ``with metrics.db_timer():``. JSON encoding time,
+    returned row counts and exception types are picked up by the JSON
+    provider from :func:`instrument_json`. Streamed responses are recorded
+    when they close, so their duration and size cover the whole body. Each
+    request costs a few ``perf_counter`` calls and one lock acquisition.
+    """
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._histograms = {name: {} for name, (kind, _, _) in FAMILIES.items() if kind == 'histogram'}
+        self._counters = {name: {} for name, (kind, _, _) in FAMILIES.items() if kind == 'counter'}
+
+    def install(self, app):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    def db_timer(self):
+        return _Timer('db')
+
+    def serialize_timer(self):
+        return _Timer('serialize')
+
+    def set_rows(self, count):
+        stats = _current()
+        if stats is not None:
+            stats.rows = count
+
+    def _before_request(self):
+        g.metrics_stats = _RequestStats()
+
+    def _after_request(self, response):
+        stats = g.get('metrics_stats')
+        if stats is None:
+            return response
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        method = request.method
+        status = response.status_code
+        if response.is_streamed:
+            # The body hasn't been produced yet; record once it has been sent
+            # (or the client went away), with the bytes that went out
+            sent = [0]
+            body = response.response
+
+            def counted():
+                try:
+                    for chunk in body:
+                        sent[0] += len(chunk.encode() if isinstance(chunk, str) else chunk)
+                        yield chunk
+                finally:
+                    if hasattr(body, 'close'):
+                        body.close()
+
+            response.response = counted()
+            response.call_on_close(lambda: self._record(stats, route, method, status, sent[0]))
+        else:
+            self._record(stats, route, method, status, response.content_length)
+        return response
+
+    def _record(self, stats, route, method, status, size):
+        elapsed = time.perf_counter() - stats.start
+        db_time = stats.db
+        serialize_time = stats.serialize
+        rows = stats.rows
+        error = stats.error
+
+        histograms = self._histograms
+        with self._lock:
+            self._observe(histograms['http_request_duration_seconds'], (route, method), elapsed, LATENCY_BUCKETS)
+            key = (route, method, status)
+            counters = self._counters['http_requests_total']
+            counters[key] = counters.get(key, 0) + 1
+            if db_time is not None:
+                self._observe(histograms['db_duration_seconds'], (route,), db_time, LATENCY_BUCKETS)
+            if serialize_time is not None:
+                self._observe(histograms['serialization_duration_seconds'], (route,), serialize_time, LATENCY_BUCKETS)
+            if rows is not None:
+                self._observe(histograms['response_rows'], (route,), rows, ROW_BUCKETS)
+            if size is not None:
+                self._observe(histograms['response_bytes'], (route,), size, SIZE_BUCKETS)
+            if status >= 400:
+                key = (route, error or f'HTTP{status}')
+                counters = self._counters['errors_total']
+                counters[key] = counters.get(key, 0) + 1
+
+    def observe_write_batch(self, collection, size, delays):
+        """Record one coalesced insert batch and how long each document waited"""
+        histograms = self._histograms
+        with self._lock:
+            self._observe(histograms['write_batch_size'], (collection,), size, BATCH_BUCKETS)
+            for delay in delays:
+                self._observe(histograms['write_queue_delay_seconds'], (collection,), delay, LATENCY_BUCKETS)
+
+    @staticmethod
+    def _observe(family, key, value, buckets):
+        histogram = family.get(key)
+        if histogram is None:
+            histogram = family[key] = Histogram(buckets)
+        histogram.observe(value)
+
+    def render(self, gauges=None):
+        """Text exposition of all metrics plus ``gauges`` ({group: stats dict})"""
+        label_names = {
+            'http_request_duration_seconds': ('route', 'method'),
+            'http_requests_total': ('route', 'method', 'status'),
+            'errors_total': ('route', 'type'),
+            'write_batch_size': ('collection',),
+            'write_queue_delay_seconds': ('collection',),
+        }
+        lines = []
+        with self._lock:
+            for name, (kind, help_text, _) in FAMILIES.items():
+                full = f'{self.prefix}_{name}'
+                names = label_names.get(name, ('route',))
+                lines.append(f'# HELP {full} {help_text}')
+                lines.append(f'# TYPE {full} {kind}')
+                if kind == 'counter':
+                    for key, value in sorted(self._counters[name].items()):
+                        lines.append(f'{full}{_labels(names, key)} {value}')
+                    continue
+                for key, histogram in sorted(self._histograms[name].items()):
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                        cumulative += count
+                        lines.append(f'{full}_bucket{_labels(names + ("le",), key + (bound,))} {cumulative}')
+                    lines.append(f'{full}_sum{_labels(names, key)} {histogram.sum}')
+                    lines.append(f'{full}_count{_labels(names, key)} {histogram.count}')
+
+        for group, stats in (gauges or {}).items():
+            for key, value in stats.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                full = f'{self.prefix}_{group}_{key}'
+                lines.append(f'# TYPE {full} gauge')
+                lines.append(f'{full} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def instrument_json(provider_class):
+    """Subclass a Flask JSON provider to time ``jsonify`` and note failures
+
+    Routes return errors with ``jsonify`` inside their ``except`` blocks, so
+    the exception being handled at that point names the error type.
+    """
+    class MetricsJSONProvider(provider_class):
+        def response(self, *args, **kwargs):
+            started = time.perf_counter()
+            response = super().response(*args, **kwargs)
+            stats = _current()
+            if stats is not None:
+                stats.serialize = (stats.serialize or 0.0) + time.perf_counter() - started
+                payload = args[0] if len(args) == 1 else kwargs
+                if isinstance(payload, dict) and isinstance(payload.get('count'), int):
+                    stats.rows = payload['count']
+                error = sys.exc_info()[1]
+                if error is not None:
+                    stats.error = type(error).__name__
+            return response
+
+    return MetricsJSONProvider
+
+
+class PoolGauges(ConnectionPoolListener):
+    """Connection pool gauges from PyMongo's pool events
+
+    Pass it to ``MongoClient(event_listeners=[...])``.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.open = 0
+        self.checked_out = 0
+        self.created_total = 0
+        self.closed_total = 0
+        self.checkout_failures_total = 0
+
+    def _add(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._add(open=1, created_total=1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._add(open=-1, closed_total=1)
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self._add(checkout_failures_total=1)
+
+    def connection_checked_out(self, event):
+        self._add(checked_out=1)
+
+    def connection_checked_in(self, event):
+        self._add(checked_out=-1)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'open': self.open,
+                'checked_out': self.checked_out,
+                'created_total': self.created_total,
+                'closed_total': self.closed_total,
+                'checkout_failures_total': self.checkout_failures_total,
+            }
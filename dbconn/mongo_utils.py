@@ -0,0 +1,231 @@
+"""Request parsing shared by the sync (Flask) and async (Quart) Mongo backends"""
+import base64
+from collections.abc import Mapping
+
+from bson import ObjectId, json_util
+from bson.errors import InvalidId
+from pymongo import DeleteMany, DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+
+# Documents per chunk written by streamed responses
+STREAM_CHUNK_DOCS = 500
+
+# Field tagging documents written by a materialized aggregation
+MATERIALIZED_RUN_FIELD = '_materialized_run'
+
+# read_preference values accepted by the read routes
+READ_PREFERENCES = {
+    'primary': Primary,
+    'primaryPreferred': PrimaryPreferred,
+    'secondary': Secondary,
+    'secondaryPreferred': SecondaryPreferred,
+    'nearest': Nearest,
+}
+
+# Smallest maxStalenessSeconds servers accept
+MIN_MAX_STALENESS = 90
+
+
+def normalize_filter(filter_query):
+    """Convert an ObjectId string in ``_id`` to an ObjectId"""
+    if isinstance(filter_query, dict) and isinstance(filter_query.get('_id'), str):
+        try:
+            filter_query = dict(filter_query, _id=ObjectId(filter_query['_id']))
+        except InvalidId:
+            pass
+    return filter_query
+
+
+def parse_sort(sort):
+    """Normalise {"field": 1} or [["field", -1], ...] into PyMongo sort pairs"""
+    if not sort:
+        return []
+    if isinstance(sort, dict):
+        sort = sort.items()
+    return [(field, -1 if int(direction) < 0 else 1) for field, direction in sort]
+
+
+def ensure_projected(projection, fields):
+    """Make sure an inclusion/exclusion projection returns the given fields"""
+    if not projection:
+        return projection
+    projection = dict(projection)
+    inclusive = any(v for k, v in projection.items() if k != '_id')
+    for field in fields:
+        if inclusive:
+            projection[field] = 1
+        else:
+            projection.pop(field, None)
+    return projection
+
+
+def keyset_condition(key, direction, after):
+    """Filter matching documents that sort strictly after ``after``"""
+    op = '$gt' if direction > 0 else '$lt'
+    last_key, last_id = after
+    if key == '_id':
+        return {'_id': {op: last_id}}
+    return {'$or': [
+        {key: {op: last_key}},
+        {key: last_key, '_id': {op: last_id}}
+    ]}
+
+
+def encode_resume_token(key, direction, after):
+    """Build an opaque token that resumes a keyset scan after ``after``"""
+    payload = json_util.dumps({'k': key, 'd': direction, 'a': list(after)})
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_resume_token(token):
+    """Return (key, direction, after) from a resume token"""
+    try:
+        payload = json_util.loads(base64.urlsafe_b64decode(token.encode()))
+        return payload['k'], int(payload['d']), tuple(payload['a'])
+    except (TypeError, KeyError, ValueError) as e:
+        raise ValueError('Invalid resume token') from e
+
+
+def get_field(doc, path):
+    """Read a dotted field path from a document"""
+    for part in path.split('.'):
+        if not isinstance(doc, Mapping):
+            return None
+        doc = doc.get(part)
+    return doc
+
+
+def plan_read(data):
+    """Turn an /api/read request body into find() arguments
+
+    Raises ValueError for a malformed resume token.
+    """
+    filter_query = normalize_filter(data.get('filter', {}))
+    stream = data.get('stream', False)
+    resume = data.get('resume')
+    sort = parse_sort(data.get('sort'))
+    plan = {
+        'filter': filter_query,
+        'query': filter_query,
+        'projection': data.get('projection'),
+        'sort': sort,
+        'limit': data.get('limit', 0 if stream else 10),
+        'batch_size': int(data.get('batch_size', 0)),
+        'stream': stream,
+        'paginate': bool(data.get('paginate') or resume),
+        'key': None,
+        'direction': 1,
+    }
+
+    if plan['paginate']:
+        after = None
+        if resume:
+            key, direction, after = decode_resume_token(resume)
+        else:
+            key, direction = sort[0] if sort else ('_id', 1)
+
+        # Keyset pagination: order by (key, _id) so ties still resume exactly
+        plan['key'], plan['direction'] = key, direction
+        plan['sort'] = [(key, direction)] if key == '_id' else [(key, direction), ('_id', direction)]
+        plan['projection'] = ensure_projected(plan['projection'], [key, '_id'])
+        if after is not None:
+            condition = keyset_condition(key, direction, after)
+            plan['query'] = {'$and': [filter_query, condition]} if filter_query else condition
+
+    return plan
+
+
+def read_preference(data):
+    """Read preference a request asks for with ``read_preference``, or None
+
+    ``max_staleness`` (seconds) skips secondaries further behind the primary.
+    Raises ValueError for an unknown mode or a bound the server would reject.
+    """
+    mode = data.get('read_preference')
+    if not mode:
+        return None
+    if mode not in READ_PREFERENCES:
+        raise ValueError(f"read_preference must be one of {', '.join(READ_PREFERENCES)}")
+    staleness = data.get('max_staleness')
+    if mode == 'primary':
+        if staleness:
+            raise ValueError('max_staleness does not apply to primary reads')
+        return Primary()
+    staleness = -1 if staleness in (None, '') else int(staleness)
+    if staleness != -1 and staleness < MIN_MAX_STALENESS:
+        raise ValueError(f'max_staleness must be at least {MIN_MAX_STALENESS} seconds')
+    return READ_PREFERENCES[mode](max_staleness=staleness)
+
+
+def find_for_plan(collection, plan):
+    """Start the find() for a read plan"""
+    return apply_read_plan(collection.find(plan['query'], plan['projection']), plan)
+
+
+def apply_read_plan(cursor, plan):
+    """Apply sort/limit/batch size to a PyMongo or Motor find cursor"""
+    if plan['sort']:
+        cursor = cursor.sort(plan['sort'])
+    if plan['limit']:
+        cursor = cursor.limit(plan['limit'])
+    if plan['batch_size']:
+        cursor = cursor.batch_size(plan['batch_size'])
+    return cursor
+
+
+def next_resume_token(plan, last_doc, count):
+    """Resume token for the page after last_doc, or None at the end"""
+    limit = plan['limit']
+    if last_doc is None or not limit or count < limit:
+        return None
+    key = plan['key']
+    return encode_resume_token(key, plan['direction'], (get_field(last_doc, key), last_doc['_id']))
+
+
+def aggregate_options(data):
+    """aggregate() keyword arguments from an /api/aggregate request body"""
+    options = {}
+    if data.get('allow_disk_use'):
+        # Lets $group/$sort spill to disk past the 100MB per-stage limit
+        options['allowDiskUse'] = True
+    if data.get('batch_size'):
+        options['batchSize'] = int(data['batch_size'])
+    if data.get('max_time_ms'):
+        options['maxTimeMS'] = int(data['max_time_ms'])
+    if any(value < 1 for key, value in options.items() if key != 'allowDiskUse'):
+        raise ValueError('batch_size and max_time_ms must be positive')
+    return options
+
+
+def materialize_pipeline(pipeline, target, run_id):
+    """Pipeline that $merges its results into ``target``, tagged with ``run_id``
+
+    Documents left over from an earlier run keep their old tag, so they can be
+    deleted once the merge finishes.
+    """
+    return list(pipeline) + [
+        {'$set': {MATERIALIZED_RUN_FIELD: run_id}},
+        {'$merge': {'into': target, 'on': '_id', 'whenMatched': 'replace', 'whenNotMatched': 'insert'}}
+    ]
+
+
+def build_write_model(op):
+    """Translate one /api/bulk operation into a PyMongo write model"""
+    kind = op['op']
+    if kind == 'insert':
+        document = op['document']
+        if not isinstance(document, dict):
+            raise TypeError('document must be an object')
+        return InsertOne(document)
+
+    filter_query = normalize_filter(op['filter'])
+    if kind == 'update':
+        update_model = UpdateMany if op.get('multiple') else UpdateOne
+        return update_model(filter_query, op['update'], upsert=op.get('upsert', False))
+    if kind == 'replace':
+        return ReplaceOne(filter_query, op['replacement'], upsert=op.get('upsert', False))
+    if kind == 'delete':
+        if not filter_query:
+            raise ValueError('delete requires a non-empty filter')
+        return DeleteMany(filter_query) if op.get('multiple') else DeleteOne(filter_query)
+    raise ValueError(f'unknown op {kind!r}')
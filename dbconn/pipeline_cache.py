@@ -0,0 +1,167 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from bson import json_util
+from bson.json_util import CANONICAL_JSON_OPTIONS
+
+# Stages and variables whose output can change without any collection being written
+_NON_DETERMINISTIC = {'$sample', '$rand', '$currentOp', '$collStats', '$indexStats', '$listSessions',
+                      '$listLocalSessions', '$planCacheStats', '$changeStream', '$out', '$merge'}
+_NON_DETERMINISTIC_VARS = ('$$NOW', '$$CLUSTER_TIME')
+
+# Stage options naming another collection the pipeline reads
+_FOREIGN_COLLECTION = {'$lookup': 'from', '$graphLookup': 'from', '$unionWith': 'coll'}
+
+
+def pipeline_key(client, database, collection_name, pipeline):
+    """Stable hash of a pipeline run through ``client`` (a registry client key)
+
+    Canonical Extended JSON keeps BSON types distinct ({"$oid": ...} vs a
+    plain string) and field order, which matters for stages like $sort.
+    """
+    payload = json_util.dumps([client, database, collection_name, pipeline], json_options=CANONICAL_JSON_OPTIONS)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _walk(node, visit):
+    if isinstance(node, dict):
+        for key, value in node.items():
+            visit(key, value)
+            _walk(value, visit)
+    elif isinstance(node, list):
+        for value in node:
+            _walk(value, visit)
+    else:
+        visit(None, node)
+
+
+def referenced_collections(collection_name, pipeline):
+    """Collections a pipeline reads, including $lookup/$unionWith sources"""
+    names = {collection_name}
+
+    def visit(key, value):
+        if key in _FOREIGN_COLLECTION:
+            if isinstance(value, str):
+                names.add(value)
+            elif isinstance(value, dict) and isinstance(value.get(_FOREIGN_COLLECTION[key]), str):
+                names.add(value[_FOREIGN_COLLECTION[key]])
+
+    _walk(pipeline, visit)
+    return names
+
+
+def is_cacheable(pipeline):
+    """Only pipelines that neither write nor depend on time or randomness are cached"""
+    found = []
+
+    def visit(key, value):
+        if key in _NON_DETERMINISTIC or (isinstance(value, str) and value.startswith(_NON_DETERMINISTIC_VARS)):
+            found.append(key or value)
+
+    _walk(pipeline, visit)
+    return not found
+
+
+class PipelineCache:
+    """In-process LRU cache of aggregation results with per-collection invalidation
+
+    Values are lists of already-encoded JSON documents, so a hit skips both
+    the server round trip and serialization. Entries expire after ``ttl``
+    seconds, the least recently used ones are evicted past ``max_bytes``,
+    and a write to a collection drops every result that read from it.
+    """
+
+    def __init__(self, ttl=60.0, max_bytes=64 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._by_collection = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # Bumped by every invalidation so a result computed before a write
+        # can't be stored after it
+        self.version = 0
+
+    def get(self, key):
+        """Return cached encoded documents, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, collections, expires, size = entry
+            if expires <= time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, collections, version, ttl=None):
+        """Store encoded documents computed from ``collections`` at ``version``"""
+        size = sum(len(doc) for doc in value)
+        if size > self.max_bytes // 8:
+            # One huge result would flush everything else out
+            return
+        with self._lock:
+            if version != self.version:
+                return
+            if key in self._entries:
+                self._remove(key)
+            expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+            self._entries[key] = (value, collections, expires, size)
+            self._bytes += size
+            for name in collections:
+                self._by_collection.setdefault(name, set()).add(key)
+            while self._bytes > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, collections=None):
+        """Drop results that read from any of ``collections``; None drops everything"""
+        with self._lock:
+            self.version += 1
+            if collections is None:
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+                self._by_collection.clear()
+                self._bytes = 0
+                return
+            for name in collections:
+                for key in self._by_collection.pop(name, set()):
+                    if key in self._entries:
+                        self._remove(key)
+                        self.invalidations += 1
+
+    def _remove(self, key):
+        value, collections, expires, size = self._entries.pop(key)
+        self._bytes -= size
+        for name in collections:
+            keys = self._by_collection.get(name)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_collection[name]
+
+    def stats(self):
+        """Snapshot of cache counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
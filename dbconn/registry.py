@@ -0,0 +1,219 @@
+import hashlib
+import secrets
+import threading
+import time
+from urllib.parse import urlsplit
+
+# Sessions not used for this long are dropped (the default session never is)
+SESSION_TIMEOUT = 3600
+
+# Clients no session has used for this long are closed
+CLIENT_IDLE_TIMEOUT = 600
+
+# Most clients kept open; the least recently used idle ones go first
+MAX_CLIENTS = 8
+
+# Minimum seconds between eviction sweeps
+SWEEP_INTERVAL = 1.0
+
+DEFAULT_SESSION = 'default'
+
+
+def client_key(uri):
+    """Registry key for a connection string; the URI holds the password, so hash it"""
+    return hashlib.sha256(uri.encode()).hexdigest()[:16]
+
+
+def redact(uri):
+    """Connection string without credentials, for stats"""
+    parts = urlsplit(uri)
+    host = parts.netloc.rsplit('@', 1)[-1]
+    return f'{parts.scheme}://{host}'
+
+
+class _ClientEntry:
+    __slots__ = ('key', 'client', 'target', 'created', 'last_used', 'sessions', 'reuses')
+
+    def __init__(self, key, client, target):
+        self.key = key
+        self.client = client
+        self.target = target
+        self.created = time.monotonic()
+        self.last_used = self.created
+        self.sessions = 0
+        self.reuses = 0
+
+
+class Session:
+    """One caller's database and collection on a shared client"""
+    __slots__ = ('id', 'entry', 'db', 'collection', 'last_used')
+
+    def __init__(self, session_id, entry, database_name, collection_name):
+        self.id = session_id
+        self.entry = entry
+        self.db = entry.client[database_name]
+        self.collection = self.db[collection_name]
+        self.last_used = time.monotonic()
+
+    @property
+    def client(self):
+        return self.entry.client
+
+
+class ClientRegistry:
+    """MongoClients shared by connection string, with per-session handles
+
+    ``connect()`` reuses the client already open for the same URI (host and
+    credentials), so switching database or collection, or a second user of
+    the same cluster, skips DNS, TLS and the handshake. Each session only
+    holds its own ``db``/``collection`` handles. Sessions idle for
+    ``session_timeout`` are dropped; clients no session refers to are closed
+    after ``idle_timeout`` or, past ``max_clients``, least recently used
+    first. Sweeps run on registry calls, at most once per second.
+    """
+
+    def __init__(self, factory, max_clients=MAX_CLIENTS, idle_timeout=CLIENT_IDLE_TIMEOUT,
+                 session_timeout=SESSION_TIMEOUT):
+        self.factory = factory
+        self.max_clients = max_clients
+        self.idle_timeout = idle_timeout
+        self.session_timeout = session_timeout
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._sessions = {}
+        self._last_sweep = 0.0
+        self.created = 0
+        self.reused = 0
+        self.evicted = 0
+        self.expired_sessions = 0
+
+    def connect(self, uri, database_name, collection_name, session_id=None):
+        """Point a session (new, or ``session_id``) at a database and collection
+
+        Opens and pings a client only when none is open for ``uri``. Raises
+        whatever the driver raises for an unreachable server or bad login.
+        """
+        key = client_key(uri)
+        opened = False
+        with self._lock:
+            entry = self._clients.get(key)
+        if entry is None:
+            # Connect outside the lock so other sessions aren't held up
+            client = self.factory(uri)
+            try:
+                client.admin.command('ping')
+            except Exception:
+                client.close()
+                raise
+            with self._lock:
+                entry = self._clients.get(key)
+                if entry is None:
+                    entry = self._clients[key] = _ClientEntry(key, client, redact(uri))
+                    self.created += 1
+                    opened = True
+                    client = None
+            if client is not None:
+                # Another request opened the same client meanwhile
+                client.close()
+        with self._lock:
+            if entry.key not in self._clients:
+                # Evicted between lookup and use; put it back, it is about to be used
+                self._clients[entry.key] = entry
+            if not opened:
+                entry.reuses += 1
+                self.reused += 1
+            session_id = session_id or secrets.token_urlsafe(16)
+            previous = self._sessions.get(session_id)
+            if previous is not None:
+                previous.entry.sessions -= 1
+                previous.entry.last_used = time.monotonic()
+            session = self._sessions[session_id] = Session(session_id, entry, database_name, collection_name)
+            entry.sessions += 1
+            entry.last_used = session.last_used
+            evicted = self._sweep(force=True)
+        self._close(evicted)
+        return session
+
+    def get(self, session_id):
+        """The live session for ``session_id``, or None"""
+        with self._lock:
+            evicted = self._sweep()
+            session = self._sessions.get(session_id)
+            if session is not None:
+                now = time.monotonic()
+                session.last_used = now
+                session.entry.last_used = now
+        self._close(evicted)
+        return session
+
+    def disconnect(self, session_id):
+        """Drop a session; its client stays open for reuse until it idles out"""
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is not None:
+                session.entry.sessions -= 1
+                session.entry.last_used = time.monotonic()
+        return session is not None
+
+    def _sweep(self, force=False):
+        """Expire sessions and pick clients to close; call with the lock held"""
+        now = time.monotonic()
+        if not force and now - self._last_sweep < SWEEP_INTERVAL:
+            return []
+        self._last_sweep = now
+
+        for session_id, session in list(self._sessions.items()):
+            if session_id != DEFAULT_SESSION and now - session.last_used > self.session_timeout:
+                del self._sessions[session_id]
+                session.entry.sessions -= 1
+                self.expired_sessions += 1
+
+        idle = sorted((entry for entry in self._clients.values() if entry.sessions <= 0),
+                      key=lambda entry: entry.last_used)
+        excess = len(self._clients) - self.max_clients
+        evicted = []
+        for entry in idle:
+            if excess > 0 or now - entry.last_used > self.idle_timeout:
+                del self._clients[entry.key]
+                evicted.append(entry)
+                excess -= 1
+        self.evicted += len(evicted)
+        return evicted
+
+    @staticmethod
+    def _close(entries):
+        for entry in entries:
+            try:
+                entry.client.close()
+            except Exception:
+                pass
+
+    def close(self):
+        """Close every client and forget all sessions"""
+        with self._lock:
+            entries = list(self._clients.values())
+            self._clients.clear()
+            self._sessions.clear()
+        self._close(entries)
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            return {
+                'clients': len(self._clients),
+                'sessions': len(self._sessions),
+                'max_clients': self.max_clients,
+                'idle_timeout': self.idle_timeout,
+                'session_timeout': self.session_timeout,
+                'created': self.created,
+                'reused': self.reused,
+                'evicted': self.evicted,
+                'expired_sessions': self.expired_sessions,
+                'targets': [{
+                    'key': entry.key,
+                    'target': entry.target,
+                    'sessions': entry.sessions,
+                    'reuses': entry.reuses,
+                    'idle_seconds': round(now - entry.last_used, 1)
+                } for entry in self._clients.values()]
+            }
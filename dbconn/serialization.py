@@ -0,0 +1,113 @@
+"""JSON encoding for BSON documents, shared by every route
+
+Uses orjson when it is installed and falls back to the standard library.
+ObjectId, datetime, Decimal128, Binary and the other BSON types are encoded
+at any depth, so handlers can return documents exactly as PyMongo gives them.
+"""
+import base64
+import datetime
+import decimal
+import json
+import uuid
+
+from bson import ObjectId
+from bson.binary import Binary
+from bson.decimal128 import Decimal128
+from bson.max_key import MaxKey
+from bson.min_key import MinKey
+from bson.regex import Regex
+from bson.timestamp import Timestamp
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def default(value):
+    """Encode a value the JSON library does not handle natively"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, Decimal128):
+        return str(value.to_decimal())
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    if isinstance(value, (Binary, bytes)):
+        return base64.b64encode(value).decode()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, Timestamp):
+        return {'t': value.time, 'i': value.inc}
+    if isinstance(value, Regex):
+        return {'pattern': value.pattern, 'flags': value.flags}
+    if isinstance(value, (MinKey, MaxKey)):
+        return str(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj):
+        """Serialize to a JSON string"""
+        return orjson.dumps(obj, default=default, option=_ORJSON_OPTIONS).decode()
+
+    def loads(s):
+        """Parse a JSON string or bytes"""
+        return orjson.loads(s)
+else:
+    def dumps(obj):
+        """Serialize to a JSON string"""
+        return json.dumps(obj, default=default, separators=(',', ':'))
+
+    def loads(s):
+        """Parse a JSON string or bytes"""
+        return json.loads(s)
+
+
+def encode_document(doc):
+    """Encode one document as a JSON fragment for :func:`embed_encoded` or NDJSON"""
+    return dumps(doc)
+
+
+def embed_encoded(result, key, fragments):
+    """Serialize ``result`` with already-encoded JSON documents under ``key``"""
+    head = dumps(result)
+    separator = ',' if len(result) else ''
+    return head[:-1] + f'{separator}"{key}":[' + ','.join(fragments) + ']}'
+
+
+class BSONJSONProvider:
+    """JSON provider for Flask and Quart apps that encodes BSON types
+
+    Install with ``app.json = BSONJSONProvider(app)`` so ``jsonify`` and
+    ``request.get_json`` go through :func:`dumps` and :func:`loads`.
+    """
+
+    mimetype = 'application/json'
+
+    def __init__(self, app):
+        self._app = app
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj)
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def dump(self, obj, fp, **kwargs):
+        fp.write(dumps(obj))
+
+    def load(self, fp, **kwargs):
+        return loads(fp.read())
+
+    def response(self, *args, **kwargs):
+        if args and kwargs:
+            raise TypeError('jsonify() behavior undefined when passed both args and kwargs')
+        if len(args) == 1:
+            obj = args[0]
+        else:
+            obj = args or kwargs
+        return self._app.response_class(dumps(obj) + '\n', mimetype=self.mimetype)
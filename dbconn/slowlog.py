@@ -0,0 +1,281 @@
+import hashlib
+import logging
+import logging.handlers
+import math
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+
+from serialization import dumps
+
+# Duration samples kept per fingerprint for percentiles
+SAMPLES_PER_FINGERPRINT = 1000
+
+# Distinct fingerprints summarized; the least recently seen go first
+MAX_FINGERPRINTS = 1000
+
+# Log files open for writing, shared by logs with the same path: path -> [handler, users]
+_handlers = {}
+_handlers_lock = threading.Lock()
+
+
+def _open_handler(path, max_bytes, backups):
+    """The rotating handler for ``path``, opened on first use"""
+    key = os.path.abspath(path)
+    with _handlers_lock:
+        entry = _handlers.get(key)
+        if entry is None:
+            handler = logging.handlers.RotatingFileHandler(path, maxBytes=int(max_bytes), backupCount=int(backups))
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            entry = _handlers[key] = [handler, 0]
+        entry[1] += 1
+        return entry[0]
+
+
+def _release_handler(path):
+    """Close the handler for ``path`` once no log uses it"""
+    key = os.path.abspath(path)
+    with _handlers_lock:
+        entry = _handlers.get(key)
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] <= 0:
+            del _handlers[key]
+            entry[0].close()
+
+
+def query_shape(value):
+    """Replace every value in a filter or pipeline with ``?``, keeping field names and operators
+
+    Lists of plain values (``$in`` arrays) collapse to a single ``?`` so any
+    length gives the same shape.
+    """
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        if all(not isinstance(item, (dict, list, tuple)) for item in value):
+            return '?'
+        return [query_shape(item) for item in value]
+    return '?'
+
+
+def fingerprint_query(statement):
+    """Short hash and text of a normalized operation
+
+    ``statement`` is ``{"op": ..., "collection": ..., ...}``. Sort specs keep
+    their directions, since they change the plan.
+    """
+    normalized = {}
+    for key, value in statement.items():
+        normalized[key] = value if key in ('op', 'collection', 'sort') else query_shape(value)
+    text = dumps(normalized)
+    return hashlib.sha1(text.encode()).hexdigest()[:16], text
+
+
+def rows_examined(plan):
+    """Documents examined according to an explain with execution stats"""
+    total = 0
+
+    def walk(node):
+        nonlocal total
+        if isinstance(node, dict):
+            if isinstance(node.get('totalDocsExamined'), int):
+                total += node['totalDocsExamined']
+                return
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(plan)
+    return total
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class SlowQueryLog:
+    """Bounded in-memory log of reads and aggregations slower than ``threshold_ms``
+
+    The newest ``capacity`` records are kept in a ring buffer and summarized
+    per fingerprint. With ``path`` set every record is also appended as a JSON
+    line to a size-rotated file. Plans are captured by one background worker
+    so the slow request itself isn't delayed further; when the worker falls
+    behind, plans are skipped rather than queued without bound.
+    """
+
+    def __init__(self, threshold_ms=200, capacity=500, path=None, max_bytes=10 * 1024 * 1024, backups=3,
+                 explain=True, max_fingerprints=MAX_FINGERPRINTS):
+        self.threshold_ms = float(threshold_ms)
+        self.capacity = int(capacity)
+        self.explain = bool(explain)
+        self.max_fingerprints = int(max_fingerprints)
+        if self.max_fingerprints < 1:
+            raise ValueError('max_fingerprints must be positive')
+        self._lock = threading.Lock()
+        self._records = deque(maxlen=self.capacity)
+        self._fingerprints = OrderedDict()
+        self._sequence = 0
+        self._plans = queue.Queue(maxsize=100)
+        self._worker = None
+        self.recorded = 0
+        self.plans_skipped = 0
+
+        self.fingerprints_evicted = 0
+        self._closed = False
+
+        # Reconnecting with the same path reuses the open file rather than adding a handler
+        self._handler = _open_handler(path, max_bytes, backups) if path else None
+        self.path = path
+
+    def is_slow(self, seconds):
+        return seconds * 1000 >= self.threshold_ms
+
+    def record(self, statement, params, seconds, rows_returned, explain=None, kind='query'):
+        """Add one slow operation; ``explain()`` returns (plan, rows_examined)"""
+        fingerprint, normalized = fingerprint_query(statement)
+        duration_ms = round(seconds * 1000, 3)
+        with self._lock:
+            self._sequence += 1
+            entry = {
+                'id': self._sequence,
+                'time': time.time(),
+                'kind': kind,
+                'fingerprint': fingerprint,
+                'statement': normalized,
+                'params': params,
+                'duration_ms': duration_ms,
+                'rows_returned': rows_returned,
+                'rows_examined': None,
+                'plan': None
+            }
+            self._records.append(entry)
+            self.recorded += 1
+
+            stats = self._fingerprints.get(fingerprint)
+            if stats is not None:
+                self._fingerprints.move_to_end(fingerprint)
+            else:
+                if len(self._fingerprints) >= self.max_fingerprints:
+                    self._fingerprints.popitem(last=False)
+                    self.fingerprints_evicted += 1
+                stats = self._fingerprints[fingerprint] = {
+                    'statement': normalized,
+                    'count': 0,
+                    'total_ms': 0.0,
+                    'max_ms': 0.0,
+                    'samples': deque(maxlen=SAMPLES_PER_FINGERPRINT)
+                }
+            stats['count'] += 1
+            stats['total_ms'] += duration_ms
+            stats['max_ms'] = max(stats['max_ms'], duration_ms)
+            stats['samples'].append(duration_ms)
+
+        if explain is not None and self.explain:
+            self._queue_plan(entry, explain)
+        else:
+            self._write(entry)
+        return entry
+
+    def _queue_plan(self, entry, explain):
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._capture_plans, daemon=True)
+                    self._worker.start()
+        try:
+            self._plans.put_nowait((entry, explain))
+        except queue.Full:
+            self.plans_skipped += 1
+            self._write(entry)
+
+    def _capture_plans(self):
+        while not self._closed:
+            item = self._plans.get()
+            if item is None:
+                return
+            entry, explain = item
+            try:
+                plan, examined = explain()
+                with self._lock:
+                    entry['plan'] = plan
+                    entry['rows_examined'] = examined
+            except Exception as e:
+                entry['plan_error'] = str(e)
+            self._write(entry)
+
+    def _write(self, entry):
+        handler = self._handler
+        if handler is not None:
+            handler.handle(logging.makeLogRecord({'msg': dumps(entry), 'levelno': logging.INFO, 'levelname': 'INFO'}))
+
+    def recent(self, limit=50, fingerprint=None):
+        """Newest records first"""
+        with self._lock:
+            records = [dict(entry) for entry in reversed(self._records)
+                       if fingerprint is None or entry['fingerprint'] == fingerprint]
+        return records[:limit]
+
+    def summary(self, limit=50):
+        """Per-fingerprint count, total time and p50/p95/p99, slowest total first"""
+        with self._lock:
+            items = [(fingerprint, dict(stats, samples=sorted(stats['samples'])))
+                     for fingerprint, stats in self._fingerprints.items()]
+        summary = []
+        for fingerprint, stats in items:
+            samples = stats.pop('samples')
+            stats.update({
+                'fingerprint': fingerprint,
+                'total_ms': round(stats['total_ms'], 3),
+                'avg_ms': round(stats['total_ms'] / stats['count'], 3),
+                'p50_ms': percentile(samples, 0.50),
+                'p95_ms': percentile(samples, 0.95),
+                'p99_ms': percentile(samples, 0.99)
+            })
+            summary.append(stats)
+        summary.sort(key=lambda stats: stats['total_ms'], reverse=True)
+        return summary[:limit]
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+            self._fingerprints.clear()
+
+    def close(self):
+        """Stop the plan worker and release the log file, if any"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._worker is not None:
+            try:
+                self._plans.put_nowait(None)
+            except queue.Full:
+                # The worker sees _closed after its current plan
+                pass
+        if self._handler is not None:
+            _release_handler(self.path)
+            self._handler = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'threshold_ms': self.threshold_ms,
+                'capacity': self.capacity,
+                'entries': len(self._records),
+                'fingerprints': len(self._fingerprints),
+                'max_fingerprints': self.max_fingerprints,
+                'fingerprints_evicted': self.fingerprints_evicted,
+                'recorded': self.recorded,
+                'plans_skipped': self.plans_skipped,
+                'explain': self.explain,
+                'file': self.path
+            }